@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Async Serial
+
+Modbus RTU host requests yielding to the event loop while the frame is sent
+and the response of the client is awaited
+"""
+
+# system packages
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import time
+
+# custom modules
+from .modbus_bits import unpack_bits
+
+# pip installed packages
+# https://github.com/brainelectronics/micropython-modbus
+from umodbus import const as Const
+from umodbus import functions
+
+
+class AsyncSerial(object):
+    """
+    Async requests of a Modbus RTU host
+
+    The UART, CRC and response validation of the umodbus host are used, only
+    the waiting for the sent frame and the response is replaced by sleeps of
+    the event loop. Requests are serialized by a lock, as the bus can only be
+    used by a single request at a time. Hosts without an UART, e.g. a Modbus
+    TCP host, are requested blocking.
+    """
+    # number of inter frame delays to wait for a response, same as umodbus
+    RESPONSE_TIMEOUT_FRAMES = 120
+
+    def __init__(self, host) -> None:
+        self._host = host
+        self._uart = getattr(host, '_uart', None)
+        self._lock = asyncio.Lock()
+
+    @property
+    def host(self):
+        """
+        Get the wrapped Modbus host
+
+        :returns:   The Modbus host
+        :rtype:     umodbus.serial.Serial
+        """
+        return self._host
+
+    async def _send(self, modbus_pdu: bytes, slave_addr: int) -> None:
+        """
+        Send a Modbus frame and wait until it has been sent out
+
+        :param      modbus_pdu:  The modbus Protocol Data Unit
+        :type       modbus_pdu:  bytes
+        :param      slave_addr:  The slave address
+        :type       slave_addr:  int
+        """
+        host = self._host
+
+        modbus_adu = bytearray()
+        modbus_adu.append(slave_addr)
+        modbus_adu.extend(modbus_pdu)
+        modbus_adu.extend(host._calculate_crc16(modbus_adu))
+
+        # time of the frame on the wire plus one character as margin
+        frame_time_us = host._t1char * (len(modbus_adu) + 1)
+
+        if host._ctrlPin:
+            # the control pin has to be released right after the last byte,
+            # which is not possible with the timing of the event loop
+            host._ctrlPin.on()
+            time.sleep_us(200)
+            self._uart.write(modbus_adu)
+            time.sleep_us(frame_time_us)
+            host._ctrlPin.off()
+        else:
+            self._uart.write(modbus_adu)
+            await asyncio.sleep(frame_time_us / 1000000)
+
+    async def _receive(self) -> bytearray:
+        """
+        Receive the response of the client
+
+        :returns:   Received response, empty if nothing has been received
+        :rtype:     bytearray
+        """
+        host = self._host
+        response = bytearray()
+        delay_us = host._inter_frame_delay
+        timeout_us = self.RESPONSE_TIMEOUT_FRAMES * delay_us
+        start_us = time.ticks_us()
+
+        while time.ticks_diff(time.ticks_us(), start_us) < timeout_us:
+            if self._uart.any():
+                response.extend(self._uart.read())
+
+                # variable length function codes may require multiple reads
+                if host._exit_read(response):
+                    break
+
+            # wait for the maximum time between two frames
+            await asyncio.sleep(delay_us / 1000000)
+
+        return response
+
+    async def _request(self,
+                       modbus_pdu: bytes,
+                       slave_addr: int,
+                       count: bool) -> bytes:
+        """
+        Send a Modbus request and receive the response, the lock has to be
+        acquired by the caller
+
+        :param      modbus_pdu:  The modbus Protocol Data Unit
+        :type       modbus_pdu:  bytes
+        :param      slave_addr:  The slave address
+        :type       slave_addr:  int
+        :param      count:       Flag whether the response contains a count
+        :type       count:       bool
+
+        :returns:   Validated response content
+        :rtype:     bytes
+        """
+        if self._uart is None:
+            return self._host._send_receive(modbus_pdu=modbus_pdu,
+                                            slave_addr=slave_addr,
+                                            count=count)
+
+        # flush the Rx FIFO buffer
+        self._uart.read()
+
+        await self._send(modbus_pdu=modbus_pdu, slave_addr=slave_addr)
+        response = await self._receive()
+
+        return self._host._validate_resp_hdr(response=response,
+                                             slave_addr=slave_addr,
+                                             function_code=modbus_pdu[0],
+                                             count=count)
+
+    async def _send_receive(self,
+                            modbus_pdu: bytes,
+                            slave_addr: int,
+                            count: bool) -> bytes:
+        """
+        Send a Modbus request and receive the response
+
+        :param      modbus_pdu:  The modbus Protocol Data Unit
+        :type       modbus_pdu:  bytes
+        :param      slave_addr:  The slave address
+        :type       slave_addr:  int
+        :param      count:       Flag whether the response contains a count
+        :type       count:       bool
+
+        :returns:   Validated response content
+        :rtype:     bytes
+        """
+        async with self._lock:
+            return await self._request(modbus_pdu=modbus_pdu,
+                                       slave_addr=slave_addr,
+                                       count=count)
+
+    async def send_burst(self, slave_addr: int, requests: list) -> list:
+        """
+        Send several Modbus requests without other requests in between
+
+        A failed request does not stop the burst, its exception is returned
+        instead of the response content
+
+        :param      slave_addr:  The slave address
+        :type       slave_addr:  int
+        :param      requests:    Pairs of modbus PDU and flag whether the
+                                 response contains a count
+        :type       requests:    list
+
+        :returns:   Validated response content or raised exception of each
+                    request
+        :rtype:     list
+        """
+        responses = list()
+
+        async with self._lock:
+            for modbus_pdu, count in requests:
+                try:
+                    responses.append(await self._request(
+                        modbus_pdu=modbus_pdu,
+                        slave_addr=slave_addr,
+                        count=count))
+                except Exception as e:
+                    responses.append(e)
+
+        return responses
+
+    async def read_coils(self,
+                         slave_addr: int,
+                         starting_addr: int,
+                         coil_qty: int) -> list:
+        """
+        Read coils (COILS).
+
+        :param      slave_addr:     The slave address
+        :type       slave_addr:     int
+        :param      starting_addr:  The coil starting address
+        :type       starting_addr:  int
+        :param      coil_qty:       The amount of coils to read
+        :type       coil_qty:       int
+
+        :returns:   State of read coils as list
+        :rtype:     list
+        """
+        modbus_pdu = functions.read_coils(starting_address=starting_addr,
+                                          quantity=coil_qty)
+        response = await self._send_receive(modbus_pdu=modbus_pdu,
+                                            slave_addr=slave_addr,
+                                            count=True)
+
+        return unpack_bits(data=response, quantity=coil_qty)
+
+    async def read_discrete_inputs(self,
+                                   slave_addr: int,
+                                   starting_addr: int,
+                                   input_qty: int) -> list:
+        """
+        Read discrete inputs (ISTS).
+
+        :param      slave_addr:     The slave address
+        :type       slave_addr:     int
+        :param      starting_addr:  The discrete input starting address
+        :type       starting_addr:  int
+        :param      input_qty:      The amount of discrete inputs to read
+        :type       input_qty:      int
+
+        :returns:   State of read discrete inputs as list
+        :rtype:     list
+        """
+        modbus_pdu = functions.read_discrete_inputs(
+            starting_address=starting_addr,
+            quantity=input_qty)
+        response = await self._send_receive(modbus_pdu=modbus_pdu,
+                                            slave_addr=slave_addr,
+                                            count=True)
+
+        return unpack_bits(data=response, quantity=input_qty)
+
+    async def read_holding_registers(self,
+                                     slave_addr: int,
+                                     starting_addr: int,
+                                     register_qty: int,
+                                     signed: bool = True) -> tuple:
+        """
+        Read holding registers (HREGS).
+
+        :param      slave_addr:     The slave address
+        :type       slave_addr:     int
+        :param      starting_addr:  The holding register starting address
+        :type       starting_addr:  int
+        :param      register_qty:   The amount of holding registers to read
+        :type       register_qty:   int
+        :param      signed:         Indicates if signed
+        :type       signed:         bool
+
+        :returns:   State of read holding register as tuple
+        :rtype:     tuple
+        """
+        modbus_pdu = functions.read_holding_registers(
+            starting_address=starting_addr,
+            quantity=register_qty)
+        response = await self._send_receive(modbus_pdu=modbus_pdu,
+                                            slave_addr=slave_addr,
+                                            count=True)
+
+        return functions.to_short(byte_array=response, signed=signed)
+
+    async def read_input_registers(self,
+                                   slave_addr: int,
+                                   starting_addr: int,
+                                   register_qty: int,
+                                   signed: bool = True) -> tuple:
+        """
+        Read input registers (IREGS).
+
+        :param      slave_addr:     The slave address
+        :type       slave_addr:     int
+        :param      starting_addr:  The input register starting address
+        :type       starting_addr:  int
+        :param      register_qty:   The amount of input registers to read
+        :type       register_qty:   int
+        :param      signed:         Indicates if signed
+        :type       signed:         bool
+
+        :returns:   State of read input register as tuple
+        :rtype:     tuple
+        """
+        modbus_pdu = functions.read_input_registers(
+            starting_address=starting_addr,
+            quantity=register_qty)
+        response = await self._send_receive(modbus_pdu=modbus_pdu,
+                                            slave_addr=slave_addr,
+                                            count=True)
+
+        return functions.to_short(byte_array=response, signed=signed)
+
+    async def write_single_coil(self,
+                                slave_addr: int,
+                                output_address: int,
+                                output_value: int) -> bool:
+        """
+        Update a single coil.
+
+        :param      slave_addr:      The slave address
+        :type       slave_addr:      int
+        :param      output_address:  The output address
+        :type       output_address:  int
+        :param      output_value:    The output value, 0xFF00 or 0x0000
+        :type       output_value:    int
+
+        :returns:   Result of operation
+        :rtype:     bool
+        """
+        modbus_pdu = functions.write_single_coil(output_address=output_address,
+                                                 output_value=output_value)
+        response = await self._send_receive(modbus_pdu=modbus_pdu,
+                                            slave_addr=slave_addr,
+                                            count=False)
+
+        if response is None:
+            return False
+
+        return functions.validate_resp_data(
+            data=response,
+            function_code=Const.WRITE_SINGLE_COIL,
+            address=output_address,
+            value=output_value,
+            signed=False)
+
+    async def write_single_register(self,
+                                    slave_addr: int,
+                                    register_address: int,
+                                    register_value: int,
+                                    signed: bool = True) -> bool:
+        """
+        Update a single register.
+
+        :param      slave_addr:        The slave address
+        :type       slave_addr:        int
+        :param      register_address:  The register address
+        :type       register_address:  int
+        :param      register_value:    The register value
+        :type       register_value:    int
+        :param      signed:            Indicates if signed
+        :type       signed:            bool
+
+        :returns:   Result of operation
+        :rtype:     bool
+        """
+        modbus_pdu = functions.write_single_register(
+            register_address=register_address,
+            register_value=register_value,
+            signed=signed)
+        response = await self._send_receive(modbus_pdu=modbus_pdu,
+                                            slave_addr=slave_addr,
+                                            count=False)
+
+        if response is None:
+            return False
+
+        return functions.validate_resp_data(
+            data=response,
+            function_code=Const.WRITE_SINGLE_REGISTER,
+            address=register_address,
+            value=register_value,
+            signed=signed)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Boot Profile
+
+Timeline of the boot phases with their duration and the free RAM after each
+phase, as well as the cost of modules imported on first use
+"""
+
+# system packages
+import gc
+import sys
+import time
+
+
+class BootPhase(object):
+    """Single phase of the boot timeline"""
+    __slots__ = ('name', 'start', 'duration', 'free_ram')
+
+    def __init__(self, name: str, start: int) -> None:
+        self.name = name
+        # milliseconds since power on
+        self.start = start
+        self.duration = None
+        self.free_ram = None
+
+
+class BootProfile(object):
+    """
+    Recorder of the boot phases
+
+    The time before the profile is created, e.g. to import all modules, is
+    recorded as first phase, as the millisecond ticks start at power on.
+    Phases are recorded between start and stop and can not be nested.
+    """
+    def __init__(self, first_phase: str = 'imports') -> None:
+        self._phases = list()
+        self._imports = list()
+        self._current = None
+        self._finished = None
+
+        now = time.ticks_ms()
+        phase = BootPhase(name=first_phase, start=0)
+        phase.duration = now
+        phase.free_ram = gc.mem_free()
+        self._phases.append(phase)
+
+    def start(self, name: str) -> None:
+        """
+        Start recording a phase
+
+        :param      name:  The phase name
+        :type       name:  str
+        """
+        self._current = BootPhase(name=name, start=time.ticks_ms())
+
+    def stop(self) -> None:
+        """Stop recording the current phase"""
+        phase = self._current
+        self._current = None
+
+        if phase is not None:
+            phase.duration = time.ticks_diff(time.ticks_ms(), phase.start)
+            phase.free_ram = gc.mem_free()
+            self._phases.append(phase)
+
+    def finish(self) -> None:
+        """Record the end of the boot, all later calls are ignored"""
+        if self._finished is None:
+            self._finished = time.ticks_ms()
+
+    def load(self, module: str):
+        """
+        Import a module on first use and record its import time and RAM
+
+        Modules already imported, e.g. by another module, are not recorded
+
+        :param      module:  The absolute module name
+        :type       module:  str
+
+        :returns:   The module
+        :rtype:     module
+        """
+        loaded = sys.modules.get(module, None)
+        if loaded is not None:
+            return loaded
+
+        gc.collect()
+        free_ram = gc.mem_free()
+        start = time.ticks_ms()
+
+        __import__(module)
+
+        duration = time.ticks_diff(time.ticks_ms(), start)
+        gc.collect()
+        self._imports.append({
+            'module': module,
+            'start': start,
+            'duration': duration,
+            'ram': free_ram - gc.mem_free(),
+        })
+
+        return sys.modules[module]
+
+    @property
+    def total(self) -> int:
+        """
+        Get the time from power on until the end of the boot
+
+        :returns:   Boot duration in milliseconds, None if not yet finished
+        :rtype:     int
+        """
+        return self._finished
+
+    def ready(self, name: str) -> int:
+        """
+        Get the time from power on until the end of a phase
+
+        :param      name:  The phase name
+        :type       name:  str
+
+        :returns:   Time in milliseconds, None if not recorded
+        :rtype:     int
+        """
+        for phase in self._phases:
+            if phase.name == name:
+                return phase.start + phase.duration
+
+        return None
+
+    @property
+    def phases(self) -> list:
+        """
+        Get all recorded phases
+
+        :returns:   Name, start since power on, duration in milliseconds and
+                    free RAM in bytes after each phase
+        :rtype:     list
+        """
+        return [{
+            'name': phase.name,
+            'start': phase.start,
+            'duration': phase.duration,
+            'free_ram': phase.free_ram,
+        } for phase in self._phases]
+
+    @property
+    def imports(self) -> list:
+        """
+        Get all modules imported on first use
+
+        :returns:   Name, start since power on and import duration in
+                    milliseconds and used RAM in bytes of each module
+        :rtype:     list
+        """
+        return list(self._imports)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Config Store
+
+Validated and typed system configuration, written atomically to a JSON file
+keeping the previous generation as fallback
+"""
+
+# system packages
+import json
+import os
+
+
+class ConfigField(object):
+    """Single field of the system configuration"""
+    __slots__ = ('name', 'kind', 'default', 'choices', 'minimum', 'maximum',
+                 'check')
+
+    def __init__(self,
+                 name: str,
+                 kind: type,
+                 default,
+                 choices: tuple = None,
+                 minimum: int = None,
+                 maximum: int = None,
+                 check=None) -> None:
+        self.name = name
+        # int, str or list of str
+        self.kind = kind
+        self.default = default
+        self.choices = choices
+        self.minimum = minimum
+        self.maximum = maximum
+        # optional function returning the valid value or raising ValueError
+        self.check = check
+
+    def decode(self, value):
+        """
+        Decode a value of this field, e.g. submitted by a form as string
+
+        :param      value:  The value
+        :type       value:  Union[int, str, list]
+
+        :returns:   The typed and checked value
+        :rtype:     Union[int, str, list]
+
+        :raises     ValueError:  Value is not valid for this field
+        """
+        try:
+            if self.kind is int:
+                if isinstance(value, bool) or isinstance(value, float):
+                    raise ValueError()
+                value = int(value)
+            elif self.kind is list:
+                if isinstance(value, str):
+                    value = [ele.strip() for ele in value.split(',')
+                             if ele.strip()]
+                if (not isinstance(value, list) or
+                        not all(isinstance(ele, str) for ele in value)):
+                    raise ValueError()
+            elif not isinstance(value, str):
+                raise ValueError()
+        except (TypeError, ValueError):
+            raise ValueError('{} shall be {}, not: {}'.
+                             format(self.name, self.kind.__name__, value))
+
+        if self.choices is not None and value not in self.choices:
+            raise ValueError('{} shall be one of {}, not: {}'.
+                             format(self.name, self.choices, value))
+        if ((self.minimum is not None and value < self.minimum) or
+                (self.maximum is not None and value > self.maximum)):
+            raise ValueError('{} shall be in range {}-{}, not: {}'.
+                             format(self.name,
+                                    self.minimum,
+                                    self.maximum,
+                                    value))
+
+        if self.check is not None:
+            value = self.check(value)
+
+        return value
+
+
+class ConfigStore(object):
+    """
+    Atomic, change-aware persistence of the system configuration
+
+    Values are decoded and checked by their field once before they are
+    written, the stored file only contains typed values. A write is skipped
+    if no value changed. The config is written to a temporary file, the
+    current file is kept as previous generation before the temporary file
+    is renamed to the config file. The previous generation is loaded if the
+    config file is missing or corrupt, e.g. after a power loss while saving.
+    """
+    TEMP_SUFFIX = '.tmp'
+    PREVIOUS_SUFFIX = '.bak'
+
+    def __init__(self, path: str, fields: tuple, logger=None) -> None:
+        self._path = path
+        self._fields = dict()
+        for field in fields:
+            self._fields[field.name] = field
+        self._logger = logger
+
+        self._values = dict()
+        for field in fields:
+            self._values[field.name] = field.default
+
+    @property
+    def path(self) -> str:
+        """
+        Get the path of the config file
+
+        :returns:   Path to the config file
+        :rtype:     str
+        """
+        return self._path
+
+    @property
+    def values(self) -> dict:
+        """
+        Get the current config values
+
+        :returns:   Typed values by field name
+        :rtype:     dict
+        """
+        return dict(self._values)
+
+    def _log(self, msg: str) -> None:
+        if self._logger is not None:
+            self._logger.warning(msg)
+
+    def decode(self, data: dict) -> dict:
+        """
+        Decode the values of known fields
+
+        :param      data:  The values by field name
+        :type       data:  dict
+
+        :returns:   Typed values of known fields, other keys are dropped
+        :rtype:     dict
+
+        :raises     ValueError:  A value is not valid for its field
+        """
+        decoded = dict()
+
+        for name, value in data.items():
+            field = self._fields.get(name, None)
+            if field is not None:
+                decoded[name] = field.decode(value)
+
+        return decoded
+
+    def _read(self, path: str) -> dict:
+        """
+        Read and decode a config file
+
+        Invalid values are replaced by the current, default, values
+
+        :param      path:  The path of the file
+        :type       path:  str
+
+        :returns:   Typed values by field name, None if the file is missing
+                    or no valid JSON object
+        :rtype:     dict
+        """
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict):
+            return None
+
+        values = dict(self._values)
+        for name, value in data.items():
+            try:
+                values.update(self.decode(data={name: value}))
+            except ValueError as e:
+                self._log('Using default, {}'.format(e))
+
+        return values
+
+    def load(self) -> dict:
+        """
+        Load the config file, or its previous generation as fallback
+
+        A new config file with the default values is written if neither is
+        found
+
+        :returns:   Typed values by field name
+        :rtype:     dict
+        """
+        values = self._read(path=self._path)
+
+        if values is None:
+            previous_path = self._path + self.PREVIOUS_SUFFIX
+            values = self._read(path=previous_path)
+
+            if values is None:
+                self._log('No valid config file {}, using defaults'.
+                          format(self._path))
+                values = self.values
+            else:
+                self._log('No valid config file {}, using {}'.
+                          format(self._path, previous_path))
+
+            # a corrupt config file shall not become the previous generation
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._write(values=values)
+
+        self._values = values
+
+        return self.values
+
+    def save(self, data: dict) -> list:
+        """
+        Update the config with new values and save it if any value changed
+
+        :param      data:  The new values by field name
+        :type       data:  dict
+
+        :returns:   Names of the changed fields, empty if nothing is written
+        :rtype:     list
+
+        :raises     ValueError:  A value is not valid for its field
+        """
+        decoded = self.decode(data=data)
+
+        changed = [name for name, value in decoded.items()
+                   if self._values.get(name, None) != value]
+        if not changed:
+            return changed
+
+        values = dict(self._values)
+        values.update(decoded)
+        self._write(values=values)
+        self._values = values
+
+        return changed
+
+    def _write(self, values: dict) -> None:
+        """
+        Write the config atomically, keeping the previous generation
+
+        :param      values:  The typed values by field name
+        :type       values:  dict
+        """
+        temp_path = self._path + self.TEMP_SUFFIX
+        previous_path = self._path + self.PREVIOUS_SUFFIX
+
+        with open(temp_path, 'w') as file:
+            json.dump(values, file)
+
+        # FAT does not replace an existing file on rename
+        try:
+            os.remove(previous_path)
+        except OSError:
+            pass
+        try:
+            os.rename(self._path, previous_path)
+        except OSError:
+            # no config file yet
+            pass
+
+        os.rename(temp_path, self._path)
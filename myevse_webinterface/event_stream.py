@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Event Stream
+
+Server-Sent Events stream of the Modbus data collected by the MyEVSE Bridge
+"""
+
+# system packages
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import json
+import time
+
+# custom modules
+from .myevse_bridge import MyEVSEBridge
+
+
+class ModbusEventStream(object):
+    """
+    Server-Sent Events stream of the Modbus data
+
+    The complete data is sent as "snapshot" event, afterwards only the
+    registers changed since the previously sent event are sent as "update"
+    event. The event ID is the data generation prefixed by the epoch of this
+    boot, e.g. "b691ba-42".
+
+    Async generators are not available on MicroPython, the stream implements
+    the async iterator protocol used by microdot for streamed responses.
+    """
+    def __init__(self,
+                 bridge: MyEVSEBridge,
+                 epoch: str = '',
+                 last_generation: int = -1,
+                 check_interval: int = 1,
+                 keepalive_interval: int = 15) -> None:
+        self._bridge = bridge
+        self._epoch = epoch
+        self._last_generation = last_generation
+        self._check_interval = check_interval
+        self._keepalive_interval = keepalive_interval
+
+        self._last_event_ticks = time.ticks_ms()
+        self._last_pull_ticks = self._last_event_ticks
+
+    @property
+    def active(self) -> bool:
+        """
+        Get the activity status of the stream
+
+        microdot stops pulling events as soon as the client has gone, a
+        stream is active as long as events are requested regularly
+
+        :returns:   True if events have been requested recently
+        :rtype:     bool
+        """
+        return (time.ticks_diff(time.ticks_ms(), self._last_pull_ticks) <
+                2 * self._keepalive_interval * 1000)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        while True:
+            self._last_pull_ticks = time.ticks_ms()
+            generation = self._bridge.data_generation
+
+            if generation != self._last_generation:
+                if generation == self._last_generation + 1:
+                    event = 'update'
+                    data = self._bridge.changed_data
+                elif 0 <= self._last_generation < generation:
+                    # client missed some generations
+                    event = 'update'
+                    data = self._bridge.changes_since(
+                        generation=self._last_generation)
+                else:
+                    # new client or generation of a previous boot
+                    event = 'snapshot'
+                    data = self._bridge.client_data
+
+                self._last_generation = generation
+                self._last_event_ticks = self._last_pull_ticks
+
+                return 'id: {}-{}\nevent: {}\ndata: {}\n\n'.format(
+                    self._epoch, generation, event, json.dumps(data))
+
+            if (time.ticks_diff(self._last_pull_ticks,
+                                self._last_event_ticks) >
+                    self._keepalive_interval * 1000):
+                # comment line, writing it fails if the client has gone
+                self._last_event_ticks = self._last_pull_ticks
+                return ': keepalive\n\n'
+
+            await asyncio.sleep(self._check_interval)
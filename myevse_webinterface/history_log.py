@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+History Log
+
+Append-only binary log of Modbus register samples, kept in segment files on
+the flash to survive a reboot
+"""
+
+# system packages
+import _thread
+import os
+import struct
+
+# custom modules
+# pip installed packages
+# https://github.com/brainelectronics/micropython-modules
+# typing not natively supported on MicroPython
+from be_helpers.typing import Generator
+
+
+class HistoryLogSegment(object):
+    """Single segment file of the history log"""
+    __slots__ = ('number', 'header_size', 'names', 'count', 'first_timestamp',
+                 'last_timestamp')
+
+    def __init__(self,
+                 number: int,
+                 header_size: int,
+                 names: list,
+                 count: int = 0,
+                 first_timestamp: int = 0,
+                 last_timestamp: int = 0) -> None:
+        self.number = number
+        self.header_size = header_size
+        self.names = names
+        self.count = count
+        self.first_timestamp = first_timestamp
+        self.last_timestamp = last_timestamp
+
+    @property
+    def size(self) -> int:
+        """
+        Get the size of the segment file
+
+        :returns:   Size of header and all complete records in bytes
+        :rtype:     int
+        """
+        return self.header_size + self.count * HistoryLog.RECORD_SIZE
+
+
+class HistoryLog(object):
+    """
+    Append-only binary log of register samples
+
+    Samples are collected in a preallocated RAM buffer and appended to the
+    latest segment file if the buffer is full or the flush interval elapsed.
+    A new segment is started if the latest one reached the segment size, the
+    register names changed or the time went backwards, e.g. after a reboot
+    without time synchronisation. The oldest segments are removed if the
+    total size exceeds the size limit.
+
+    Each segment starts with a header of the magic bytes, the header size and
+    the comma separated register names, followed by records of timestamp,
+    register name index and value. The timestamps of a segment never
+    decrease, a timestamp is found by a binary search.
+
+    The log is appended by the data collection of the Modbus bridge. With the
+    async collection the appends, and thus the writes of a full buffer, run
+    on the event loop of the webserver, blocking it for the write of a batch.
+    """
+    MAGIC = b'MEH1'
+    HEADER_FORMAT = '<4sH'
+    RECORD_FORMAT = '<IBI'
+    RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+    # number of records read from the file at once
+    READ_CHUNK = 32
+
+    def __init__(self,
+                 path: str,
+                 names: list,
+                 batch_size: int = 64,
+                 flush_interval: int = 300,
+                 segment_size: int = 16 * 1024,
+                 max_size: int = 64 * 1024) -> None:
+        self._path = path
+        self._names = list(names)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._segment_size = segment_size
+        self._max_size = max_size
+
+        self._buffer = bytearray(batch_size * self.RECORD_SIZE)
+        self._buffered = 0
+        self._flushed_timestamp = None
+        self._last_timestamp = 0
+        self._start_segment = False
+        self._lock = _thread.allocate_lock()
+
+        try:
+            os.mkdir(path)
+        except OSError:
+            # folder exists already
+            pass
+
+        self._segments = list()
+        for filename in sorted(os.listdir(path)):
+            if not filename.endswith('.bin'):
+                continue
+            segment = self._load_segment(number=int(filename[:-4]))
+            if segment is not None:
+                self._segments.append(segment)
+
+        if self._segments:
+            latest = self._segments[-1]
+            self._last_timestamp = latest.last_timestamp
+
+            # do not append after an incomplete record
+            if os.stat(self._segment_file(number=latest.number))[6] != \
+                    latest.size:
+                self._start_segment = True
+
+    @property
+    def size(self) -> int:
+        """
+        Get the size of all segment files
+
+        :returns:   Size of all segments in bytes
+        :rtype:     int
+        """
+        return sum(segment.size for segment in self._segments)
+
+    @property
+    def segments(self) -> int:
+        """
+        Get the number of segment files
+
+        :returns:   Number of segments
+        :rtype:     int
+        """
+        return len(self._segments)
+
+    @property
+    def first_timestamp(self) -> int:
+        """
+        Get the timestamp of the oldest logged sample
+
+        :returns:   Timestamp of the oldest sample, 0 if nothing is logged
+        :rtype:     int
+        """
+        for segment in self._segments:
+            if segment.count:
+                return segment.first_timestamp
+
+        return 0
+
+    def _segment_file(self, number: int) -> str:
+        return '{}/{:08d}.bin'.format(self._path, number)
+
+    def _load_segment(self, number: int) -> HistoryLogSegment:
+        """
+        Load the header, first and last record of a segment file
+
+        Incomplete records at the end of the file, e.g. caused by a power
+        loss during writing, are ignored
+
+        :param      number:  The segment number
+        :type       number:  int
+
+        :returns:   The segment, None if the file is no valid segment
+        :rtype:     HistoryLogSegment
+        """
+        filename = self._segment_file(number=number)
+        header_length = struct.calcsize(self.HEADER_FORMAT)
+
+        try:
+            file_size = os.stat(filename)[6]
+            with open(filename, 'rb') as file:
+                magic, header_size = struct.unpack(
+                    self.HEADER_FORMAT, file.read(header_length))
+                if magic != self.MAGIC or header_size > file_size:
+                    return None
+                names = file.read(header_size - header_length).decode()
+
+                segment = HistoryLogSegment(
+                    number=number,
+                    header_size=header_size,
+                    names=names.split(',') if names else [],
+                    count=(file_size - header_size) // self.RECORD_SIZE)
+
+                if segment.count:
+                    segment.first_timestamp = self._read_timestamp(
+                        file=file, segment=segment, index=0)
+                    segment.last_timestamp = self._read_timestamp(
+                        file=file, segment=segment, index=segment.count - 1)
+        except (OSError, ValueError):
+            return None
+
+        return segment
+
+    def _create_segment(self) -> HistoryLogSegment:
+        """
+        Create a new segment file with the header of the current names
+
+        :returns:   The created segment
+        :rtype:     HistoryLogSegment
+        """
+        number = self._segments[-1].number + 1 if self._segments else 0
+        names = ','.join(self._names).encode()
+        header_size = struct.calcsize(self.HEADER_FORMAT) + len(names)
+
+        with open(self._segment_file(number=number), 'wb') as file:
+            file.write(struct.pack(self.HEADER_FORMAT,
+                                   self.MAGIC,
+                                   header_size))
+            file.write(names)
+
+        segment = HistoryLogSegment(number=number,
+                                    header_size=header_size,
+                                    names=list(self._names))
+        self._segments.append(segment)
+
+        return segment
+
+    def _read_timestamp(self,
+                        file,
+                        segment: HistoryLogSegment,
+                        index: int) -> int:
+        file.seek(segment.header_size + index * self.RECORD_SIZE)
+
+        return struct.unpack('<I', file.read(4))[0]
+
+    def _find_index(self,
+                    file,
+                    segment: HistoryLogSegment,
+                    timestamp: int) -> int:
+        """
+        Find the first record of a segment not older than a timestamp
+
+        :param      file:       The opened segment file
+        :type       file:       io.BufferedReader
+        :param      segment:    The segment
+        :type       segment:    HistoryLogSegment
+        :param      timestamp:  The timestamp
+        :type       timestamp:  int
+
+        :returns:   Index of the record, count of records if all are older
+        :rtype:     int
+        """
+        low = 0
+        high = segment.count
+
+        while low < high:
+            middle = (low + high) // 2
+            if self._read_timestamp(file=file,
+                                    segment=segment,
+                                    index=middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _read_records(self,
+                      segment: HistoryLogSegment,
+                      since: int = 0,
+                      count: int = None) -> Generator:
+        """
+        Read the records of a segment in chunks
+
+        :param      segment:  The segment
+        :type       segment:  HistoryLogSegment
+        :param      since:    Skip records older than this timestamp
+        :type       since:    int
+        :param      count:    The number of records to read, all if None
+        :type       count:    int
+
+        :returns:   Generator yielding timestamp, name index and value
+        :rtype:     Generator
+        """
+        if count is None:
+            count = segment.count
+        chunk = bytearray(self.READ_CHUNK * self.RECORD_SIZE)
+
+        with open(self._segment_file(number=segment.number), 'rb') as file:
+            index = 0
+            if since > segment.first_timestamp:
+                index = self._find_index(file=file,
+                                         segment=segment,
+                                         timestamp=since)
+            file.seek(segment.header_size + index * self.RECORD_SIZE)
+
+            while index < count:
+                records = min(self.READ_CHUNK, count - index)
+                file.readinto(chunk)
+
+                for offset in range(records):
+                    yield struct.unpack_from(self.RECORD_FORMAT,
+                                             chunk,
+                                             offset * self.RECORD_SIZE)
+
+                index += records
+
+    def append(self, timestamp: int, values: dict) -> None:
+        """
+        Append samples of registers to the log
+
+        :param      timestamp:  The timestamp of the samples in seconds
+        :type       timestamp:  int
+        :param      values:     The values by register name
+        :type       values:     dict
+        """
+        with self._lock:
+            if timestamp < self._last_timestamp:
+                # time went backwards, the segment would not be sorted
+                self._flush()
+                self._start_segment = True
+                self._flushed_timestamp = None
+            self._last_timestamp = timestamp
+            if self._flushed_timestamp is None:
+                self._flushed_timestamp = timestamp
+
+            for name, value in values.items():
+                if name not in self._names:
+                    continue
+
+                if self._buffered == self._batch_size:
+                    self._flush()
+
+                struct.pack_into(self.RECORD_FORMAT,
+                                 self._buffer,
+                                 self._buffered * self.RECORD_SIZE,
+                                 timestamp,
+                                 self._names.index(name),
+                                 value)
+                self._buffered += 1
+
+            if timestamp - self._flushed_timestamp >= self._flush_interval:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write all buffered samples to the latest segment file"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffered:
+            return
+
+        segment = self._segments[-1] if self._segments else None
+        if (segment is None or
+                self._start_segment or
+                segment.size >= self._segment_size or
+                segment.names != self._names):
+            segment = self._create_segment()
+            self._start_segment = False
+
+        data = memoryview(self._buffer)[:self._buffered * self.RECORD_SIZE]
+        with open(self._segment_file(number=segment.number), 'ab') as file:
+            file.write(data)
+
+        first_timestamp, _, _ = struct.unpack_from(self.RECORD_FORMAT, data)
+        last_timestamp, _, _ = struct.unpack_from(
+            self.RECORD_FORMAT,
+            data,
+            (self._buffered - 1) * self.RECORD_SIZE)
+        if not segment.count:
+            segment.first_timestamp = first_timestamp
+        segment.last_timestamp = last_timestamp
+        segment.count += self._buffered
+
+        self._buffered = 0
+        self._flushed_timestamp = last_timestamp
+
+        # remove the oldest segments, but never the latest one
+        while self.size > self._max_size and len(self._segments) > 1:
+            oldest = self._segments.pop(0)
+            os.remove(self._segment_file(number=oldest.number))
+
+    def samples(self, name: str, since: int = 0) -> Generator:
+        """
+        Get the logged samples of a register from oldest to newest
+
+        Only segments with samples not older than the timestamp are read,
+        starting at the first matching record of a segment. The samples not
+        yet written to the flash follow the ones of the segments.
+
+        :param      name:   The register name
+        :type       name:   str
+        :param      since:  Skip samples older than this timestamp
+        :type       since:  int
+
+        :returns:   Generator yielding timestamp and value of each sample
+        :rtype:     Generator
+        """
+        # segments are only appended or removed by other threads, the records
+        # of this moment are used to neither miss nor repeat a flushed one
+        with self._lock:
+            segments = [(segment, segment.count)
+                        for segment in self._segments]
+            buffered = bytes(
+                memoryview(self._buffer)[:self._buffered * self.RECORD_SIZE])
+
+        for segment, count in segments:
+            if (not count or
+                    segment.last_timestamp < since or
+                    name not in segment.names):
+                continue
+            name_index = segment.names.index(name)
+
+            try:
+                for timestamp, index, value in self._read_records(
+                        segment=segment, since=since, count=count):
+                    if index == name_index:
+                        yield timestamp, value
+            except OSError:
+                # segment has been removed meanwhile
+                continue
+
+        if name not in self._names:
+            return
+        name_index = self._names.index(name)
+
+        for offset in range(0, len(buffered), self.RECORD_SIZE):
+            timestamp, index, value = struct.unpack_from(self.RECORD_FORMAT,
+                                                         buffered,
+                                                         offset)
+            if index == name_index and timestamp >= since:
+                yield timestamp, value
+
+    def restore(self, history) -> None:
+        """
+        Restore the latest logged samples into a register history
+
+        Only the newest segments required to fill the history are read
+
+        :param      history:  The register history
+        :type       history:  RegisterHistory
+        """
+        required = history.depth * len(history.register_names)
+        first = len(self._segments)
+        available = 0
+
+        while first > 0 and available < required:
+            first -= 1
+            available += self._segments[first].count
+
+        for segment in self._segments[first:]:
+            names = segment.names
+            for timestamp, index, value in self._read_records(
+                    segment=segment):
+                if index < len(names) and history.register(names[index]):
+                    history.append(name=names[index],
+                                   timestamp=timestamp,
+                                   value=value)
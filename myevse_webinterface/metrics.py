@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Metrics
+
+System, request latency and Modbus metrics in the Prometheus text format,
+written into a preallocated buffer
+"""
+
+# system packages
+import gc
+import machine
+import os
+import time
+
+# custom modules
+from .register_index import RegisterIndex
+from .route_monitor import LatencyHistogram, RouteLatency
+
+
+class MetricsBuffer(object):
+    """
+    Preallocated buffer of the metrics text
+
+    Text and integers are written into the buffer without creating strings.
+    The written text is read like a file, so the webserver sends it in
+    chunks directly from the buffer.
+    """
+    # maximum time in milliseconds a buffer is kept for reading, e.g. if
+    # the client disconnected before everything has been read
+    READ_TIMEOUT = 10000
+
+    def __init__(self, size: int) -> None:
+        self._buf = bytearray(size)
+        self._length = 0
+        self._position = 0
+        self._read_ticks = None
+
+    @property
+    def length(self) -> int:
+        """
+        Get the length of the written text
+
+        :returns:   Number of written bytes
+        :rtype:     int
+        """
+        return self._length
+
+    @property
+    def busy(self) -> bool:
+        """
+        Get the reading status
+
+        :returns:   Flag whether the written text has not been read yet
+        :rtype:     bool
+        """
+        return (self._read_ticks is not None and
+                time.ticks_diff(time.ticks_ms(),
+                                self._read_ticks) < self.READ_TIMEOUT)
+
+    def clear(self) -> None:
+        """Clear the buffer for writing and mark it as busy until read"""
+        self._length = 0
+        self._position = 0
+        self._read_ticks = time.ticks_ms()
+
+    def _reserve(self, size: int) -> None:
+        if self._length + size > len(self._buf):
+            # only if more registers have been added than accounted for
+            self._buf.extend(bytearray(self._length + size - len(self._buf)))
+
+    def write(self, data: bytes) -> None:
+        """
+        Write bytes
+
+        :param      data:  The data
+        :type       data:  bytes
+        """
+        size = len(data)
+        self._reserve(size=size)
+        self._buf[self._length:self._length + size] = data
+        self._length += size
+
+    def write_int(self, value: int, decimals: int = 0) -> None:
+        """
+        Write an integer as decimal number
+
+        :param      value:     The value
+        :type       value:     int
+        :param      decimals:  The number of decimal places of the value,
+                               e.g. 3 to write milliseconds as seconds
+        :type       decimals:  int
+        """
+        self._reserve(size=24)
+        buf = self._buf
+        position = self._length
+
+        if value < 0:
+            buf[position] = 0x2D    # '-'
+            position += 1
+            value = -value
+
+        # digits are written from the last one, then reversed
+        start = position
+        digits = 0
+        while True:
+            buf[position] = 0x30 + value % 10
+            value //= 10
+            position += 1
+            digits += 1
+            if digits == decimals:
+                buf[position] = 0x2E    # '.'
+                position += 1
+            if value == 0 and digits > decimals:
+                break
+
+        end = position - 1
+        while start < end:
+            buf[start], buf[end] = buf[end], buf[start]
+            start += 1
+            end -= 1
+
+        self._length = position
+
+    def read(self, size: int = -1) -> memoryview:
+        """
+        Read the written text
+
+        :param      size:  The maximum number of bytes, all if negative
+        :type       size:  int
+
+        :returns:   The next chunk of the written text
+        :rtype:     memoryview
+        """
+        start = self._position
+        end = self._length
+        if size >= 0 and start + size < end:
+            end = start + size
+        else:
+            # the webserver stops reading after a short chunk
+            self._read_ticks = None
+        self._position = end
+
+        return memoryview(self._buf)[start:end]
+
+    def close(self) -> None:
+        """Release the buffer for the next writing"""
+        self._read_ticks = None
+
+
+class Metrics(object):
+    """
+    System and Modbus metrics in the Prometheus text format
+
+    The help, type, name and labels of each sample are encoded once, each
+    rendering only writes them and the latest values into the preallocated
+    buffer. Registers with up to two addresses are provided as
+    'myevse_register' with their unit, two addresses are combined to an
+    uint32 value. Other registers, like the UUID, are not provided. The
+    latency histogram of a route is provided after its first request.
+    """
+    PREFIX = 'myevse_'
+    # maximum length of a written value
+    VALUE_SIZE = 24
+
+    def __init__(self,
+                 register_index: RegisterIndex = None,
+                 info: dict = None,
+                 route_latency: RouteLatency = None) -> None:
+        self._size = 0
+
+        labels = ','.join('{}="{}"'.format(key, self._escape(value))
+                          for key, value in sorted((info or {}).items()))
+        self._info = self._sample(name='info',
+                                  kind='gauge',
+                                  description='Software versions',
+                                  labels=labels)
+        self._uptime = self._sample(name='uptime_seconds',
+                                    kind='gauge',
+                                    description='System uptime')
+        self._free_ram = self._sample(name='free_ram_bytes',
+                                      kind='gauge',
+                                      description='Free RAM')
+        self._allocated_ram = self._sample(name='allocated_ram_bytes',
+                                           kind='gauge',
+                                           description='Allocated RAM')
+        self._free_disk = self._sample(name='free_disk_bytes',
+                                       kind='gauge',
+                                       description='Free disk space')
+        self._frequency = self._sample(name='cpu_frequency_hertz',
+                                       kind='gauge',
+                                       description='System frequency')
+
+        self._routes = tuple()
+        if route_latency is not None:
+            self._latency_header = self._header(
+                name='http_request_duration_seconds',
+                kind='histogram',
+                description='Duration of the requests by route')
+            # bucket bounds in seconds, shared by all routes
+            self._latency_bounds = tuple(
+                '{}"}} '.format(bound / 1000).encode()
+                for bound in LatencyHistogram.BOUNDS) + (b'+Inf"} ',)
+
+            routes = list()
+            for url, histogram in sorted(route_latency.histograms.items()):
+                route = 'route="{}"'.format(self._escape(url))
+                # bucket text up to the bound, followed by each bound
+                bucket = self._sample(
+                    name='http_request_duration_seconds_bucket',
+                    labels=route + ',le="')[:-2]
+                self._size += (len(bucket) + self.VALUE_SIZE) * \
+                    len(self._latency_bounds)
+                routes.append((
+                    histogram,
+                    bucket,
+                    self._sample(name='http_request_duration_seconds_sum',
+                                 labels=route),
+                    self._sample(name='http_request_duration_seconds_count',
+                                 labels=route)))
+            self._routes = tuple(routes)
+
+        self._registers = tuple()
+        if register_index is not None:
+            self._modbus_async = self._sample(
+                name='modbus_async',
+                kind='gauge',
+                description='Modbus data collected by tasks instead of '
+                            'threads')
+            self._collection_cycles = self._sample(
+                name='modbus_collection_cycles_total',
+                kind='counter',
+                description='Collection cycles reading due registers')
+            self._block_reads = self._sample(
+                name='modbus_block_reads_total',
+                kind='counter',
+                description='Block reads of the client')
+            self._failed_block_reads = self._sample(
+                name='modbus_failed_block_reads_total',
+                kind='counter',
+                description='Block reads missing at least one register')
+            self._data_changes = self._sample(
+                name='modbus_data_changes_total',
+                kind='counter',
+                description='Collection cycles changing a register value')
+            self._written = self._sample(
+                name='modbus_writes_total',
+                kind='counter',
+                description='Register writes by result',
+                labels='result="written"')
+            self._failed = self._sample(name='modbus_writes_total',
+                                        labels='result="failed"')
+            self._pending = self._sample(name='modbus_pending_writes',
+                                         kind='gauge',
+                                         description='Queued register writes')
+
+            registers = list()
+            description = 'Latest register values'
+            for register in register_index:
+                if register.length > 2:
+                    continue
+                registers.append((register, self._sample(
+                    name='register',
+                    kind='gauge' if description else None,
+                    description=description,
+                    labels='type="{}",name="{}",unit="{}"'.format(
+                        register.reg_type,
+                        register.name,
+                        self._escape(register.unit)))))
+                description = None
+            self._registers = tuple(registers)
+
+        self._buffer = MetricsBuffer(size=self._size)
+
+    def _escape(self, value: str) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').\
+            replace('\n', '\\n')
+
+    def _header(self, name: str, kind: str, description: str) -> bytes:
+        """
+        Encode the help and type of a metric
+
+        :param      name:         The metric name without prefix
+        :type       name:         str
+        :param      kind:         The metric type
+        :type       kind:         str
+        :param      description:  The help text
+        :type       description:  str
+
+        :returns:   Encoded header of the metric
+        :rtype:     bytes
+        """
+        data = '# HELP {0}{1} {2}\n# TYPE {0}{1} {3}\n'.format(
+            self.PREFIX, name, description, kind).encode()
+        self._size += len(data)
+
+        return data
+
+    def _sample(self,
+                name: str,
+                kind: str = None,
+                description: str = None,
+                labels: str = None) -> bytes:
+        """
+        Encode the help, type, name and labels of a sample
+
+        :param      name:         The metric name without prefix
+        :type       name:         str
+        :param      kind:         The metric type, None to omit the header,
+                                  e.g. for further samples of a metric
+        :type       kind:         str
+        :param      description:  The help text
+        :type       description:  str
+        :param      labels:       The labels, e.g. 'result="failed"'
+        :type       labels:       str
+
+        :returns:   Encoded text preceding the value
+        :rtype:     bytes
+        """
+        text = self.PREFIX + name
+        if labels:
+            text += '{' + labels + '}'
+        text += ' '
+
+        data = text.encode()
+        self._size += len(data) + self.VALUE_SIZE
+        if kind is not None:
+            data = self._header(name=name,
+                                kind=kind,
+                                description=description) + data
+
+        return data
+
+    def _write(self,
+               buffer: MetricsBuffer,
+               sample: bytes,
+               value: int,
+               decimals: int = 0) -> None:
+        buffer.write(sample)
+        buffer.write_int(value=value, decimals=decimals)
+        buffer.write(b'\n')
+
+    def _write_latency(self, buffer: MetricsBuffer) -> None:
+        header = self._latency_header if self._routes else None
+
+        for histogram, bucket, total, count in self._routes:
+            if not histogram.count:
+                continue
+
+            if header is not None:
+                buffer.write(header)
+                header = None
+
+            cumulative = 0
+            for index, bound in enumerate(self._latency_bounds):
+                cumulative += histogram.counts[index]
+                buffer.write(bucket)
+                buffer.write(bound)
+                buffer.write_int(value=cumulative)
+                buffer.write(b'\n')
+
+            self._write(buffer=buffer,
+                        sample=total,
+                        value=histogram.sum,
+                        decimals=6)
+            self._write(buffer=buffer, sample=count, value=histogram.count)
+
+    def render(self, bridge=None) -> MetricsBuffer:
+        """
+        Render the latest metrics
+
+        The preallocated buffer is used unless a previous rendering has not
+        yet been read completely, e.g. by a concurrent request
+
+        :param      bridge:  The Modbus bridge, None to omit Modbus metrics
+        :type       bridge:  MyEVSEBridge
+
+        :returns:   Buffer containing the metrics text
+        :rtype:     MetricsBuffer
+        """
+        buffer = self._buffer
+        if buffer.busy:
+            buffer = MetricsBuffer(size=self._size)
+        buffer.clear()
+
+        self._write(buffer=buffer, sample=self._info, value=1)
+        self._write(buffer=buffer,
+                    sample=self._uptime,
+                    value=time.ticks_ms(),
+                    decimals=3)
+        self._write(buffer=buffer, sample=self._free_ram, value=gc.mem_free())
+        self._write(buffer=buffer,
+                    sample=self._allocated_ram,
+                    value=gc.mem_alloc())
+        info = os.statvfs('/')
+        self._write(buffer=buffer,
+                    sample=self._free_disk,
+                    value=info[0] * info[3])
+        self._write(buffer=buffer,
+                    sample=self._frequency,
+                    value=machine.freq())
+
+        self._write_latency(buffer=buffer)
+
+        if bridge is None or not self._registers:
+            return buffer
+
+        write_queue = bridge.write_queue
+        self._write(buffer=buffer,
+                    sample=self._modbus_async,
+                    value=1 if bridge.running_async else 0)
+        self._write(buffer=buffer,
+                    sample=self._collection_cycles,
+                    value=bridge.collection_cycles)
+        self._write(buffer=buffer,
+                    sample=self._block_reads,
+                    value=bridge.block_reads)
+        self._write(buffer=buffer,
+                    sample=self._failed_block_reads,
+                    value=bridge.failed_block_reads)
+        self._write(buffer=buffer,
+                    sample=self._data_changes,
+                    value=bridge.data_generation)
+        self._write(buffer=buffer,
+                    sample=self._written,
+                    value=write_queue.written)
+        self._write(buffer=buffer,
+                    sample=self._failed,
+                    value=write_queue.failed)
+        self._write(buffer=buffer,
+                    sample=self._pending,
+                    value=len(write_queue))
+
+        client_data = bridge.client_data
+        for register, sample in self._registers:
+            register_data = client_data.get(register.reg_type, {}).get(
+                register.name, None)
+            if register_data is None:
+                continue
+
+            value = register_data['val']
+            if isinstance(value, list):
+                # actual a uint32_t value, reconstruct it
+                value = value[0] << 16 | value[1]
+
+            self._write(buffer=buffer, sample=sample, value=int(value))
+
+        return buffer
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Modbus Bits
+
+Packing of coil and discrete input values of multiple bit requests. The
+Modbus specification packs the first bit into the least significant bit of
+the first byte, the umodbus helpers pack and unpack the most significant bit
+first, see micropython-modbus issue #22. Single bit requests are not affected.
+"""
+
+
+def pack_bits(values: list) -> bytes:
+    """
+    Pack bit values, the first value into the least significant bit
+
+    :param      values:  The bit values
+    :type       values:  list
+
+    :returns:   Packed bytes, unused bits of the last byte are zero
+    :rtype:     bytes
+    """
+    packed = bytearray((len(values) + 7) // 8)
+
+    for index, value in enumerate(values):
+        if value:
+            packed[index // 8] |= 1 << (index % 8)
+
+    return bytes(packed)
+
+
+def unpack_bits(data: bytes, quantity: int) -> list:
+    """
+    Unpack bit values, the first value from the least significant bit
+
+    :param      data:      The packed bytes, e.g. of a read response
+    :type       data:      bytes
+    :param      quantity:  The number of bit values
+    :type       quantity:  int
+
+    :returns:   The bit values
+    :rtype:     list
+    """
+    return [bool(data[index // 8] >> (index % 8) & 1)
+            for index in range(quantity)]
@@ -0,0 +1,1234 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+MyEVSE Bridge
+
+Modbus Bridge between the MyEVSE as RTU client and the TCP host, polling the
+registers in blocks planned from a precompiled register index
+"""
+
+# system packages
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import machine
+import select
+import time
+
+# custom modules
+from .async_serial import AsyncSerial
+from .history_log import HistoryLog
+from .modbus_bits import unpack_bits
+from .poll_scheduler import PollScheduler
+from .read_planner import ReadBlock, ReadPlanner
+from .register_history import RegisterHistory
+from .register_index import Register, RegisterIndex
+from .register_profile import RegisterProfile
+from .write_queue import WriteQueue, WriteRequest
+
+# pip installed packages
+# https://github.com/brainelectronics/micropython-modules
+from be_helpers.message import Message
+from be_helpers.modbus_bridge import ModbusBridge
+# https://github.com/brainelectronics/micropython-modbus
+from umodbus import functions
+
+
+class MyEVSEBridge(ModbusBridge):
+    """Modbus Bridge iterating a register index built once at load time"""
+    # time between two checks for requests of the TCP host in milliseconds
+    HOST_POLL_INTERVAL = 10
+    # time between two checks for queued writes of the collection thread in
+    # milliseconds
+    WRITE_CHECK_INTERVAL = 20
+
+    def __init__(self,
+                 register_file: str,
+                 logger=None,
+                 quiet: bool = False,
+                 history_registers: list = None,
+                 history_depth: int = 180,
+                 history_log_path: str = 'history',
+                 history_log_size: int = 0,
+                 history_flush_interval: int = 300):
+        super().__init__(register_file=register_file,
+                         logger=logger,
+                         quiet=quiet)
+
+        self._register_index = RegisterIndex(
+            register_definitions=self.register_definitions)
+        self.logger.debug('Indexed {} registers'.
+                          format(len(self._register_index)))
+
+        # optional block read settings of the client connection
+        connection_config = self.register_definitions.get('CONNECTION', {})
+        self._read_planner = ReadPlanner(
+            register_index=self._register_index,
+            max_gap=connection_config.get('max_gap', 0),
+            max_length=connection_config.get('max_block_length', 125))
+        self.logger.debug('Planned {} block reads'.
+                          format(len(self._read_planner)))
+
+        # latest read content of each register, the blocks are polled by
+        # the scheduler created on starting the data collection
+        self._poll_scheduler = None
+        self._history_timestamp = None
+        self._polled_content = dict()
+        for reg_type in self._register_index.register_types:
+            self._polled_content[reg_type] = dict()
+
+        # writes of single registers, sent before the next block read
+        self._write_queue = WriteQueue()
+
+        # counts of published collection cycles and block reads
+        self._collection_cycles = 0
+        self._block_reads = 0
+        self._failed_block_reads = 0
+
+        # generation of the collected data, increased on every change
+        self._data_generation = 0
+        self._latest_data = dict()
+        self._changed_data = dict()
+
+        # generation of the last change per register, all registers are
+        # added here once, afterwards only the values are updated
+        self._changed_generations = dict()
+        for reg_type in self._register_index.register_types:
+            self._changed_generations[reg_type] = dict()
+            for register in self._register_index.registers(reg_type):
+                self._changed_generations[reg_type][register.name] = 0
+
+        # history of selected registers, unknown names are ignored
+        history_registers = history_registers or []
+        self._history = RegisterHistory(
+            registers=tuple(register for register in self._register_index
+                            if register.name in history_registers),
+            depth=history_depth)
+        self.logger.debug('History of {} uses {} byte'.
+                          format(self._history.register_names,
+                                 self._history.size))
+
+        # persistent log of the history, disabled without size
+        self._history_log = None
+        if history_log_size > 0 and self._history.register_names:
+            try:
+                self._history_log = HistoryLog(
+                    path=history_log_path,
+                    names=self._history.register_names,
+                    flush_interval=history_flush_interval,
+                    max_size=history_log_size)
+                self._history_log.restore(history=self._history)
+                self.logger.debug('Restored history from {} log segments'.
+                                  format(self._history_log.segments))
+            except Exception as e:
+                self.logger.warning('Failed to load history log: {}'.
+                                    format(e))
+
+        # tasks collecting and provisioning the data on the event loop of
+        # the webserver, used instead of the threads of the ModbusBridge
+        self._async_host = None
+        self._collect_task = None
+        self._provision_task = None
+        # data generation provided on the host by the provision task
+        self._host_generation = 0
+        self._host_poller = None
+        self._host_poller_sock = None
+
+        # threads which have not yet returned after being stopped
+        self._collect_thread_running = False
+        self._provision_thread_running = False
+
+    @property
+    def register_index(self) -> RegisterIndex:
+        """
+        Get the register index
+
+        :returns:   Index of all registers, ordered by type and address
+        :rtype:     RegisterIndex
+        """
+        return self._register_index
+
+    @property
+    def read_planner(self) -> ReadPlanner:
+        """
+        Get the plan of block reads
+
+        :returns:   Block reads covering all registers
+        :rtype:     ReadPlanner
+        """
+        return self._read_planner
+
+    @property
+    def history(self) -> RegisterHistory:
+        """
+        Get the register history
+
+        :returns:   History of the selected registers
+        :rtype:     RegisterHistory
+        """
+        return self._history
+
+    @property
+    def history_log(self) -> HistoryLog:
+        """
+        Get the persistent log of the register history
+
+        :returns:   Log of the register history, None if disabled
+        :rtype:     HistoryLog
+        """
+        return self._history_log
+
+    def flush_history_log(self) -> None:
+        """Write all buffered samples of the history log to the flash"""
+        if self._history_log is None:
+            return
+
+        try:
+            self._history_log.flush()
+        except OSError as e:
+            self.logger.warning('Failed to flush history log: {}'.format(e))
+
+    @property
+    def write_queue(self) -> WriteQueue:
+        """
+        Get the queue of register writes
+
+        :returns:   Queue of pending register writes
+        :rtype:     WriteQueue
+        """
+        return self._write_queue
+
+    def queue_write(self, register: Register, value) -> WriteRequest:
+        """
+        Queue a write of a coil or holding register
+
+        The write is sent ahead of the next block read, a pending write of
+        the same register is replaced. In async mode the write is sent
+        right after the currently running RTU request.
+
+        :param      register:  The register
+        :type       register:  Register
+        :param      value:     The value
+        :type       value:     Union[bool, int]
+
+        :returns:   The queued write
+        :rtype:     WriteRequest
+        """
+        request = self._write_queue.put(register=register, value=value)
+
+        if self._collect_task is not None:
+            asyncio.create_task(self._process_writes_async())
+
+        return request
+
+    @property
+    def collection_cycles(self) -> int:
+        """
+        Get the number of collection cycles
+
+        :returns:   Number of cycles which read at least one due block
+        :rtype:     int
+        """
+        return self._collection_cycles
+
+    @property
+    def block_reads(self) -> int:
+        """
+        Get the number of block reads
+
+        :returns:   Number of scheduled block reads
+        :rtype:     int
+        """
+        return self._block_reads
+
+    @property
+    def failed_block_reads(self) -> int:
+        """
+        Get the number of failed block reads
+
+        :returns:   Number of block reads missing at least one register
+        :rtype:     int
+        """
+        return self._failed_block_reads
+
+    @property
+    def data_generation(self) -> int:
+        """
+        Get the generation of the collected client data
+
+        The generation is increased only if a collection cycle changed at
+        least one register value
+
+        :returns:   Monotonically increasing data generation
+        :rtype:     int
+        """
+        return self._data_generation
+
+    @property
+    def changed_data(self) -> dict:
+        """
+        Get the registers changed by the latest data generation
+
+        :returns:   Changed registers in the structure of the client data
+        :rtype:     dict
+        """
+        return self._changed_data
+
+    def _update_data_generation(self, data: dict) -> bool:
+        """
+        Increase the data generation if the given data differs from the
+        previously collected data
+
+        :param      data:  The latest collected client data
+        :type       data:  dict
+
+        :returns:   True if the data changed, False otherwise
+        :rtype:     bool
+        """
+        if data == self._latest_data:
+            return False
+
+        generation = self._data_generation + 1
+        changed_data = dict()
+        for reg_type, registers in data.items():
+            previous_registers = self._latest_data.get(reg_type, {})
+            changed_generations = self._changed_generations.get(reg_type, {})
+
+            for name, register_data in registers.items():
+                if previous_registers.get(name, None) != register_data:
+                    changed_data.setdefault(reg_type, {})[name] = register_data
+
+                    if name in changed_generations:
+                        changed_generations[name] = generation
+
+        self._latest_data = data
+        self._changed_data = changed_data
+        self._data_generation = generation
+
+        return True
+
+    def changes_since(self, generation: int) -> dict:
+        """
+        Get all registers changed after the given data generation
+
+        :param      generation:  The data generation
+        :type       generation:  int
+
+        :returns:   Changed registers in the structure of the client data
+        :rtype:     dict
+        """
+        latest_data = self._latest_data
+        changes = dict()
+
+        for reg_type, registers in self._changed_generations.items():
+            reg_type_data = latest_data.get(reg_type, {})
+
+            for name, changed_generation in registers.items():
+                if changed_generation > generation and name in reg_type_data:
+                    changes.setdefault(reg_type, {})[name] = \
+                        reg_type_data[name]
+
+        return changes
+
+    def _collect_client_data(self,
+                             msg: Message,
+                             interval: int,
+                             lock: int) -> None:
+        """
+        Collect client Modbus data
+
+        The registers are read as soon as their poll interval elapsed, the
+        collection interval is used for registers without a poll interval.
+        The data generation is increased after the data has been published,
+        the register history and its log are extended once per collection
+        interval.
+
+        :param      msg:        The shared message from this thread
+        :type       msg:        Message
+        :param      interval:   The data collection interval in seconds
+        :type       interval:   int
+        :param      lock:       The lock object
+        :type       lock:       _thread.lock
+        """
+        self._collect_thread_running = True
+        self._poll_scheduler = PollScheduler(planner=self.read_planner,
+                                             default_interval=interval)
+        self._history_timestamp = None
+
+        try:
+            while lock.locked():
+                # collect latest data of due registers from client
+                read_content = self.read_due_registers()
+
+                if read_content is not None:
+                    self._publish_client_data(msg=msg,
+                                              read_content=read_content,
+                                              interval=interval)
+
+                # wait for the next due registers or queued writes
+                self._wait_for_due(sleep_time=self._poll_scheduler.sleep_time(
+                    max_time=interval * 1000))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._collect_thread_running = False
+
+        self.logger.debug('Finished collecting client data')
+
+    def _provision_host_data(self, interval: int, lock: int) -> None:
+        """
+        Provision host Modbus data
+
+        :param      interval:   The data synchronisation interval in seconds
+        :type       interval:   int
+        :param      lock:       The lock object
+        :type       lock:       _thread.lock
+        """
+        self._provision_thread_running = True
+
+        try:
+            super()._provision_host_data(interval=interval, lock=lock)
+        finally:
+            self._provision_thread_running = False
+
+    def _wait_for_due(self, sleep_time: int) -> None:
+        """
+        Sleep until the next block read is due, a write has been queued or
+        the collection has been stopped
+
+        :param      sleep_time:  The time until the next block read in ms
+        :type       sleep_time:  int
+        """
+        start_ticks = time.ticks_ms()
+
+        while not self._write_queue and self.collecting_client_data:
+            remaining = sleep_time - time.ticks_diff(time.ticks_ms(),
+                                                     start_ticks)
+            if remaining <= 0:
+                break
+            time.sleep_ms(min(remaining, self.WRITE_CHECK_INTERVAL))
+
+    def _publish_client_data(self,
+                             msg: Message,
+                             read_content: dict,
+                             interval: int) -> None:
+        """
+        Publish collected client data
+
+        The data generation is increased after the data has been published,
+        the register history and its log are extended once per collection
+        interval.
+
+        :param      msg:           The shared message of the client data
+        :type       msg:           Message
+        :param      read_content:  The collected client data
+        :type       read_content:  dict
+        :param      interval:      The data collection interval in seconds
+        :type       interval:      int
+        """
+        msg.set(read_content)
+        self._collection_cycles += 1
+        self._update_data_generation(data=read_content)
+
+        timestamp = time.time()
+        if (self._history_timestamp is None or
+                timestamp - self._history_timestamp >= interval):
+            self._history_timestamp = timestamp
+            self._add_history(timestamp=timestamp, data=read_content)
+
+    def _add_history(self, timestamp: int, data: dict) -> None:
+        """
+        Add collected client data to the register history and its log
+
+        :param      timestamp:  The timestamp of the data in seconds
+        :type       timestamp:  int
+        :param      data:       The collected client data
+        :type       data:       dict
+        """
+        values = self._history.add(timestamp=timestamp, data=data)
+
+        if self._history_log is not None:
+            try:
+                self._history_log.append(timestamp=timestamp, values=values)
+            except OSError as e:
+                self.logger.warning('Failed to log history: {}'.format(e))
+
+    def _read(self,
+              reg_type: str,
+              address: int,
+              length: int,
+              host=None) -> list:
+        """
+        Read consecutive registers of a type from the client
+
+        The read of an async host returns a coroutine to be awaited. Coils and
+        discrete inputs of a blocking host are requested and unpacked here, as
+        umodbus unpacks multiple bits in the wrong order.
+
+        :param      reg_type:  The register type, e.g. 'IREGS'
+        :type       reg_type:  str
+        :param      address:   The starting address
+        :type       address:   int
+        :param      length:    The number of registers to read
+        :type       length:    int
+        :param      host:      The host to read with, the RTU host if None
+        :type       host:      Union[Serial, AsyncSerial]
+
+        :returns:   Read register content
+        :rtype:     list
+        """
+        slave_addr = self.client_unit
+        if host is None:
+            host = self.host
+
+        if reg_type == 'COILS':
+            # Coils (setter+getter) [0, 1], function 01
+            if isinstance(host, AsyncSerial):
+                return host.read_coils(slave_addr=slave_addr,
+                                       starting_addr=address,
+                                       coil_qty=length)
+            return self._read_bits(
+                host=host,
+                modbus_pdu=functions.read_coils(starting_address=address,
+                                                quantity=length),
+                quantity=length)
+        elif reg_type == 'HREGS':
+            # Hregs (setter+getter) [0, 65535], function 03
+            return host.read_holding_registers(
+                slave_addr=slave_addr,
+                starting_addr=address,
+                register_qty=length,
+                signed=False)
+        elif reg_type == 'ISTS':
+            # Ists (only getter) [0, 1], function 02
+            if isinstance(host, AsyncSerial):
+                return host.read_discrete_inputs(slave_addr=slave_addr,
+                                                 starting_addr=address,
+                                                 input_qty=length)
+            return self._read_bits(
+                host=host,
+                modbus_pdu=functions.read_discrete_inputs(
+                    starting_address=address,
+                    quantity=length),
+                quantity=length)
+        else:
+            # Iregs (only getter) [0, 65535], function 04
+            return host.read_input_registers(
+                slave_addr=slave_addr,
+                starting_addr=address,
+                register_qty=length,
+                signed=False)
+
+    def _read_bits(self, host, modbus_pdu: bytes, quantity: int) -> list:
+        """
+        Request coils or discrete inputs with a blocking host
+
+        :param      host:        The host to read with
+        :type       host:        Serial
+        :param      modbus_pdu:  The read request of function 01 or 02
+        :type       modbus_pdu:  bytes
+        :param      quantity:    The number of requested bits
+        :type       quantity:    int
+
+        :returns:   State of the read bits
+        :rtype:     list
+        """
+        response = host._send_receive(modbus_pdu=modbus_pdu,
+                                      slave_addr=self.client_unit,
+                                      count=True)
+
+        return unpack_bits(data=response, quantity=quantity)
+
+    def _read_register(self, register: Register) -> list:
+        """
+        Read a single register from the client
+
+        :param      register:  The register
+        :type       register:  Register
+
+        :returns:   Read register content
+        :rtype:     list
+        """
+        return self._read(reg_type=register.reg_type,
+                          address=register.address,
+                          length=register.length)
+
+    def _write(self,
+               reg_type: str,
+               address: int,
+               value,
+               host=None) -> bool:
+        """
+        Write a single coil or holding register of the client
+
+        The write of an async host returns a coroutine to be awaited
+
+        :param      reg_type:  The register type, 'COILS' or 'HREGS'
+        :type       reg_type:  str
+        :param      address:   The register address
+        :type       address:   int
+        :param      value:     The value
+        :type       value:     Union[bool, int]
+        :param      host:      The host to write with, the RTU host if None
+        :type       host:      Union[Serial, AsyncSerial]
+
+        :returns:   Result of operation
+        :rtype:     bool
+        """
+        slave_addr = self.client_unit
+        if host is None:
+            host = self.host
+
+        if reg_type == 'COILS':
+            # @see lib/uModbus/functions.write_single_coil
+            return host.write_single_coil(
+                slave_addr=slave_addr,
+                output_address=address,
+                output_value=0xFF00 if value is True else 0x0000)
+        else:
+            return host.write_single_register(slave_addr=slave_addr,
+                                              register_address=address,
+                                              register_value=value,
+                                              signed=False)
+
+    def _process_writes(self) -> None:
+        """Send all queued register writes to the client"""
+        while True:
+            request = self._write_queue.pop()
+            if request is None:
+                break
+
+            register = request.register
+            success = False
+            try:
+                success = self._write(reg_type=register.reg_type,
+                                      address=register.address,
+                                      value=request.value)
+            except Exception as e:
+                self.logger.info('Setting {} {} failed, catched: {}'.
+                                 format(register.reg_type,
+                                        register.address,
+                                        e))
+
+            self._write_queue.done(request=request, success=success)
+
+    def _read_block(self, block: ReadBlock) -> list:
+        """
+        Read all registers of a block from the client
+
+        If the block read fails, e.g. as the client does not accept reads of
+        unused addresses, the registers of the block are read one by one in
+        this and all following cycles
+
+        :param      block:  The block
+        :type       block:  ReadBlock
+
+        :returns:   Pairs of register and its read content
+        :rtype:     list
+        """
+        content = list()
+
+        if not block.split:
+            try:
+                values = self._read(reg_type=block.reg_type,
+                                    address=block.address,
+                                    length=block.length)
+                for register in block.registers:
+                    content.append((register,
+                                    block.slice(values=values,
+                                                register=register)))
+
+                return content
+            except Exception as e:
+                if len(block.registers) > 1:
+                    block.split = True
+                self.logger.info('Getting {} block {} failed, catched: {}'.
+                                 format(block.reg_type, block.address, e))
+
+        for register in block.registers:
+            try:
+                content.append((register,
+                                self._read_register(register=register)))
+            except Exception as e:
+                self.logger.info('Getting {} {} failed, catched: {}'.
+                                 format(register.reg_type,
+                                        register.address,
+                                        e))
+
+        return content
+
+    def read_all_registers(self) -> dict:
+        """
+        Read all modbus registers (from client) with the planned block reads.
+
+        :returns:   Dictionary with read register data
+        :rtype:     dict
+        """
+        read_content = dict()
+        for reg_type in self.register_index.register_types:
+            read_content[reg_type] = dict()
+
+        # lock client ressource
+        self._client_usage_lock.acquire()
+
+        # idle until ressource is locked
+        while not self._client_usage_lock.locked():
+            machine.idle()
+
+        for block in self.read_planner:
+            for register, value in self._read_block(block=block):
+                read_content[register.reg_type][register.name] = \
+                    self._content_entry(register=register, value=value)
+
+        # release ressource
+        self._client_usage_lock.release()
+
+        self.logger.debug('Complete read content: {}'.format(read_content))
+
+        return read_content
+
+    def read_due_registers(self) -> dict:
+        """
+        Read all modbus registers (from client) due by their poll interval.
+
+        :returns:   Dictionary with latest register data, None if no
+                    register has been due
+        :rtype:     dict
+        """
+        due_blocks = self._poll_scheduler.due_blocks()
+        if not due_blocks and not self._write_queue:
+            return None
+
+        # lock client ressource
+        self._client_usage_lock.acquire()
+
+        # idle until ressource is locked
+        while not self._client_usage_lock.locked():
+            machine.idle()
+
+        for index in due_blocks:
+            # queued writes jump ahead of the remaining block reads
+            self._process_writes()
+
+            block = self._poll_scheduler.block(index=index)
+            self._store_block_content(index=index,
+                                      content=self._read_block(block=block))
+        self._process_writes()
+
+        # release ressource
+        self._client_usage_lock.release()
+
+        if not due_blocks:
+            return None
+
+        return self._polled_data()
+
+    def _store_block_content(self, index: int, content: list) -> None:
+        """
+        Store the content read of a scheduled block and schedule its next read
+
+        :param      index:    The block index
+        :type       index:    int
+        :param      content:  Pairs of register and its read content
+        :type       content:  list
+        """
+        for register, value in content:
+            self._polled_content[register.reg_type][register.name] = \
+                self._content_entry(register=register, value=value)
+
+        success = len(content) == len(self._poll_scheduler.block(
+            index=index).registers)
+        self._block_reads += 1
+        if not success:
+            self._failed_block_reads += 1
+
+        self._poll_scheduler.done(index=index, success=success)
+
+    def _polled_data(self) -> dict:
+        """
+        Get the latest content of all polled registers
+
+        :returns:   Dictionary with latest register data
+        :rtype:     dict
+        """
+        # new dicts, the previously published data stays untouched
+        read_content = dict()
+        for reg_type, registers in self._polled_content.items():
+            read_content[reg_type] = dict(registers)
+
+        self.logger.debug('Complete read content: {}'.format(read_content))
+
+        return read_content
+
+    def _content_entry(self, register: Register, value: list) -> dict:
+        """
+        Get the client data entry of a register
+
+        :param      register:  The register
+        :type       register:  Register
+        :param      value:     The read register content
+        :type       value:     list
+
+        :returns:   Register address and value
+        :rtype:     dict
+        """
+        if len(value) == 1:
+            # only a single value
+            value = value[0]
+        else:
+            # convert the tuple to list to be JSON conform
+            value = list(value)
+
+        return {
+            'register': register.address,
+            'val': value
+        }
+
+    @property
+    def running_async(self) -> bool:
+        """
+        Get the status of the async data collection and provisioning
+
+        :returns:   Flag whether the tasks have been started and are still
+                    running
+        :rtype:     bool
+        """
+        return (self._collect_task is not None and
+                not self._collect_task.done())
+
+    def start_async(self) -> None:
+        """
+        Start collecting client data and provisioning host data as tasks
+
+        The tasks are run by the event loop of the webserver, the RTU requests
+        yield to the webserver while waiting for the client instead of
+        blocking. Use this instead of the collection and provision threads.
+        """
+        if self.running_async:
+            return
+
+        # tasks of a previous start which have ended unexpectedly
+        self.stop_async()
+
+        if self._async_host is None:
+            self._async_host = AsyncSerial(host=self.host)
+
+        self._collect_task = asyncio.create_task(
+            self._collect_client_data_async(msg=self._client_data_msg,
+                                            interval=self.collection_interval))
+        self._provision_task = asyncio.create_task(
+            self._provision_host_data_async(
+                interval=self.synchronisation_interval))
+        self.logger.info('Collecting client data and provisioning host data '
+                         'started as tasks')
+
+    def stop_async(self) -> None:
+        """
+        Stop collecting client data and provisioning host data tasks
+
+        The tasks are cancelled at their next await, a running RTU request is
+        not finished
+        """
+        if self._collect_task is None:
+            return
+
+        for task in (self._collect_task, self._provision_task):
+            if task is not None:
+                task.cancel()
+
+        self._collect_task = None
+        self._provision_task = None
+        self.logger.info('Collecting client data and provisioning host data '
+                         'stopped')
+
+    @property
+    def stopped(self) -> bool:
+        """
+        Get the stop status of the data collection and provisioning
+
+        :returns:   Flag whether no thread or task is running anymore
+        :rtype:     bool
+        """
+        return not (self._collect_thread_running or
+                    self._provision_thread_running or
+                    self._collect_task is not None)
+
+    async def stop(self, timeout: int = 10000) -> bool:
+        """
+        Stop collecting client data and provisioning host data and wait until
+        all threads and tasks have finished
+
+        Threads finish their current RTU request or synchronisation, tasks
+        are cancelled at their next await. The event loop is not blocked
+        while waiting.
+
+        :param      timeout:  The maximum time to wait in milliseconds
+        :type       timeout:  int
+
+        :returns:   Flag whether all threads and tasks finished in time
+        :rtype:     bool
+        """
+        start_ticks = time.ticks_ms()
+        tasks = [task for task in (self._collect_task, self._provision_task)
+                 if task is not None]
+
+        self.stop_async()
+        self.collecting_client_data = False
+        self.provisioning_host_data = False
+
+        while (not self.stopped or
+                any(not task.done() for task in tasks)):
+            if time.ticks_diff(time.ticks_ms(), start_ticks) > timeout:
+                self.logger.warning('Data collection and provisioning not '
+                                    'stopped within {}ms'.format(timeout))
+                return False
+            await asyncio.sleep(self.HOST_POLL_INTERVAL / 1000)
+
+        self.logger.debug('Data collection and provisioning stopped after '
+                          '{}ms'.format(time.ticks_diff(time.ticks_ms(),
+                                                        start_ticks)))
+
+        return True
+
+    async def _collect_client_data_async(self,
+                                         msg: Message,
+                                         interval: int) -> None:
+        """
+        Collect client Modbus data on the event loop
+
+        @see _collect_client_data
+
+        :param      msg:        The shared message of the client data
+        :type       msg:        Message
+        :param      interval:   The data collection interval in seconds
+        :type       interval:   int
+        """
+        self._poll_scheduler = PollScheduler(planner=self.read_planner,
+                                             default_interval=interval)
+        self._history_timestamp = None
+
+        while True:
+            try:
+                # collect latest data of due registers from client
+                read_content = await self.read_due_registers_async()
+
+                if read_content is not None:
+                    self._publish_client_data(msg=msg,
+                                              read_content=read_content,
+                                              interval=interval)
+            except Exception as e:
+                # a failed cycle shall not end the task
+                self.logger.warning('Collecting client data failed, '
+                                    'catched: {}'.format(e))
+
+            # wait for the next due registers
+            await asyncio.sleep(self._poll_scheduler.sleep_time(
+                max_time=interval * 1000) / 1000)
+
+    async def _provision_host_data_async(self, interval: int) -> None:
+        """
+        Provision host Modbus data on the event loop
+
+        Requests of the TCP host are only processed if one is pending, as
+        processing blocks while waiting for a request of a connected host.
+        Only the registers changed since the previous synchronisation are
+        updated on the host.
+
+        :param      interval:   The data synchronisation interval in seconds
+        :type       interval:   int
+        """
+        last_update = time.time()
+
+        while True:
+            try:
+                if self._host_request_pending():
+                    # serve requests as host
+                    self.client.process()
+
+                # check time for data synchronisation
+                if time.time() > (last_update + interval):
+                    last_update = time.time()
+
+                    # update data of client with latest changed host data
+                    await self._update_client_data_async()
+
+                    # update data on host with latest data of client
+                    await self._update_host_data_async()
+            except Exception as e:
+                # a failed cycle shall not end the task
+                self.logger.warning('Provisioning host data failed, '
+                                    'catched: {}'.format(e))
+
+            await asyncio.sleep(self.HOST_POLL_INTERVAL / 1000)
+
+    def _host_request_pending(self) -> bool:
+        """
+        Check for a pending connection or request of the TCP host
+
+        :returns:   True if a request can be processed without waiting
+        :rtype:     bool
+        """
+        itf = getattr(self.client, '_itf', None)
+        server_sock = getattr(itf, '_sock', None)
+
+        if server_sock is None:
+            # no TCP server socket to check, always process
+            return True
+
+        client_sock = itf._client_sock
+        if (self._host_poller is None or
+                client_sock is not self._host_poller_sock):
+            # (re)register the sockets after a new host connected
+            self._host_poller = select.poll()
+            self._host_poller.register(server_sock, select.POLLIN)
+            if client_sock is not None:
+                self._host_poller.register(client_sock, select.POLLIN)
+            self._host_poller_sock = client_sock
+
+        return bool(self._host_poller.poll(0))
+
+    async def _update_host_data_async(self) -> None:
+        """
+        Update host Modbus data with the client data changed since the
+        previous update
+        """
+        generation = self.data_generation
+        changes = self.changes_since(generation=self._host_generation)
+        self._host_generation = generation
+
+        for reg_type in ['COILS', 'HREGS', 'ISTS', 'IREGS']:
+            self._set_host_registers(reg_type=reg_type,
+                                     registers=changes.get(reg_type, {}))
+
+            # let the webserver run between the register types
+            await asyncio.sleep(0)
+
+    def _set_host_registers(self, reg_type: str, registers: dict) -> None:
+        """
+        Set registers of a type on the host
+
+        :param      reg_type:   The register type, e.g. 'IREGS'
+        :type       reg_type:   str
+        :param      registers:  The client data of the registers
+        :type       registers:  dict
+        """
+        _client = self.client
+
+        for val in registers.values():
+            address = val['register']
+            value = val['val']
+
+            # set register will add it if not yet there
+            if reg_type == 'COILS':
+                _client.set_coil(address=address, value=value)
+            elif reg_type == 'HREGS':
+                _client.set_hreg(address=address, value=value)
+            elif reg_type == 'ISTS':
+                _client.set_ist(address=address, value=value)
+            elif reg_type == 'IREGS':
+                _client.set_ireg(address=address, value=value)
+
+    async def _update_client_data_async(self) -> None:
+        """Update client Modbus data with latest changed data of host"""
+        _changed_registers = self.client.changed_registers
+
+        for reg_type in ['COILS', 'HREGS']:
+            changed = list(_changed_registers.get(reg_type, {}).items())
+
+            for reg, data in changed:
+                success = await self.write_register_async(reg_type=reg_type,
+                                                          address=int(reg),
+                                                          value=data['val'])
+                if not success:
+                    self.logger.info('Try updating {} {} in next run again'.
+                                     format(reg_type, reg))
+                    continue
+
+                try:
+                    self.client._remove_changed_register(
+                        reg_type=reg_type,
+                        address=int(reg),
+                        timestamp=data['time'])
+                except Exception as e:
+                    self.logger.info('Failed to remove {}, catched: {}'.
+                                     format(reg, e))
+
+    async def write_register_async(self,
+                                   reg_type: str,
+                                   address: int,
+                                   value) -> bool:
+        """
+        Write a single coil or holding register of the client
+
+        :param      reg_type:  The register type, 'COILS' or 'HREGS'
+        :type       reg_type:  str
+        :param      address:   The register address
+        :type       address:   int
+        :param      value:     The value
+        :type       value:     Union[bool, int]
+
+        :returns:   Result of operation
+        :rtype:     bool
+        """
+        try:
+            return await self._write(reg_type=reg_type,
+                                     address=address,
+                                     value=value,
+                                     host=self._async_host)
+        except Exception as e:
+            self.logger.info('Setting {} {} failed, catched: {}'.
+                             format(reg_type, address, e))
+
+        return False
+
+    async def _process_writes_async(self) -> None:
+        """Send all queued register writes to the client on the event loop"""
+        while True:
+            request = self._write_queue.pop()
+            if request is None:
+                break
+
+            register = request.register
+            success = await self.write_register_async(
+                reg_type=register.reg_type,
+                address=register.address,
+                value=request.value)
+
+            self._write_queue.done(request=request, success=success)
+
+    async def _read_block_async(self, block: ReadBlock) -> list:
+        """
+        Read all registers of a block from the client on the event loop
+
+        @see _read_block
+
+        :param      block:  The block
+        :type       block:  ReadBlock
+
+        :returns:   Pairs of register and its read content
+        :rtype:     list
+        """
+        content = list()
+
+        if not block.split:
+            try:
+                values = await self._read(reg_type=block.reg_type,
+                                          address=block.address,
+                                          length=block.length,
+                                          host=self._async_host)
+                for register in block.registers:
+                    content.append((register,
+                                    block.slice(values=values,
+                                                register=register)))
+
+                return content
+            except Exception as e:
+                if len(block.registers) > 1:
+                    block.split = True
+                self.logger.info('Getting {} block {} failed, catched: {}'.
+                                 format(block.reg_type, block.address, e))
+
+        for register in block.registers:
+            try:
+                content.append((register,
+                                await self._read(reg_type=register.reg_type,
+                                                 address=register.address,
+                                                 length=register.length,
+                                                 host=self._async_host)))
+            except Exception as e:
+                self.logger.info('Getting {} {} failed, catched: {}'.
+                                 format(register.reg_type,
+                                        register.address,
+                                        e))
+
+        return content
+
+    async def read_due_registers_async(self) -> dict:
+        """
+        Read all modbus registers (from client) due by their poll interval on
+        the event loop.
+
+        :returns:   Dictionary with latest register data, None if no
+                    register has been due
+        :rtype:     dict
+        """
+        due_blocks = self._poll_scheduler.due_blocks()
+        if not due_blocks:
+            return None
+
+        for index in due_blocks:
+            # queued writes jump ahead of the remaining block reads
+            await self._process_writes_async()
+
+            block = self._poll_scheduler.block(index=index)
+            self._store_block_content(
+                index=index,
+                content=await self._read_block_async(block=block))
+
+        return self._polled_data()
+
+    def _send_burst(self, requests: list) -> list:
+        """
+        Send several Modbus requests to the client one after another
+
+        @see AsyncSerial.send_burst
+
+        :param      requests:  Pairs of modbus PDU and flag whether the
+                               response contains a count
+        :type       requests:  list
+
+        :returns:   Validated response content or raised exception of each
+                    request
+        :rtype:     list
+        """
+        responses = list()
+
+        for modbus_pdu, count in requests:
+            try:
+                responses.append(self.host._send_receive(
+                    modbus_pdu=modbus_pdu,
+                    slave_addr=self.client_unit,
+                    count=count))
+            except Exception as e:
+                responses.append(e)
+
+        return responses
+
+    async def apply_profile(self, profile: RegisterProfile) -> dict:
+        """
+        Write all registers of a profile and read them back to verify them
+
+        All writes and reads are sent as a single burst, no block read or
+        queued write of the data collection is sent in between. Without the
+        async mode the burst waits for the collection thread to release the
+        client without blocking the event loop.
+
+        :param      profile:  The profile
+        :type       profile:  RegisterProfile
+
+        :returns:   Success, profile and read back value by register name
+        :rtype:     dict
+        """
+        requests = profile.requests()
+
+        if self._collect_task is not None:
+            responses = await self._async_host.send_burst(
+                slave_addr=self.client_unit,
+                requests=requests)
+        else:
+            while not self._client_usage_lock.acquire(0):
+                await asyncio.sleep(self.WRITE_CHECK_INTERVAL / 1000)
+
+            try:
+                responses = self._send_burst(requests=requests)
+            finally:
+                self._client_usage_lock.release()
+
+        for request, response in zip(requests, responses):
+            if isinstance(response, Exception):
+                self.logger.info('Profile request {} failed, catched: {}'.
+                                 format(request[0][0], response))
+
+        return profile.results(responses=responses)
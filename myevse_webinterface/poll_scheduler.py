@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Poll Scheduler
+
+Deadline based scheduling of the planned block reads, polling each block at
+the interval of its registers
+"""
+
+# system packages
+import time
+
+# custom modules
+from .read_planner import ReadPlanner
+
+
+class PollScheduler(object):
+    """
+    Deadline based scheduler of block reads
+
+    Every block gets a deadline, blocks are due as soon as their deadline
+    passed. After reading, the next deadline is the previous one plus the
+    poll interval of the block. Blocks with a poll interval of zero are
+    only read until they have been read successfully once.
+    """
+    def __init__(self, planner: ReadPlanner, default_interval: int) -> None:
+        self._blocks = list(planner)
+        self._default_interval_ms = default_interval * 1000
+        self._intervals_ms = list()
+        # all blocks are due immediately
+        now = time.ticks_ms()
+        self._deadlines = list()
+
+        for block in self._blocks:
+            if block.poll_interval is None:
+                self._intervals_ms.append(self._default_interval_ms)
+            else:
+                self._intervals_ms.append(int(block.poll_interval * 1000))
+            self._deadlines.append(now)
+
+    def due_blocks(self) -> list:
+        """
+        Get all blocks whose deadline passed
+
+        :returns:   Indices of the due blocks, shortest poll interval first
+        :rtype:     list
+        """
+        now = time.ticks_ms()
+
+        due_blocks = [index for index, deadline in enumerate(self._deadlines)
+                      if deadline is not None and
+                      time.ticks_diff(now, deadline) >= 0]
+        due_blocks.sort(key=lambda index: self._intervals_ms[index])
+
+        return due_blocks
+
+    def block(self, index: int):
+        """
+        Get a scheduled block
+
+        :param      index:  The block index
+        :type       index:  int
+
+        :returns:   The block
+        :rtype:     ReadBlock
+        """
+        return self._blocks[index]
+
+    def done(self, index: int, success: bool = True) -> None:
+        """
+        Schedule the next read of a block after it has been read
+
+        :param      index:    The block index
+        :type       index:    int
+        :param      success:  Flag whether all registers have been read
+        :type       success:  bool
+        """
+        now = time.ticks_ms()
+        interval = self._intervals_ms[index]
+
+        if interval == 0:
+            if success:
+                # static registers are read once
+                self._deadlines[index] = None
+                return
+            # retry at the default interval
+            interval = self._default_interval_ms
+
+        deadline = time.ticks_add(self._deadlines[index], interval)
+        if time.ticks_diff(deadline, now) <= 0:
+            # fell behind, do not try to catch up with missed reads
+            deadline = time.ticks_add(now, interval)
+        self._deadlines[index] = deadline
+
+    def sleep_time(self, max_time: int) -> int:
+        """
+        Get the time until the next deadline
+
+        :param      max_time:  The maximum time in milliseconds
+        :type       max_time:  int
+
+        :returns:   Time in milliseconds, 0 if a block is due
+        :rtype:     int
+        """
+        now = time.ticks_ms()
+        result = max_time
+
+        for deadline in self._deadlines:
+            if deadline is not None:
+                result = min(result, time.ticks_diff(deadline, now))
+
+        return max(result, 0)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Read Planner
+
+Plan of block reads covering all indexed Modbus registers with a minimal
+number of RTU transactions
+"""
+
+# custom modules
+from .register_index import RegisterIndex
+
+
+class ReadBlock(object):
+    """Consecutive addresses of a register type read by a single request"""
+    __slots__ = ('reg_type', 'address', 'length', 'poll_interval',
+                 'registers', 'split')
+
+    def __init__(self,
+                 reg_type: str,
+                 address: int,
+                 length: int,
+                 poll_interval: int = None) -> None:
+        self.reg_type = reg_type
+        self.address = address
+        self.length = length
+        # poll interval shared by all registers of this block
+        self.poll_interval = poll_interval
+        self.registers = list()
+        # read the registers one by one, e.g. after a failed block read
+        self.split = False
+
+    def __repr__(self) -> str:
+        return '{}({}, {}, {})'.format(self.__class__.__name__,
+                                       self.reg_type,
+                                       self.address,
+                                       self.length)
+
+    def slice(self, values: list, register) -> list:
+        """
+        Get the values of a register from the values read for this block
+
+        :param      values:    The values read for this block
+        :type       values:    list
+        :param      register:  The register of this block
+        :type       register:  Register
+
+        :returns:   Values of the register
+        :rtype:     list
+        """
+        offset = register.address - self.address
+
+        return values[offset:offset + register.length]
+
+
+class ReadPlanner(object):
+    """
+    Plan of block reads for all registers of an index
+
+    Registers of the same type and poll interval are combined into a block
+    as long as the gap of unused or otherwise polled addresses to the
+    previous register does not exceed the maximum gap and the block does not
+    exceed the maximum length
+    """
+    # maximum quantity of a single read request by the Modbus specification
+    MAX_LENGTHS = {
+        'COILS': 2000,
+        'ISTS': 2000,
+        'HREGS': 125,
+        'IREGS': 125,
+    }
+
+    def __init__(self,
+                 register_index: RegisterIndex,
+                 max_gap: int = 0,
+                 max_length: int = 125) -> None:
+        self._max_gap = max_gap
+        self._blocks = list()
+
+        for reg_type in register_index.register_types:
+            type_max_length = min(max_length, self.MAX_LENGTHS[reg_type])
+            # latest block of each poll interval
+            blocks = dict()
+
+            for register in register_index.registers(reg_type):
+                end = register.address + register.length
+                block = blocks.get(register.poll_interval, None)
+
+                if (block is None or
+                        register.address - (block.address + block.length) >
+                        max_gap or
+                        end - block.address > type_max_length):
+                    block = ReadBlock(reg_type=reg_type,
+                                      address=register.address,
+                                      length=register.length,
+                                      poll_interval=register.poll_interval)
+                    blocks[register.poll_interval] = block
+                    self._blocks.append(block)
+                else:
+                    block.length = max(block.length, end - block.address)
+
+                block.registers.append(register)
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    @property
+    def max_gap(self) -> int:
+        """
+        Get the maximum number of unused addresses read within a block
+
+        :returns:   Maximum gap between registers of a block
+        :rtype:     int
+        """
+        return self._max_gap
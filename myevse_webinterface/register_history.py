@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Register History
+
+Time series of selected Modbus register values, kept in fixed size ring
+buffers with a constant memory footprint
+"""
+
+# system packages
+from array import array
+
+# custom modules
+from .register_index import Register
+
+# pip installed packages
+# https://github.com/brainelectronics/micropython-modules
+# typing not natively supported on MicroPython
+from be_helpers.typing import Callable, Generator
+
+
+class RingBuffer(object):
+    """Fixed size ring buffer of timestamped unsigned 32 bit values"""
+    # 4 byte unsigned int on MicroPython and CPython
+    TYPECODE = 'I'
+
+    def __init__(self, depth: int) -> None:
+        self._depth = depth
+        self._timestamps = array(self.TYPECODE, (0 for _ in range(depth)))
+        self._values = array(self.TYPECODE, (0 for _ in range(depth)))
+        # index of the next sample to write
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def depth(self) -> int:
+        """
+        Get the maximum number of samples
+
+        :returns:   Maximum number of samples kept
+        :rtype:     int
+        """
+        return self._depth
+
+    @property
+    def size(self) -> int:
+        """
+        Get the memory used by the samples
+
+        :returns:   Size of the sample arrays in bytes
+        :rtype:     int
+        """
+        return self._depth * (self._timestamps.itemsize +
+                              self._values.itemsize)
+
+    def append(self, timestamp: int, value: int) -> None:
+        """
+        Append a sample, the oldest sample is overwritten if the buffer is
+        full
+
+        :param      timestamp:  The timestamp in seconds
+        :type       timestamp:  int
+        :param      value:      The value
+        :type       value:      int
+        """
+        head = self._head
+        self._timestamps[head] = timestamp
+        self._values[head] = value
+
+        self._head = (head + 1) % self._depth
+        if self._count < self._depth:
+            self._count += 1
+
+    def samples(self, since: int = 0) -> Generator:
+        """
+        Get the samples from oldest to newest
+
+        :param      since:  Skip samples older than this timestamp
+        :type       since:  int
+
+        :returns:   Generator yielding timestamp and value of each sample
+        :rtype:     Generator
+        """
+        count = self._count
+        start = (self._head - count) % self._depth
+
+        for offset in range(count):
+            index = (start + offset) % self._depth
+            timestamp = self._timestamps[index]
+            if timestamp >= since:
+                yield timestamp, self._values[index]
+
+
+class RegisterHistory(object):
+    """
+    History of selected Modbus registers
+
+    Each register gets a ring buffer of the same depth, the memory footprint
+    is allocated once and does not grow afterwards
+    """
+    def __init__(self, registers: tuple, depth: int = 180) -> None:
+        self._depth = depth
+        self._registers = dict()
+        self._buffers = dict()
+
+        for register in registers:
+            self._registers[register.name] = register
+            self._buffers[register.name] = RingBuffer(depth=depth)
+
+    @property
+    def depth(self) -> int:
+        """
+        Get the number of samples kept per register
+
+        :returns:   Number of samples per register
+        :rtype:     int
+        """
+        return self._depth
+
+    @property
+    def size(self) -> int:
+        """
+        Get the memory used by the samples of all registers
+
+        :returns:   Size of all sample arrays in bytes
+        :rtype:     int
+        """
+        return sum(buffer.size for buffer in self._buffers.values())
+
+    @property
+    def register_names(self) -> list:
+        """
+        Get the names of all registers with a history
+
+        :returns:   Sorted register names
+        :rtype:     list
+        """
+        return sorted(self._registers)
+
+    def register(self, name: str) -> Register:
+        """
+        Get a register with a history
+
+        :param      name:  The register name
+        :type       name:  str
+
+        :returns:   The register, None if it has no history
+        :rtype:     Register
+        """
+        return self._registers.get(name, None)
+
+    def add(self, timestamp: int, data: dict) -> dict:
+        """
+        Add the register values of collected client data
+
+        Multi register values are combined to a single value, the first
+        register being the most significant one
+
+        :param      timestamp:  The timestamp of the data in seconds
+        :type       timestamp:  int
+        :param      data:       The collected client data
+        :type       data:       dict
+
+        :returns:   Added values by register name
+        :rtype:     dict
+        """
+        values = dict()
+
+        for name, register in self._registers.items():
+            register_data = data.get(register.reg_type, {}).get(name, None)
+            if register_data is None:
+                continue
+
+            value = register_data['val']
+            if isinstance(value, list):
+                combined_value = 0
+                for part in value:
+                    combined_value = (combined_value << 16) | part
+                value = combined_value & 0xFFFFFFFF
+
+            values[name] = int(value)
+            self.append(name=name, timestamp=timestamp, value=values[name])
+
+        return values
+
+    def append(self, name: str, timestamp: int, value: int) -> None:
+        """
+        Append a single sample to the history of a register
+
+        :param      name:       The register name
+        :type       name:       str
+        :param      timestamp:  The timestamp in seconds
+        :type       timestamp:  int
+        :param      value:      The value
+        :type       value:      int
+        """
+        self._buffers[name].append(timestamp=timestamp, value=value)
+
+    def oldest_timestamp(self, name: str) -> int:
+        """
+        Get the timestamp of the oldest sample of a register
+
+        :param      name:  The register name
+        :type       name:  str
+
+        :returns:   Timestamp of the oldest sample, None if there is none
+        :rtype:     int
+        """
+        for timestamp, _ in self._buffers[name].samples():
+            return timestamp
+
+        return None
+
+    def samples(self, name: str, since: int = 0, points: int = 0) -> list:
+        """
+        Get the samples of a register
+
+        :param      name:    The register name
+        :type       name:    str
+        :param      since:   Skip samples older than this timestamp
+        :type       since:   int
+        :param      points:  The maximum number of points, 0 for all samples
+        :type       points:  int
+
+        :returns:   Timestamp and value pairs from oldest to newest
+        :rtype:     list
+        """
+        buffer = self._buffers[name]
+
+        return downsample(samples=lambda: buffer.samples(since=since),
+                          points=points)
+
+
+def downsample(samples: Callable, points: int = 0) -> list:
+    """
+    Downsample timestamped samples to a maximum number of points
+
+    If more samples than points are available, consecutive samples are
+    combined to the mean value with the timestamp of their first sample. The
+    samples are iterated twice, to count and to combine them.
+
+    :param      samples:  Function returning an iterable of the samples
+    :type       samples:  Callable
+    :param      points:   The maximum number of points, 0 for all samples
+    :type       points:   int
+
+    :returns:   Timestamp and value pairs from oldest to newest
+    :rtype:     list
+    """
+    if points <= 0:
+        return [[ts, val] for ts, val in samples()]
+
+    count = 0
+    for _ in samples():
+        count += 1
+
+    if count <= points:
+        return [[ts, val] for ts, val in samples()]
+
+    result = list()
+    bucket = 0
+    bucket_end = count // points
+    bucket_size = 0
+    bucket_sum = 0
+    bucket_ts = 0
+
+    for index, (ts, val) in enumerate(samples()):
+        if bucket_size == 0:
+            bucket_ts = ts
+        bucket_sum += val
+        bucket_size += 1
+
+        if index + 1 == bucket_end:
+            result.append([bucket_ts, bucket_sum / bucket_size])
+            bucket += 1
+            bucket_end = (bucket + 1) * count // points
+            bucket_size = 0
+            bucket_sum = 0
+
+    return result
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Register Index
+
+Compact, ordered index of the Modbus register definitions. The index is built
+once after loading the register JSON file, rendering, JSON output and polling
+iterate it instead of sorting the register dicts on every request.
+"""
+
+
+class Register(object):
+    """Single Modbus register definition"""
+    __slots__ = ('reg_type', 'name', 'address', 'length', 'unit',
+                 'poll_interval')
+
+    def __init__(self,
+                 reg_type: str,
+                 name: str,
+                 address: int,
+                 length: int = 1,
+                 unit: str = '',
+                 poll_interval: int = None) -> None:
+        self.reg_type = reg_type
+        self.name = name
+        self.address = address
+        self.length = length
+        self.unit = unit
+        # seconds between two reads, 0 to read only once, None for default
+        self.poll_interval = poll_interval
+
+    def __repr__(self) -> str:
+        return '{}({}, {}, {})'.format(self.__class__.__name__,
+                                       self.reg_type,
+                                       self.name,
+                                       self.address)
+
+
+class RegisterIndex(object):
+    """Index of all Modbus registers, ordered by type and address"""
+    REGISTER_TYPES = ('COILS', 'HREGS', 'ISTS', 'IREGS')
+    # poll intervals in seconds of the poll classes
+    POLL_CLASSES = {
+        'static': 0,
+        'slow': 60,
+        'fast': 1,
+    }
+
+    def __init__(self, register_definitions: dict) -> None:
+        # register type names sorted alphabetically, like the rendered tables
+        self._register_types = tuple(
+            sorted(reg_type for reg_type in register_definitions
+                   if reg_type in self.REGISTER_TYPES))
+        self._registers = dict()
+        self._size = 0
+
+        for reg_type in self._register_types:
+            registers = list()
+            for name, definition in register_definitions[reg_type].items():
+                registers.append(Register(reg_type=reg_type,
+                                          name=name,
+                                          address=definition['register'],
+                                          length=definition.get('len', 1),
+                                          unit=definition.get('unit', ''),
+                                          poll_interval=self._poll_interval(
+                                              definition=definition)))
+            registers.sort(key=lambda reg: reg.address)
+
+            self._registers[reg_type] = tuple(registers)
+            self._size += len(registers)
+
+    def _poll_interval(self, definition: dict) -> int:
+        """
+        Get the poll interval of a register definition
+
+        :param      definition:  The register definition
+        :type       definition:  dict
+
+        :returns:   Poll interval in seconds, None if not defined
+        :rtype:     int
+        """
+        poll_interval = definition.get('poll_interval', None)
+
+        if isinstance(poll_interval, str):
+            # unknown classes are polled with the default interval
+            return self.POLL_CLASSES.get(poll_interval, None)
+
+        return poll_interval
+
+    def __iter__(self):
+        for reg_type in self._register_types:
+            for register in self._registers[reg_type]:
+                yield register
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def register_types(self) -> tuple:
+        """
+        Get the indexed register types
+
+        :returns:   Register types sorted by name, e.g. ('COILS', 'HREGS')
+        :rtype:     tuple
+        """
+        return self._register_types
+
+    def registers(self, reg_type: str) -> tuple:
+        """
+        Get all registers of a register type
+
+        :param      reg_type:  The register type, e.g. 'IREGS'
+        :type       reg_type:  str
+
+        :returns:   Registers of this type sorted by address
+        :rtype:     tuple
+        """
+        return self._registers.get(reg_type, ())
+
+    def register(self, name: str) -> Register:
+        """
+        Get a register by its name
+
+        :param      name:  The register name
+        :type       name:  str
+
+        :returns:   The register, None if it is not indexed
+        :rtype:     Register
+        """
+        for register in self:
+            if register.name == name:
+                return register
+
+        return None
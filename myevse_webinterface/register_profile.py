@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Register Profile
+
+Register values of a set-modbusRegisters profile, planned into a minimal
+number of multiple register writes and verified by reading them back
+"""
+
+# system packages
+import struct
+
+# custom modules
+from .modbus_bits import pack_bits, unpack_bits
+from .register_index import RegisterIndex
+
+# pip installed packages
+# https://github.com/brainelectronics/micropython-modbus
+from umodbus import const as Const
+from umodbus import functions
+
+
+class ProfileWrite(object):
+    """Consecutive addresses of a register type written by a single request"""
+    __slots__ = ('reg_type', 'address', 'length', 'registers', 'values')
+
+    def __init__(self, reg_type: str, address: int, length: int) -> None:
+        self.reg_type = reg_type
+        self.address = address
+        self.length = length
+        self.registers = list()
+        # raw values of all addresses of this write
+        self.values = list()
+
+    def __repr__(self) -> str:
+        return '{}({}, {}, {})'.format(self.__class__.__name__,
+                                       self.reg_type,
+                                       self.address,
+                                       self.length)
+
+    def slice(self, values: list, register) -> list:
+        """
+        Get the values of a register from the values of all addresses
+
+        :param      values:    The values of all addresses of this write
+        :type       values:    list
+        :param      register:  The register of this write
+        :type       register:  Register
+
+        :returns:   Values of the register
+        :rtype:     list
+        """
+        offset = register.address - self.address
+
+        return values[offset:offset + register.length]
+
+    def write_request(self) -> bytes:
+        """
+        Get the request writing all values of this write
+
+        The coil values are packed here, as umodbus packs them in the wrong
+        order
+
+        :returns:   The modbus PDU, function 15 or 16
+        :rtype:     bytes
+        """
+        if self.reg_type == 'COILS':
+            packed = pack_bits(values=self.values)
+            return struct.pack('>BHHB',
+                               Const.WRITE_MULTIPLE_COILS,
+                               self.address,
+                               self.length,
+                               len(packed)) + packed
+
+        return functions.write_multiple_registers(
+            starting_address=self.address,
+            register_values=self.values,
+            signed=False)
+
+    def read_request(self) -> bytes:
+        """
+        Get the request reading back all addresses of this write
+
+        :returns:   The modbus PDU, function 1 or 3
+        :rtype:     bytes
+        """
+        if self.reg_type == 'COILS':
+            return functions.read_coils(starting_address=self.address,
+                                        quantity=self.length)
+
+        return functions.read_holding_registers(starting_address=self.address,
+                                                quantity=self.length)
+
+    def written(self, response: bytes) -> bool:
+        """
+        Check the response of the write request
+
+        :param      response:  The validated response content
+        :type       response:  bytes
+
+        :returns:   Flag whether all values have been written
+        :rtype:     bool
+        """
+        if self.reg_type == 'COILS':
+            function_code = Const.WRITE_MULTIPLE_COILS
+        else:
+            function_code = Const.WRITE_MULTIPLE_REGISTERS
+
+        return functions.validate_resp_data(data=response,
+                                            function_code=function_code,
+                                            address=self.address,
+                                            quantity=self.length,
+                                            signed=False)
+
+    def read_values(self, response: bytes) -> list:
+        """
+        Get the values of the read request response
+
+        :param      response:  The validated response content
+        :type       response:  bytes
+
+        :returns:   Read values of all addresses of this write
+        :rtype:     list
+        """
+        if self.reg_type == 'COILS':
+            return [int(value) for value in unpack_bits(data=response,
+                                                        quantity=self.length)]
+
+        return list(functions.to_short(byte_array=response, signed=False))
+
+
+class RegisterProfile(object):
+    """
+    Register values of a profile planned into multiple register writes
+
+    The coils and holding registers of the profile are looked up in the
+    register index. Registers of the same type at consecutive addresses are
+    combined into a single write, as a write request can not skip addresses.
+    Each write is followed by a read of the same addresses to verify the
+    values.
+    """
+    # maximum quantity of a single write request by the Modbus specification
+    MAX_LENGTHS = {
+        'COILS': 0x7B0,
+        'HREGS': 123,
+    }
+
+    def __init__(self, profile: dict, register_index: RegisterIndex) -> None:
+        self._writes = list()
+        self._registers = list()
+
+        for reg_type, definitions in profile.items():
+            if reg_type in ('ISTS', 'IREGS'):
+                raise ValueError('{} are read only'.format(reg_type))
+            if reg_type not in self.MAX_LENGTHS:
+                # META, CONNECTION or other additional sections
+                continue
+
+            registers = list()
+            for name, definition in definitions.items():
+                register = register_index.register(name)
+                if register is None or register.reg_type != reg_type:
+                    raise ValueError('{} is no known {}'.
+                                     format(name, reg_type))
+                if definition.get('register', register.address) != \
+                        register.address:
+                    raise ValueError('{} is at register {}'.
+                                     format(name, register.address))
+                registers.append((register,
+                                  self._raw_values(register=register,
+                                                   value=definition['val'])))
+            registers.sort(key=lambda entry: entry[0].address)
+
+            write = None
+            for register, values in registers:
+                if (write is None or
+                        register.address != write.address + write.length or
+                        write.length + register.length >
+                        self.MAX_LENGTHS[reg_type]):
+                    write = ProfileWrite(reg_type=reg_type,
+                                         address=register.address,
+                                         length=0)
+                    self._writes.append(write)
+
+                write.length += register.length
+                write.values.extend(values)
+                write.registers.append(register)
+                self._registers.append(register)
+
+    def _raw_values(self, register, value) -> list:
+        """
+        Get the raw values written to the addresses of a register
+
+        :param      register:  The register
+        :type       register:  Register
+        :param      value:     The value of the profile
+        :type       value:     Union[bool, int, list]
+
+        :returns:   Value of each address of the register
+        :rtype:     list
+        """
+        values = value if isinstance(value, list) else [value]
+
+        if len(values) != register.length:
+            raise ValueError('{} requires {} values'.
+                             format(register.name, register.length))
+
+        for val in values:
+            if register.reg_type == 'COILS':
+                valid = val in (0, 1)
+            else:
+                valid = (isinstance(val, int) and
+                         not isinstance(val, bool) and
+                         0 <= val <= 65535)
+            if not valid:
+                raise ValueError('{} is no valid value of {}'.
+                                 format(val, register.name))
+
+        return [int(val) for val in values]
+
+    def __iter__(self):
+        return iter(self._writes)
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    @property
+    def register_names(self) -> list:
+        """
+        Get the names of all registers of the profile
+
+        :returns:   Register names ordered by type and address
+        :rtype:     list
+        """
+        return [register.name for register in self._registers]
+
+    def requests(self) -> list:
+        """
+        Get all requests to apply and verify the profile
+
+        :returns:   Pairs of modbus PDU and flag whether the response
+                    contains a count, all writes followed by all reads
+        :rtype:     list
+        """
+        requests = [(write.write_request(), False) for write in self._writes]
+        requests.extend((write.read_request(), True)
+                        for write in self._writes)
+
+        return requests
+
+    def results(self, responses: list) -> dict:
+        """
+        Get the result of each register from the responses of the requests
+
+        :param      responses:  Validated response content or raised
+                                exception of each request
+        :type       responses:  list
+
+        :returns:   Success, profile and read back value by register name
+        :rtype:     dict
+        """
+        results = dict()
+        count = len(self._writes)
+
+        for index, write in enumerate(self._writes):
+            write_response = responses[index]
+            read_response = responses[count + index]
+
+            written = (not isinstance(write_response, Exception) and
+                       write.written(response=write_response))
+            read_values = None
+            if not isinstance(read_response, Exception):
+                read_values = write.read_values(response=read_response)
+
+            for register in write.registers:
+                values = write.slice(values=write.values, register=register)
+                read = None
+                if read_values is not None:
+                    read = write.slice(values=read_values, register=register)
+
+                results[register.name] = {
+                    'success': written and read == values,
+                    'val': values[0] if len(values) == 1 else values,
+                    'read': read[0] if read and len(read) == 1 else read,
+                }
+
+        return results
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Render Cache
+
+Least recently used cache of rendered content with a hard byte budget
+"""
+
+# system packages
+import gc
+
+# custom modules
+# pip installed packages
+# https://github.com/brainelectronics/micropython-modules
+# typing not natively supported on MicroPython
+from be_helpers.typing import Generator, Iterable
+
+
+class RenderCache(object):
+    """
+    Cache of rendered content
+
+    Each key, e.g. a route, holds the content rendered for a single tag, e.g.
+    the data generation. Content not fitting into the byte budget is not
+    cached, the least recently used entries are evicted to make room for new
+    content. Nothing is cached while the free RAM is below a limit.
+    """
+    def __init__(self, max_size: int = 12 * 1024, min_free_ram: int = 0):
+        self._max_size = max_size
+        self._min_free_ram = min_free_ram
+        self._size = 0
+        self._entries = dict()
+        # keys from least to most recently used
+        self._usage = list()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def stats(self) -> dict:
+        """
+        Get cache statistics
+
+        :returns:   Hits, misses, evictions, entries, size and max size
+        :rtype:     dict
+        """
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'entries': len(self._entries),
+            'size': self._size,
+            'max_size': self._max_size,
+        }
+
+    def get(self, key: str, tag) -> str:
+        """
+        Get the cached content of a key
+
+        :param      key:  The key
+        :type       key:  str
+        :param      tag:  The tag the content has to be rendered for
+        :type       tag:  Any
+
+        :returns:   Cached content, None if nothing or outdated is cached
+        :rtype:     str
+        """
+        entry = self._entries.get(key, None)
+
+        if entry is None or entry[0] != tag:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._usage.remove(key)
+        self._usage.append(key)
+
+        return entry[1]
+
+    def put(self, key: str, tag, content: str) -> bool:
+        """
+        Cache content of a key
+
+        :param      key:      The key
+        :type       key:      str
+        :param      tag:      The tag the content has been rendered for
+        :type       tag:      Any
+        :param      content:  The content
+        :type       content:  str
+
+        :returns:   True if the content has been cached, False otherwise
+        :rtype:     bool
+        """
+        # replace any previous content of this key
+        self.remove(key=key)
+
+        size = len(content)
+        if size > self._max_size:
+            return False
+
+        if self._min_free_ram and gc.mem_free() < self._min_free_ram:
+            # leave the RAM to others
+            self.clear()
+            return False
+
+        while self._size + size > self._max_size:
+            self.remove(key=self._usage[0])
+            self._evictions += 1
+
+        self._entries[key] = (tag, content)
+        self._usage.append(key)
+        self._size += size
+
+        return True
+
+    def store_chunks(self, key: str, tag, chunks: Iterable) -> Generator:
+        """
+        Pass through rendered chunks and cache them afterwards
+
+        The chunks are only collected as long as they fit into the budget,
+        nothing is cached if the chunks are not consumed completely
+
+        :param      key:     The key
+        :type       key:     str
+        :param      tag:     The tag the chunks have been rendered for
+        :type       tag:     Any
+        :param      chunks:  The rendered chunks
+        :type       chunks:  Iterable
+
+        :returns:   Generator yielding the chunks
+        :rtype:     Generator
+        """
+        collected = list()
+        size = 0
+
+        for chunk in chunks:
+            if collected is not None:
+                size += len(chunk)
+                if size > self._max_size:
+                    collected = None
+                else:
+                    collected.append(chunk)
+
+            yield chunk
+
+        if collected is not None:
+            self.put(key=key, tag=tag, content=''.join(collected))
+
+    def remove(self, key: str) -> None:
+        """
+        Remove the cached content of a key
+
+        :param      key:  The key
+        :type       key:  str
+        """
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self._usage.remove(key)
+            self._size -= len(entry[1])
+
+    def clear(self) -> None:
+        """Remove all cached content"""
+        self._entries = dict()
+        self._usage = list()
+        self._size = 0
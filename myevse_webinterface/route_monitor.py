@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Route Monitor
+
+Memory accounting of the request handlers of the webserver, switchable at
+runtime, and latency histograms of all request handlers
+"""
+
+# system packages
+import gc
+import time
+
+
+def _iscoroutine(result) -> bool:
+    # same check as used by Microdot to invoke a handler
+    return hasattr(result, 'send') and hasattr(result, 'throw')
+
+
+class RouteMemory(object):
+    """Memory accounting of a single route"""
+    __slots__ = ('requests', 'alloc', 'max_alloc', 'duration', 'max_duration',
+                 'collections', 'errors')
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset all counters"""
+        self.requests = 0
+        self.alloc = 0
+        self.max_alloc = 0
+        self.duration = 0
+        self.max_duration = 0
+        self.collections = 0
+        self.errors = 0
+
+    def add(self, alloc: int, duration: int) -> None:
+        """
+        Add a handled request
+
+        :param      alloc:     The heap allocation delta in bytes
+        :type       alloc:     int
+        :param      duration:  The duration in microseconds
+        :type       duration:  int
+        """
+        self.requests += 1
+        if alloc < 0:
+            # the allocated memory is unknown if a collection freed memory
+            self.collections += 1
+        else:
+            self.alloc += alloc
+            if alloc > self.max_alloc:
+                self.max_alloc = alloc
+        self.duration += duration
+        if duration > self.max_duration:
+            self.max_duration = duration
+
+    @property
+    def stats(self) -> dict:
+        """
+        Get the statistics of this route
+
+        :returns:   Number of requests, total, mean and maximum allocation in
+                    bytes, mean and maximum duration in microseconds, number
+                    of requests with a garbage collection and failed requests
+        :rtype:     dict
+        """
+        measured = self.requests - self.collections
+
+        return {
+            'requests': self.requests,
+            'alloc': self.alloc,
+            'mean_alloc': self.alloc // measured if measured else 0,
+            'max_alloc': self.max_alloc,
+            'mean_duration': (self.duration // self.requests
+                              if self.requests else 0),
+            'max_duration': self.max_duration,
+            'collections': self.collections,
+            'errors': self.errors,
+        }
+
+
+class RouteMonitor(object):
+    """
+    Memory accounting of the request handlers of a Microdot app
+
+    The handlers of the URL map are replaced by monitoring ones only while
+    the monitor is enabled, a disabled monitor adds no cost to a request.
+    The heap allocation delta, duration and failure of each handler call are
+    recorded by its URL pattern. Allocations of concurrently running tasks,
+    e.g. other requests or the Modbus tasks, are part of the delta. The
+    allocation of a request is unknown if a garbage collection freed memory
+    meanwhile, it is counted as collection instead. Response bodies iterated
+    after the handler returned, like rendered templates, are not included.
+    """
+    def __init__(self, app) -> None:
+        self._app = app
+        self._routes = dict()
+        # original handlers of the URL map while enabled
+        self._handlers = None
+        self._peak = gc.mem_alloc()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Get the monitoring status
+
+        :returns:   Flag whether the handlers are monitored
+        :rtype:     bool
+        """
+        return self._handlers is not None
+
+    @enabled.setter
+    def enabled(self, value: bool) -> None:
+        """
+        Start or stop monitoring the handlers of the URL map
+
+        :param      value:  The value
+        :type       value:  bool
+        """
+        url_map = self._app.url_map
+
+        if value and self._handlers is None:
+            self._handlers = list()
+            for index, (methods, pattern, handler) in enumerate(url_map):
+                self._handlers.append(handler)
+                url_map[index] = (methods,
+                                  pattern,
+                                  self._monitor(url=pattern.url_pattern,
+                                                handler=handler))
+        elif not value and self._handlers is not None:
+            # URLs added meanwhile are not monitored
+            for index, handler in enumerate(self._handlers):
+                methods, pattern, _ = url_map[index]
+                url_map[index] = (methods, pattern, handler)
+            self._handlers = None
+
+    @property
+    def peak(self) -> int:
+        """
+        Get the heap high-water mark
+
+        :returns:   Maximum allocated heap in bytes at the end of a request
+        :rtype:     int
+        """
+        return self._peak
+
+    @property
+    def stats(self) -> dict:
+        """
+        Get the statistics of all requested routes
+
+        :returns:   Statistics by URL pattern
+        :rtype:     dict
+        """
+        return {url: route.stats for url, route in self._routes.items()
+                if route.requests}
+
+    def reset(self) -> None:
+        """Reset the statistics of all routes and the heap high-water mark"""
+        for route in self._routes.values():
+            route.reset()
+        self._peak = gc.mem_alloc()
+
+    def _monitor(self, url: str, handler):
+        """
+        Get the monitoring handler of a route
+
+        :param      url:      The URL pattern
+        :type       url:      str
+        :param      handler:  The handler
+        :type       handler:  function
+
+        :returns:   The monitoring handler
+        :rtype:     function
+        """
+        route = self._routes.get(url, None)
+        if route is None:
+            route = RouteMemory()
+            self._routes[url] = route
+
+        async def monitored(req, **kwargs):
+            start_alloc = gc.mem_alloc()
+            start_ticks = time.ticks_us()
+
+            try:
+                result = handler(req, **kwargs)
+                if _iscoroutine(result):
+                    result = await result
+            except Exception:
+                route.errors += 1
+                raise
+            finally:
+                duration = time.ticks_diff(time.ticks_us(), start_ticks)
+                alloc = gc.mem_alloc()
+                route.add(alloc=alloc - start_alloc, duration=duration)
+                if alloc > self._peak:
+                    self._peak = alloc
+
+            return result
+
+        return monitored
+
+
+class LatencyHistogram(object):
+    """Fixed bucket histogram of the request latency of a single route"""
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    # upper bounds of the buckets in milliseconds, followed by an unbounded
+    # bucket
+    BOUNDS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    BOUNDS_US = tuple(bound * 1000 for bound in BOUNDS)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        # microseconds
+        self.sum = 0
+        self.max = 0
+
+    def add(self, duration: int) -> None:
+        """
+        Add the latency of a request
+
+        :param      duration:  The duration in microseconds
+        :type       duration:  int
+        """
+        bounds = self.BOUNDS_US
+        index = 0
+        while index < len(bounds) and duration > bounds[index]:
+            index += 1
+
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += duration
+        if duration > self.max:
+            self.max = duration
+
+    def quantile(self, percent: int) -> int:
+        """
+        Get the bucket containing a quantile of the latencies
+
+        :param      percent:  The quantile in percent, e.g. 95
+        :type       percent:  int
+
+        :returns:   Index of the bucket, see BOUNDS
+        :rtype:     int
+        """
+        rank = (self.count * percent + 99) // 100
+        total = 0
+
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return index
+
+        return len(self.counts) - 1
+
+
+class TimedBody(object):
+    """
+    Streamed response body adding the latency of its request to a histogram
+
+    The latency is added as soon as the body has been sent completely, or
+    closed, by Microdot. Use AsyncTimedBody for async iterators.
+
+    A timed body is created for each streamed response, as concurrent
+    requests of the same route are sent at the same time.
+    """
+    __slots__ = ('_body', '_histogram', '_start_ticks')
+
+    def __init__(self,
+                 body,
+                 histogram: LatencyHistogram,
+                 start_ticks: int) -> None:
+        self._body = body
+        self._histogram = histogram
+        self._start_ticks = start_ticks
+
+    def _finish(self) -> None:
+        if self._histogram is not None:
+            self._histogram.add(duration=time.ticks_diff(time.ticks_us(),
+                                                         self._start_ticks))
+            self._histogram = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._body)
+        except Exception:
+            # exhausted or failed
+            self._finish()
+            raise
+
+    def close(self) -> None:
+        self._finish()
+        if hasattr(self._body, 'close'):
+            self._body.close()
+
+
+class AsyncTimedBody(TimedBody):
+    """Streamed async response body, @see TimedBody"""
+    __slots__ = ()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._body.__anext__()
+        except Exception:
+            # exhausted or failed
+            self._finish()
+            raise
+
+
+def _timed_body(body, histogram: LatencyHistogram, start_ticks: int):
+    """
+    Get a timed body of a streamed response body
+
+    :param      body:         The response body
+    :type       body:         object
+    :param      histogram:    The histogram of the route
+    :type       histogram:    LatencyHistogram
+    :param      start_ticks:  The start of the request in microseconds
+    :type       start_ticks:  int
+
+    :returns:   Timed body, None if the body is not streamed
+    :rtype:     TimedBody
+    """
+    # same checks as used by Microdot to iterate a body
+    if hasattr(body, '__anext__'):
+        return AsyncTimedBody(body=body,
+                              histogram=histogram,
+                              start_ticks=start_ticks)
+    elif hasattr(body, '__next__') and not hasattr(body, 'read'):
+        return TimedBody(body=body,
+                         histogram=histogram,
+                         start_ticks=start_ticks)
+
+    return None
+
+
+class RouteLatency(object):
+    """
+    Latency histograms of all request handlers of a Microdot app
+
+    All handlers of the URL map are replaced by measuring ones on creation,
+    the latency of each request is added to the histogram of its URL pattern.
+    Adding a latency only increments the counters of its histogram.
+
+    A generator or async iterator returned as body, like a rendered template,
+    is sent after the handler returned. Such a body is wrapped by a timed
+    body, which adds the latency once the body has been sent completely, a
+    body not sent completely, e.g. as the client has gone, is not added. The
+    wrapper, and the result tuple returning it, are allocated per request,
+    as concurrent requests of a route can not share a wrapper. The latency
+    of other requests, including files sent by Microdot, is the one of the
+    handler call.
+    """
+    def __init__(self, app) -> None:
+        self._histograms = dict()
+
+        url_map = app.url_map
+        for index, (methods, pattern, handler) in enumerate(url_map):
+            url_map[index] = (methods,
+                              pattern,
+                              self._measure(url=pattern.url_pattern,
+                                            handler=handler))
+
+    @property
+    def histograms(self) -> dict:
+        """
+        Get the histograms of all routes
+
+        :returns:   Histograms by URL pattern
+        :rtype:     dict
+        """
+        return self._histograms
+
+    def _measure(self, url: str, handler):
+        """
+        Get the measuring handler of a route
+
+        :param      url:      The URL pattern
+        :type       url:      str
+        :param      handler:  The handler
+        :type       handler:  function
+
+        :returns:   The measuring handler
+        :rtype:     function
+        """
+        histogram = self._histograms.get(url, None)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self._histograms[url] = histogram
+
+        async def measured(req, **kwargs):
+            start_ticks = time.ticks_us()
+
+            try:
+                result = handler(req, **kwargs)
+                if _iscoroutine(result):
+                    result = await result
+            except Exception:
+                histogram.add(duration=time.ticks_diff(time.ticks_us(),
+                                                       start_ticks))
+                raise
+
+            # the body of a handler result is returned first, the one of a
+            # response as attribute
+            if isinstance(result, tuple):
+                body = _timed_body(body=result[0],
+                                   histogram=histogram,
+                                   start_ticks=start_ticks)
+                if body is not None:
+                    return (body, ) + result[1:]
+            elif hasattr(result, 'body'):
+                body = _timed_body(body=result.body,
+                                   histogram=histogram,
+                                   start_ticks=start_ticks)
+                if body is not None:
+                    result.body = body
+                    return result
+            else:
+                body = _timed_body(body=result,
+                                   histogram=histogram,
+                                   start_ticks=start_ticks)
+                if body is not None:
+                    return body
+
+            histogram.add(duration=time.ticks_diff(time.ticks_us(),
+                                                   start_ticks))
+
+            return result
+
+        return measured
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Update Job
+
+System update installing packages with upip in a background thread, keeping
+the webserver responsive and reporting the progress of the installation
+"""
+
+# system packages
+import _thread
+import io
+import random
+import time
+
+
+class DownloadStream(io.IOBase):
+    """Stream of a download counting the received bytes of an update job"""
+    def __init__(self, stream, job) -> None:
+        self._stream = stream
+        self._job = job
+
+    def readinto(self, buf) -> int:
+        size = self._stream.readinto(buf)
+        if size:
+            self._job.bytes_downloaded += size
+
+        return size
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        if data:
+            self._job.bytes_downloaded += len(data)
+
+        return data
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class UpdateJob(object):
+    """
+    Background installation of packages with upip
+
+    The installation is run by a thread, as upip blocks while downloading
+    and extracting a package. The package being installed and the number of
+    downloaded bytes are tracked by wrapping the package installation and
+    URL functions of upip for the duration of the job. upip.install does not
+    raise on a failed package, the job fails if the wrapper has not seen the
+    package and all its dependencies installed.
+    """
+    # stack size of the installation thread, TLS requires more than default
+    STACK_SIZE = 16 * 1024
+
+    def __init__(self, packages: list, index_urls: list) -> None:
+        self._id = '{:08x}'.format(random.getrandbits(32))
+        self._packages = list(packages)
+        self._index_urls = list(index_urls)
+
+        self.phase = 'pending'
+        self.package = ''
+        self.bytes_downloaded = 0
+        self.error = ''
+        self._installed = list()
+        self._start_ticks = time.ticks_ms()
+        self._duration = None
+
+    @property
+    def id(self) -> str:
+        """
+        Get the ID of this job
+
+        :returns:   Random hex ID
+        :rtype:     str
+        """
+        return self._id
+
+    @property
+    def running(self) -> bool:
+        """
+        Get the running status of this job
+
+        :returns:   Flag whether the job has neither finished nor failed
+        :rtype:     bool
+        """
+        return self.phase not in ('done', 'failed')
+
+    @property
+    def status(self) -> dict:
+        """
+        Get the status of this job
+
+        :returns:   ID, phase, package being installed, installed packages,
+                    downloaded bytes, duration in milliseconds and error
+        :rtype:     dict
+        """
+        duration = self._duration
+        if duration is None:
+            duration = time.ticks_diff(time.ticks_ms(), self._start_ticks)
+
+        return {
+            'id': self._id,
+            'phase': self.phase,
+            'package': self.package,
+            'installed': list(self._installed),
+            'bytes': self.bytes_downloaded,
+            'duration': duration,
+            'error': self.error,
+        }
+
+    def finish(self, phase: str, error: str = '') -> None:
+        """
+        Finish this job
+
+        :param      phase:  The final phase, 'done' or 'failed'
+        :type       phase:  str
+        :param      error:  The error message of a failed job
+        :type       error:  str
+        """
+        self.error = error
+        self._duration = time.ticks_diff(time.ticks_ms(), self._start_ticks)
+        self.phase = phase
+
+    def start(self) -> None:
+        """Start installing the packages in a new thread"""
+        self.phase = 'installing'
+
+        previous_stack_size = _thread.stack_size(self.STACK_SIZE)
+        try:
+            _thread.start_new_thread(self._install, ())
+        finally:
+            _thread.stack_size(previous_stack_size)
+
+    def _install(self) -> None:
+        """Install all packages with upip, run by the job thread"""
+        import upip
+
+        install_pkg = upip.install_pkg
+        url_open = upip.url_open
+
+        def _install_pkg(pkg_spec: str, install_path: str) -> dict:
+            self.package = pkg_spec
+            try:
+                meta = install_pkg(pkg_spec, install_path)
+            except Exception as e:
+                # upip.install only prints the error, keep it for the status
+                self.error = 'Installing {} failed: {!r}'.format(pkg_spec, e)
+                raise
+            self._installed.append(pkg_spec)
+
+            return meta
+
+        def _url_open(url: str) -> DownloadStream:
+            return DownloadStream(stream=url_open(url), job=self)
+
+        upip.index_urls = self._index_urls
+        upip.install_pkg = _install_pkg
+        upip.url_open = _url_open
+
+        try:
+            for package in self._packages:
+                upip.install(package)
+
+                # upip.install catches the errors of a package and of its
+                # dependencies, a failure is only seen by the wrapper
+                if self.error or package not in self._installed:
+                    self.finish(phase='failed',
+                                error=self.error or
+                                'Installing {} failed'.format(package))
+                    return
+            self.package = ''
+            self.phase = 'installed'
+        except (Exception, SystemExit) as e:
+            # upip exits on unresolvable hosts
+            self.finish(phase='failed',
+                        error='Installing {} failed: {!r}'.format(
+                            self.package, e))
+        finally:
+            upip.install_pkg = install_pkg
+            upip.url_open = url_open
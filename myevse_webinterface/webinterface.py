@@ -10,10 +10,15 @@ setup before starting the actual Webinterface
 """
 
 # system packages
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 import gc
 import json
 import machine
 import network
+import random
 import time
 
 # custom modules
@@ -21,16 +26,25 @@ import time
 # https://github.com/miguelgrinberg/microdot
 from microdot.microdot_asyncio import Request, Response, send_file
 from microdot.microdot_utemplate import render_template, init_templates
+# https://github.com/pfalcon/utemplate
+from utemplate import recompile, source
 
 # https://github.com/brainelectronics/micropython-modules
 from be_helpers import version as be_helpers_version
 from be_helpers.generic_helper import GenericHelper
 from be_helpers.led_helper import Led, Neopixel
-from be_helpers.modbus_bridge import ModbusBridge
 from be_helpers.path_helper import PathHelper
+# typing not natively supported on MicroPython
+from be_helpers.typing import Generator
 from wifi_manager import version as wifi_manager_version
 from wifi_manager import WiFiManager
 from . import version as webinterface_version
+from .boot_profile import BootProfile
+from .config_store import ConfigField, ConfigStore
+from .render_cache import RenderCache
+from .route_monitor import LatencyHistogram, RouteLatency, RouteMonitor
+# modules of the Modbus bridge, the data pages and the system update are
+# imported on first use by the connection modes requiring them
 
 
 class WebinterfaceError(Exception):
@@ -43,10 +57,20 @@ class Webinterface(object):
     SETUP_MODE = 0
     CLIENT_MODE = 1
     ACCESSPOINT_MODE = 2
+    # maximum time in milliseconds to wait for the MyEVSE to ack a write
+    WRITE_TIMEOUT = 2000
+    # register profiles selectable by name, e.g. 'MyEVSE'
+    PROFILE_FILE = 'lib/registers/set-modbusRegisters-{}.json'
+    TEMPLATE_DIR = 'lib/templates'
+    # first line of templates compiled on building the package
+    TEMPLATE_HEADER = '# precompiled template of '
 
     Response.default_content_type = 'text/html'
 
     def __init__(self, logger=None, quiet=False, name=__name__):
+        self._boot_profile = BootProfile()
+        self._boot_profile.start(name='init')
+
         # setup and configure logger if none is provided
         if logger is None:
             logger = GenericHelper.create_logger(
@@ -74,33 +98,161 @@ class Webinterface(object):
         self._connection_mode = 0
         self._register_file = 'lib/registers/modbusRegisters-MyEVSE.json'
         self._tcp_port = 180
-        self._config_data = {
-            "TCP_PORT": self._tcp_port,
-            "REGISTERS": self._register_file,
-            "CONNECTION_MODE": self._connection_mode
-        }
+        self._history_registers = [
+            'CHARGING_CURRENT_HREG',
+            'CHARGING_ACTIVE_ISTS',
+            'LOOP_TIME_US_IREG',
+        ]
+        self._history_depth = 180
+        self._history_log_size = 64 * 1024
+        self._history_flush_interval = 300
+        self._modbus_async = 1
+        # fields of the config file, validated and typed on saving
+        self._config_store = ConfigStore(
+            path=self._config_file_path,
+            fields=(
+                ConfigField(name='TCP_PORT',
+                            kind=int,
+                            default=self._tcp_port,
+                            minimum=1,
+                            maximum=65535),
+                ConfigField(name='REGISTERS',
+                            kind=str,
+                            default=self._register_file,
+                            check=self._check_register_file),
+                ConfigField(name='CONNECTION_MODE',
+                            kind=int,
+                            default=self._connection_mode,
+                            choices=(self.SETUP_MODE,
+                                     self.CLIENT_MODE,
+                                     self.ACCESSPOINT_MODE)),
+                ConfigField(name='HISTORY_REGISTERS',
+                            kind=list,
+                            default=self._history_registers),
+                ConfigField(name='HISTORY_DEPTH',
+                            kind=int,
+                            default=self._history_depth,
+                            minimum=1),
+                ConfigField(name='HISTORY_LOG_SIZE',
+                            kind=int,
+                            default=self._history_log_size,
+                            minimum=0),
+                ConfigField(name='HISTORY_FLUSH_INTERVAL',
+                            kind=int,
+                            default=self._history_flush_interval,
+                            minimum=1),
+                ConfigField(name='MODBUS_ASYNC',
+                            kind=int,
+                            default=self._modbus_async,
+                            choices=(0, 1)),
+            ),
+            logger=self.logger)
+        self._config_data = self._config_store.values
 
         self._pixel.color = 'blue'
         self._pixel.intensity = 20
 
         self._update_complete = False
         self._update_ongoing = False
+        self._update_job = None
+
+        # unique per boot, avoids matching ETags of a previous boot
+        self._etag_epoch = '{:x}'.format(random.getrandbits(24))
+
+        # Server-Sent Events streams of the Modbus data
+        self._event_streams = list()
+        self._max_event_streams = 4
+
+        # rendered content of the data tables and the system info, never
+        # allocating more than 12kB nor leaving less than 20kB free RAM
+        self._render_cache = RenderCache(max_size=12 * 1024,
+                                         min_free_ram=20 * 1024)
 
-        init_templates(template_dir='lib/templates')
         self.load_config()
 
-        # default level is 'warning', may use custom logger to get initial log
-        self._mb_bridge = ModbusBridge(register_file=self.register_file)
-        GenericHelper.set_level(self._mb_bridge.logger, 'info')
+        # the Modbus bridge is only required if the device is setup as client
+        # or AP, the WiFi Manager does not return in setup mode
+        self._mb_bridge = None
+        if self.connection_mode in [self.CLIENT_MODE, self.ACCESSPOINT_MODE]:
+            # default level is 'warning', may use custom logger to get log
+            MyEVSEBridge = self._load(module='myevse_bridge').MyEVSEBridge
+            self._mb_bridge = MyEVSEBridge(
+                register_file=self.register_file,
+                history_registers=self.history_registers,
+                history_depth=self.history_depth,
+                history_log_size=self.history_log_size,
+                history_flush_interval=self.history_flush_interval)
+            GenericHelper.set_level(self._mb_bridge.logger, 'info')
 
         self._wm = WiFiManager()
         GenericHelper.set_level(self._wm.logger, 'info')
+        # replace the loader set by the WiFi Manager, templates of both are
+        # located in the same directory
+        init_templates(template_dir=self.TEMPLATE_DIR,
+                       loader_class=self._template_loader_class())
+        # memory accounting of all pages, disabled until requested
+        self._route_monitor = RouteMonitor(app=self._wm.app)
+        # Prometheus metrics, created on the first request
+        self._metrics = None
         self.add_additional_webpages()
+        # latency histograms of all pages, including the WiFi Manager ones
+        self._route_latency = RouteLatency(app=self._wm.app)
 
         # run garbage collector at the end to clean up
         gc.collect()
 
         self.logger.debug('Finished Webinterface init')
+        self._boot_profile.stop()
+
+    def _load(self, module: str):
+        """
+        Import a module of this package on first use
+
+        The import time and used RAM are recorded by the boot profile
+
+        :param      module:  The module name, e.g. 'myevse_bridge'
+        :type       module:  str
+
+        :returns:   The module
+        :rtype:     module
+        """
+        package = __name__.rsplit('.', 1)[0]
+
+        return self._boot_profile.load(module='{}.{}'.format(package, module))
+
+    def _is_precompiled_template(self, path: str) -> bool:
+        """
+        Check whether a compiled template has been compiled on build
+
+        :param      path:  The path of the compiled template
+        :type       path:  str
+
+        :returns:   Flag whether the template is shipped precompiled
+        :rtype:     bool
+        """
+        try:
+            with open(path, 'r') as file:
+                return file.readline().startswith(self.TEMPLATE_HEADER)
+        except OSError:
+            return False
+
+    def _template_loader_class(self):
+        """
+        Get the loader class of the templates
+
+        Templates precompiled on building the package are used as they are.
+        Otherwise, e.g. if the files have been copied to the device, the
+        templates are compiled on first use and after each change.
+
+        :returns:   The utemplate loader class
+        :rtype:     type
+        """
+        if (PathHelper.exists(path=self.TEMPLATE_DIR + '/setup_tpl.mpy') or
+                self._is_precompiled_template(
+                    path=self.TEMPLATE_DIR + '/setup_tpl.py')):
+            return source.Loader
+
+        return recompile.Loader
 
     @property
     def config_data(self) -> dict:
@@ -120,13 +272,19 @@ class Webinterface(object):
         :param      value:  The system config
         :type       value:  dict
         """
-        if isinstance(value, dict):
-            self._config_data = value
-            self._update_config_properties()
-        else:
+        if not isinstance(value, dict):
             raise WebinterfaceError('Config data shall type dict, not: {}'.
                                     format(type(value)))
 
+        try:
+            config_data = self._config_store.values
+            config_data.update(self._config_store.decode(data=value))
+        except ValueError as e:
+            raise WebinterfaceError(e)
+
+        self._config_data = config_data
+        self._update_config_properties()
+
     @property
     def config_file_path(self) -> str:
         """
@@ -208,6 +366,127 @@ class Webinterface(object):
             raise WebinterfaceError('TCP port shall type int, not: {}'.
                                     format(type(value)))
 
+    @property
+    def history_registers(self) -> list:
+        """
+        Get names of the Modbus registers with a history
+
+        :returns:   Names of the Modbus registers
+        :rtype:     list
+        """
+        return self._history_registers
+
+    @history_registers.setter
+    def history_registers(self, value: list) -> None:
+        """
+        Set names of the Modbus registers with a history
+
+        :param      value:  The value
+        :type       value:  list
+        """
+        if isinstance(value, list):
+            self._history_registers = value
+        else:
+            raise WebinterfaceError('History registers shall type list, not: '
+                                    '{}'.format(type(value)))
+
+    @property
+    def history_depth(self) -> int:
+        """
+        Get number of samples kept per Modbus register history
+
+        :returns:   Number of samples
+        :rtype:     int
+        """
+        return self._history_depth
+
+    @history_depth.setter
+    def history_depth(self, value: int) -> None:
+        """
+        Set number of samples kept per Modbus register history
+
+        :param      value:  The value
+        :type       value:  int
+        """
+        if isinstance(value, int) and value > 0:
+            self._history_depth = value
+        else:
+            raise WebinterfaceError('History depth shall be a positive int, '
+                                    'not: {}'.format(value))
+
+    @property
+    def history_log_size(self) -> int:
+        """
+        Get maximum size of the persistent Modbus register history log
+
+        :returns:   Size in bytes, 0 if the log is disabled
+        :rtype:     int
+        """
+        return self._history_log_size
+
+    @history_log_size.setter
+    def history_log_size(self, value: int) -> None:
+        """
+        Set maximum size of the persistent Modbus register history log
+
+        :param      value:  The size in bytes, 0 to disable the log
+        :type       value:  int
+        """
+        if isinstance(value, int) and value >= 0:
+            self._history_log_size = value
+        else:
+            raise WebinterfaceError('History log size shall be a non negative '
+                                    'int, not: {}'.format(value))
+
+    @property
+    def history_flush_interval(self) -> int:
+        """
+        Get interval to write the Modbus register history log to the flash
+
+        :returns:   Interval in seconds
+        :rtype:     int
+        """
+        return self._history_flush_interval
+
+    @history_flush_interval.setter
+    def history_flush_interval(self, value: int) -> None:
+        """
+        Set interval to write the Modbus register history log to the flash
+
+        :param      value:  The interval in seconds
+        :type       value:  int
+        """
+        if isinstance(value, int) and value > 0:
+            self._history_flush_interval = value
+        else:
+            raise WebinterfaceError('History flush interval shall be a '
+                                    'positive int, not: {}'.format(value))
+
+    @property
+    def modbus_async(self) -> int:
+        """
+        Get the Modbus data collection and provisioning mode
+
+        :returns:   1 to run it on the event loop of the webserver, 0 to run
+                    it in threads
+        :rtype:     int
+        """
+        return self._modbus_async
+
+    @modbus_async.setter
+    def modbus_async(self, value: int) -> None:
+        """
+        Set the Modbus data collection and provisioning mode
+
+        :param      value:  The value
+        :type       value:  int
+        """
+        if value in [0, 1]:
+            self._modbus_async = value
+        else:
+            raise WebinterfaceError('Modbus async shall be 0 or 1, not: {}'.
+                                    format(value))
+
     @property
     def boot_duration(self) -> int:
         """
@@ -292,52 +571,56 @@ class Webinterface(object):
         """
         Load system configuration from JSON file.
 
-        The @see config_file_path is used as loading location. If no file is
-        found at that location, the default data of @see config_data is saved
-        to that location.
+        The @see config_file_path is used as loading location. If no valid
+        file is found at that location, the previous generation of the file
+        is loaded or the default data of @see config_data is saved to that
+        location.
 
         All configurable properties are set to the values loaded from the file
         """
-        cfg = self.config_data
-        cfg_file_path = self.config_file_path
-
-        if PathHelper.exists(path=cfg_file_path):
-            self.logger.debug('Found JSON config file "{}"'.
-                              format(cfg_file_path))
-            cfg = GenericHelper.load_json(path=cfg_file_path, mode='r')
-            self.logger.debug('Config loaded as: {}'.format(cfg))
-            self.config_data = cfg
-        else:
-            self.logger.info('JSON config file {} does not exist'.
-                             format(cfg_file_path))
-            GenericHelper.save_json(data=cfg, path=cfg_file_path)
-            self.logger.debug('Created file with default values: {}'.
-                              format(cfg))
+        self._config_data = self._config_store.load()
+        self.logger.debug('Config loaded as: {}'.format(self.config_data))
 
         self._update_config_properties()
 
-    def _update_config_properties(self) -> None:
-        """Update config properties saved in config JSON file"""
-        try:
-            # WiFi connection mode
-            self.connection_mode = int(self.config_data['CONNECTION_MODE'])
-        except Exception as e:
-            self.logger.warning('Failed to load CONNECTION_MODE as int: {}'.
-                                format(e))
+    def _check_register_file(self, value: str) -> str:
+        """
+        Check the configured Modbus register file
 
-        try:
-            # TCP port for Modbus connection
-            self.tcp_port = int(self.config_data['TCP_PORT'])
-        except Exception as e:
-            self.logger.warning('Failed to load TCP_PORT as int: {}'.
-                                format(e))
+        :param      value:  The path or the name of a file in lib/registers
+        :type       value:  str
 
-        try:
-            # Modbus registers file path
-            self.register_file = self.config_data['REGISTERS']
-        except Exception as e:
-            self.logger.warning('Failed to set REGISTERS path: {}'.
-                                format(e))
+        :returns:   Path to the register file
+        :rtype:     str
+
+        :raises     ValueError:  Register file does not exist
+        """
+        if '/' not in value:
+            value = 'lib/registers/' + value
+
+        if not PathHelper.exists(path=value):
+            raise ValueError('REGISTERS file {} does not exist'.format(value))
+
+        return value
+
+    def _update_config_properties(self) -> None:
+        """Update config properties saved in config JSON file"""
+        # values are validated and typed by the config store
+        config_data = self.config_data
+
+        # WiFi connection mode
+        self.connection_mode = config_data['CONNECTION_MODE']
+        # TCP port for Modbus connection
+        self.tcp_port = config_data['TCP_PORT']
+        # Modbus registers file path
+        self.register_file = config_data['REGISTERS']
+        # Modbus registers with a history
+        self.history_registers = config_data['HISTORY_REGISTERS']
+        self.history_depth = config_data['HISTORY_DEPTH']
+        self.history_log_size = config_data['HISTORY_LOG_SIZE']
+        self.history_flush_interval = config_data['HISTORY_FLUSH_INTERVAL']
+        # Modbus data collection on event loop or in threads
+        self.modbus_async = config_data['MODBUS_ASYNC']
 
     def init_connection(self) -> None:
         """
@@ -346,12 +629,48 @@ class Webinterface(object):
         Currently active connections are disconnected and the WiFi is turned
         off to avoid old connection issues and states
         """
+        self._boot_profile.start(name='init_connection')
+
         if self._station.active() and self._station.isconnected():
             self._station.disconnect()
-            time.sleep(1)
+            self._wait_for(condition=lambda: not self._station.isconnected(),
+                           description='station disconnect')
         self._station.active(False)
-        time.sleep(1)
+        self._wait_for(condition=lambda: not self._station.active(),
+                       description='station deactivation')
         self._station.active(True)
+        self._wait_for(condition=self._station.active,
+                       description='station activation')
+
+        self._boot_profile.stop()
+
+    def _wait_for(self,
+                  condition,
+                  description: str,
+                  timeout: int = 1000) -> bool:
+        """
+        Wait until a condition is met, e.g. a WLAN status changed
+
+        :param      condition:    Function returning True once met
+        :type       condition:    function
+        :param      description:  The description used on a timeout
+        :type       description:  str
+        :param      timeout:      The maximum time to wait in milliseconds
+        :type       timeout:      int
+
+        :returns:   Flag whether the condition is met
+        :rtype:     bool
+        """
+        start_ticks = time.ticks_ms()
+
+        while not condition():
+            if time.ticks_diff(time.ticks_ms(), start_ticks) > timeout:
+                self.logger.warning('Timeout waiting for {} after {}ms'.
+                                    format(description, timeout))
+                return False
+            time.sleep_ms(10)
+
+        return True
 
     def finish_setup(self) -> None:
         """
@@ -360,6 +679,8 @@ class Webinterface(object):
         Turn off the onboad LED and the Neopixel, collect the reset cause and
         available RAM after all initial steps
         """
+        self._boot_profile.start(name='finish_setup')
+
         self._pixel.clear()
 
         self._restart_cause = machine.reset_cause()
@@ -374,6 +695,8 @@ class Webinterface(object):
         self.logger.debug('Finished "boot" steps after: {}ms'.
                           format(self._boot_duration))
 
+        self._boot_profile.stop()
+
     def add_additional_webpages(self) -> None:
         """
         Add additional webpages to the WiFi Manager webserver.
@@ -391,6 +714,11 @@ class Webinterface(object):
 
         self._wm.add_url_rule(url='/system_data', func=self.system_data)
         self._wm.add_url_rule(url='/info', func=self.system_info)
+        self._wm.add_url_rule(url='/boot_profile', func=self.boot_profile)
+        self._wm.add_url_rule(url='/diagnostics',
+                              func=self.diagnostics,
+                              methods=['GET', 'POST'])
+        self._wm.add_url_rule(url='/metrics', func=self.metrics)
 
         # add the new "Setup" and "Reboot" page to the index page
         self._wm.available_urls = {
@@ -422,6 +750,16 @@ class Webinterface(object):
             self._wm.add_url_rule(url='/modbus_data', func=self.modbus_data)
             self._wm.add_url_rule(url='/modbus_data_table',
                                   func=self.modbus_data_table)
+            self._wm.add_url_rule(url='/modbus_stream',
+                                  func=self.modbus_stream)
+            self._wm.add_url_rule(url='/modbus_history',
+                                  func=self.modbus_history)
+            self._wm.add_url_rule(url='/modbus_write',
+                                  func=self.modbus_write,
+                                  methods=['POST'])
+            self._wm.add_url_rule(url='/modbus_profile',
+                                  func=self.modbus_profile,
+                                  methods=['POST'])
 
             self._wm.available_urls.update({
                 "/data": {
@@ -442,6 +780,8 @@ class Webinterface(object):
             self._wm.add_url_rule(url='/perform_system_update',
                                   func=self.perform_system_update,
                                   methods=['POST'])
+            self._wm.add_url_rule(url='/update_status',
+                                  func=self.update_status)
 
             self._wm.available_urls.update({
                 "/update": {
@@ -451,38 +791,31 @@ class Webinterface(object):
                 },
             })
 
-    async def _save_system_config(self, data: dict) -> None:
+    async def _save_system_config(self, data: dict) -> list:
         """
         Update and save the system configuration to file
 
+        The file is only written if any value changed
+
         :param      data:  The data
         :type       data:  dict
+
+        :returns:   Names of the changed config values
+        :rtype:     list
+
+        :raises     ValueError:  A value is not valid
         """
-        self.logger.debug('Updating existing cfg {} with {}'.
-                          format(json.dumps(self.config_data),
-                                 json.dumps(data)))
+        changed = self._config_store.save(data=data)
 
-        data_decoded = dict()
-        for key, val in data.items():
-            try:
-                val_decoded = int(val)
-            except Exception:
-                val_decoded = val
-            data_decoded[key] = val_decoded
+        if changed:
+            self._config_data = self._config_store.values
+            self._update_config_properties()
+            self.logger.debug('Saved changed config values {} to {}'.
+                              format(changed, self.config_file_path))
+        else:
+            self.logger.debug('Config unchanged, not saved')
 
-        try:
-            existing_data = self.config_data
-            existing_data.update(data_decoded)
-            self.config_data = existing_data
-        except Exception as e:
-            self.logger.debug('Failed to update config_data with new data: {}'.
-                              format(e))
-
-        self.logger.debug('Saving JSON config {} to {}'.
-                          format(json.dumps(self.config_data),
-                                 self.config_file_path))
-        GenericHelper.save_json(data=self.config_data,
-                                path=self.config_file_path)
+        return changed
 
     def setup_wifi_connection(self) -> None:
         """
@@ -492,6 +825,8 @@ class Webinterface(object):
         AccessPoint if configured by the system config file or in case the
         connection to all configured networks failed
         """
+        self._boot_profile.start(name='setup_wifi_connection')
+
         self.logger.debug('WiFi connection timeout: {} sec'.
                           format(self._wm.connection_timeout))
         self.logger.debug('WiFi connection result: {}'.
@@ -529,7 +864,8 @@ class Webinterface(object):
                                  format(e))
 
             self._station.active(False)
-            time.sleep(1)
+            self._wait_for(condition=lambda: not self._station.active(),
+                           description='station deactivation')
 
             # create a true AccessPoint without any active Station mode
             ap_name = 'MyEVSE_{}'.format(
@@ -541,6 +877,8 @@ class Webinterface(object):
                                   channel=11,
                                   timeout=5)
 
+        self._boot_profile.stop()
+
     def setup_modbus_connection(self) -> None:
         """
         Setup the Modbus connection (bridge) between the MyEVSE as RTU and the
@@ -549,9 +887,17 @@ class Webinterface(object):
         Connection settings to the MyEVSE are defined in the registers JSON
         file. The TCP port is taken from the system config file.
 
-        The data collection thread as well as the data provision thread is
-        finally started.
+        The data collection as well as the data provision is finally started,
+        either as tasks of the webserver event loop or as threads, depending
+        on @see modbus_async
         """
+        if self._mb_bridge is None:
+            self.logger.info('No Modbus bridge in connection mode {}'.
+                             format(self.connection_mode))
+            return
+
+        self._boot_profile.start(name='setup_modbus_connection')
+
         # for testing use 'debug' level
         # for beta testing with full BE32-01 board use 'info' level
         # for production use 'warning' level, default
@@ -601,10 +947,17 @@ class Webinterface(object):
                           format(self._mb_bridge.client,
                                  self._mb_bridge.client_unit))
 
-        # start collecting latest RTU client data in thread and TCP data
-        # provisioning in another thread
-        self._mb_bridge.collecting_client_data = True
-        self._mb_bridge.provisioning_host_data = True
+        if self.modbus_async:
+            # collect latest RTU client data and provide TCP data in tasks
+            # run by the webserver event loop
+            self._mb_bridge.start_async()
+        else:
+            # start collecting latest RTU client data in thread and TCP data
+            # provisioning in another thread
+            self._mb_bridge.collecting_client_data = True
+            self._mb_bridge.provisioning_host_data = True
+
+        self._boot_profile.stop()
 
     def start_webinterface(self) -> None:
         """
@@ -615,10 +968,16 @@ class Webinterface(object):
 
         All setup steps have to be performed before calling this function.
         """
-        self.logger.debug('Collect latest client data every {} seconds'.
-                          format(self._mb_bridge.collection_interval))
-        self.logger.debug('Synchronize Host-Client every {} seconds'.
-                          format(self._mb_bridge.synchronisation_interval))
+        self._boot_profile.start(name='start_webinterface')
+
+        # listen on all interfaces if there is no Modbus bridge
+        device_ip = '0.0.0.0'
+        if self._mb_bridge is not None:
+            self.logger.debug('Collect latest client data every {} seconds'.
+                              format(self._mb_bridge.collection_interval))
+            self.logger.debug('Synchronize Host-Client every {} seconds'.
+                              format(self._mb_bridge.synchronisation_interval))
+            device_ip = self._mb_bridge._get_network_ip()
 
         self._led.turn_off()
         self._pixel.color = 'green'
@@ -626,11 +985,32 @@ class Webinterface(object):
         # set scanning interval, scan is started on property access
         self._wm.scan_interval = 10000
 
-        device_ip = self._mb_bridge._get_network_ip()
+        # run by the event loop of the webserver as soon as it is started
+        asyncio.create_task(self._finish_boot_profile())
         self._wm.run(host=device_ip, port=80, debug=True)
 
         self.logger.debug('Beyond WiFiManager run function')
 
+    async def _finish_boot_profile(self, timeout: int = 5000) -> None:
+        """
+        Finish the boot profile as soon as the webserver is listening
+
+        :param      timeout:  The maximum time to wait in milliseconds
+        :type       timeout:  int
+        """
+        start_ticks = time.ticks_ms()
+
+        while (getattr(self._wm.app, 'server', None) is None and
+                time.ticks_diff(time.ticks_ms(), start_ticks) < timeout):
+            await asyncio.sleep(0.01)
+
+        self._boot_profile.stop()
+        self._boot_profile.finish()
+        self.logger.info('Boot finished after {}ms, Modbus TCP ready after '
+                         '{}ms'.format(self._boot_profile.total,
+                                       self._boot_profile.ready(
+                                           name='setup_modbus_connection')))
+
     def wait_for_irq(self) -> None:
         """
         Backup function to keep device in an endless loop.
@@ -645,6 +1025,63 @@ class Webinterface(object):
         # This function has to be available as the main.py file is not updated
         # with any updates and is calling this function at some point in time
 
+    @property
+    def data_etag(self) -> str:
+        """
+        Get the entity tag of the latest Modbus data
+
+        :returns:   Quoted entity tag based on the data generation
+        :rtype:     str
+        """
+        return '"{}-{}"'.format(self._etag_epoch,
+                                self._mb_bridge.data_generation)
+
+    def _is_not_modified(self, req: Request, etag: str) -> bool:
+        """
+        Check the requested entity tag against the current one
+
+        :param      req:    The request
+        :type       req:    Request
+        :param      etag:   The current entity tag
+        :type       etag:   str
+
+        :returns:   True if the client already has the current data
+        :rtype:     bool
+        """
+        return etag in req.headers.get('If-None-Match', '')
+
+    def _send_html_file(self, req: Request, filename: str) -> Response:
+        """
+        Send a static HTML file, gzip compressed if accepted by the client
+
+        The compressed file is used if it has been installed next to the
+        uncompressed file as "<filename>.gz"
+
+        :param      req:       The request
+        :type       req:       Request
+        :param      filename:  The path to the uncompressed file
+        :type       filename:  str
+
+        :returns:   Response with the file content
+        :rtype:     Response
+        """
+        res = None
+
+        if 'gzip' in req.headers.get('Accept-Encoding', ''):
+            try:
+                res = send_file(filename=filename + '.gz',
+                                content_type='text/html')
+                res.headers['Content-Encoding'] = 'gzip'
+            except OSError:
+                self.logger.debug('No compressed file of {}'.format(filename))
+
+        if res is None:
+            res = send_file(filename=filename, content_type='text/html')
+
+        res.headers['Vary'] = 'Accept-Encoding'
+
+        return res
+
     @property
     def system_infos(self) -> dict:
         """
@@ -657,6 +1094,10 @@ class Webinterface(object):
         sys_info['version'] = webinterface_version.__version__
         sys_info['version_be_helpers'] = be_helpers_version.__version__
         sys_info['version_wifi_manager'] = wifi_manager_version.__version__
+        sys_info['modbus_mode'] = 'none'
+        if self._mb_bridge is not None:
+            sys_info['modbus_mode'] = 'async' \
+                if self._mb_bridge.running_async else 'thread'
 
         return sys_info
 
@@ -689,14 +1130,16 @@ class Webinterface(object):
     # @app.route('/reboot_system')
     async def reboot_system(self, req: Request) -> None:
         """Reboot the system"""
-        res = send_file('/lib/templates/reboot.tpl')
-        res.headers["Content-Type"] = "text/html"
-
-        return res
+        return self._send_html_file(req=req,
+                                    filename='/lib/templates/reboot.tpl')
 
     # @app.route('/perform_reboot_system')
     async def perform_reboot_system(self, req: Request) -> None:
         """Process system reboot"""
+        # keep the latest register history
+        if self._mb_bridge is not None:
+            self._mb_bridge.flush_history_log()
+
         # perform soft reset, like CTRL+D
         await machine.soft_reset()
 
@@ -717,51 +1160,113 @@ class Webinterface(object):
         #     'REGISTERS': 'modbusRegisters-MyEVSE.json'
         # }
 
-        await self._save_system_config(data=form_data)
+        try:
+            await self._save_system_config(data=form_data)
+        except ValueError as e:
+            return {'error': str(e)}, 400
 
         # empty response to avoid any redirects or errors due to none response
         return None, 204, {'Content-Type': 'application/json; charset=UTF-8'}
 
-    async def _render_modbus_data(self, device_data: dict) -> str:
+    def _iter_modbus_data(self, device_data: dict) -> Generator:
         """
-        Render HTML table of given device data
+        Render HTML table of given device data chunk by chunk
+
+        Only a single table row is rendered at a time, the peak RAM usage is
+        thereby independent of the amount of registers
 
         :param      device_data:    All device register data
         :type       device_data:    dict
 
-        :returns:   Sub content of Modbus data page
-        :rtype:     str
+        :returns:   Generator yielding sub content of Modbus data page
+        :rtype:     Generator
         """
-        content = ""
+        register_index = self._mb_bridge.register_index
+
+        for reg_type in register_index.register_types:
+            reg_type_data = device_data.get(reg_type, None)
+            if reg_type_data is None:
+                continue
 
-        for reg_type, reg_type_data in sorted(device_data.items()):
-            reg_type_table = """
+            yield """
             <h5>{}</h5><table class="table table-striped table-bordered table-hover"><thead class="thead-dark"><tr><th scope="col">Register</th><th scope="col">Name</th><th scope="col">Value</th></tr></thead><tbody>
             """.format(reg_type)    # noqa: E501
 
-            # iterage e.g. IREGS, sorted by register
-            for register, register_data in sorted(reg_type_data.items(),
-                                                  key=lambda item: item[1]['register']):    # noqa: E501
+            # iterate e.g. IREGS, indexed by register
+            for register in register_index.registers(reg_type):
+                register_data = reg_type_data.get(register.name, None)
+                if register_data is None:
+                    continue
+
                 register_value = register_data['val']
 
-                if (isinstance(register_data['val'], list) and
-                        len(register_data['val']) == 2):
+                if (isinstance(register_value, list) and
+                        len(register_value) == 2):
                     # actual a uint32_t value, reconstruct it
-                    register_value = register_data['val'][0] << 16 | register_data['val'][1]    # noqa: E501
+                    register_value = register_value[0] << 16 | register_value[1]    # noqa: E501
 
-                reg_type_table += """
-                <tr><th scope="row">{register}</th><td>{register_name}</td><td>{register_value}</td></tr>
-                """.format(register=register_data['register'],  # noqa: E501
-                           register_name=register,
+                yield """
+                <tr><th scope="row">{register}</th><td>{register_name}</td><td id="{reg_type}-{register_name}">{register_value}</td></tr>
+                """.format(register=register.address,  # noqa: E501
+                           register_name=register.name,
+                           reg_type=reg_type,
                            register_value=register_value)
 
             # finish this table
-            reg_type_table += "</tbody></table><br>"
+            yield "</tbody></table><br>"
+
+    async def _render_modbus_data(self, device_data: dict) -> str:
+        """
+        Render HTML table of given device data
 
-            # add this register typte table to the overall content
-            content += reg_type_table
+        Use @see _iter_modbus_data to stream the content instead of creating
+        the complete content in RAM
 
-        return content
+        :param      device_data:    All device register data
+        :type       device_data:    dict
+
+        :returns:   Sub content of Modbus data page
+        :rtype:     str
+        """
+        return "".join(self._iter_modbus_data(device_data=device_data))
+
+    def _iter_modbus_json(self, device_data: dict) -> Generator:
+        """
+        Serialize given device data as JSON chunk by chunk
+
+        The registers are serialized in the order of the register index, one
+        register at a time
+
+        :param      device_data:    All device register data
+        :type       device_data:    dict
+
+        :returns:   Generator yielding the JSON document
+        :rtype:     Generator
+        """
+        register_index = self._mb_bridge.register_index
+        type_separator = ''
+
+        yield '{'
+        for reg_type in register_index.register_types:
+            reg_type_data = device_data.get(reg_type, None)
+            if reg_type_data is None:
+                continue
+
+            yield '{}"{}": {{'.format(type_separator, reg_type)
+            type_separator = ', '
+
+            register_separator = ''
+            for register in register_index.registers(reg_type):
+                register_data = reg_type_data.get(register.name, None)
+                if register_data is None:
+                    continue
+
+                yield '{}"{}": {}'.format(register_separator,
+                                          register.name,
+                                          json.dumps(register_data))
+                register_separator = ', '
+            yield '}'
+        yield '}'
 
     async def _render_system_info(self, system_data: dict) -> str:
         """
@@ -790,27 +1295,479 @@ class Webinterface(object):
 
         return content
 
+    def _render_route_latency(self) -> str:
+        """
+        Render HTML table of the request latency of all requested pages
+
+        The percentiles are given as upper bound of their histogram bucket
+
+        :returns:   Sub content of system info page
+        :rtype:     str
+        """
+        bounds = LatencyHistogram.BOUNDS
+        content = """
+        <h5>Request latency</h5><table class="table table-striped table-bordered table-hover"><thead class="thead-dark"><tr><th scope="col">Route</th><th scope="col">Requests</th><th scope="col">Mean [ms]</th><th scope="col">P50 [ms]</th><th scope="col">P95 [ms]</th><th scope="col">Max [ms]</th></tr></thead><tbody>
+        """     # noqa: E501
+
+        for url, histogram in sorted(self._route_latency.histograms.items()):
+            if not histogram.count:
+                continue
+
+            percentiles = list()
+            for percent in (50, 95):
+                index = histogram.quantile(percent=percent)
+                if index < len(bounds):
+                    percentiles.append('&le; {}'.format(bounds[index]))
+                else:
+                    percentiles.append('&gt; {}'.format(bounds[-1]))
+
+            content += """
+            <tr><th scope="row">{url}</th><td>{count}</td><td>{mean:.1f}</td><td>{p50}</td><td>{p95}</td><td>{max:.1f}</td></tr>
+            """.format(url=url,   # noqa: E501
+                       count=histogram.count,
+                       mean=histogram.sum / histogram.count / 1000,
+                       p50=percentiles[0],
+                       p95=percentiles[1],
+                       max=histogram.max / 1000)
+
+        # finish this table
+        content += "</tbody></table>"
+
+        return content
+
+    def _iter_cached_modbus_data(self) -> Generator:
+        """
+        Get the latest modbus data as HTML table from the render cache
+
+        The content is rendered and cached only if the data generation
+        changed since the cached content has been rendered
+
+        :returns:   Generator yielding the complete or partial content
+        :rtype:     Generator
+        """
+        generation = self._mb_bridge.data_generation
+        content = self._render_cache.get(key='modbus_data_table',
+                                         tag=generation)
+
+        if content is not None:
+            yield content
+            return
+
+        latest_data = self._mb_bridge.client_data
+        yield from self._render_cache.store_chunks(
+            key='modbus_data_table',
+            tag=generation,
+            chunks=self._iter_modbus_data(device_data=latest_data))
+
     # @app.route('/data')
     async def device_data(self, req: Request) -> None:
         """Provide webpage listing the latest device data as table"""
-        latest_data = self._mb_bridge.client_data
-        content = await self._render_modbus_data(device_data=latest_data)
+        etag = self.data_etag
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if self._is_not_modified(req=req, etag=etag):
+            return '', 304, headers
 
-        return render_template(template='data.tpl', req=None, content=content)
+        content = self._iter_cached_modbus_data()
+
+        # the template iterates the content, the response is streamed
+        return render_template(template='data.tpl',
+                               req=None,
+                               content=content), 200, headers
 
     # @app.route('/modbus_data')
     async def modbus_data(self, req: Request) -> None:
-        """Provide latest modbus data as JSON"""
-        # https://microdot.readthedocs.io/en/latest/intro.html#json-responses
-        return self._mb_bridge.client_data
+        """
+        Provide latest modbus data as JSON
+
+        With a "since" query parameter only the registers changed after this
+        data generation are provided together with the current generation
+        """
+        etag = self.data_etag
+        headers = {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'ETag': etag,
+            'Cache-Control': 'no-cache',
+        }
+        if self._is_not_modified(req=req, etag=etag):
+            return '', 304, headers
+
+        since = req.args.get('since', None)
+        if since is not None:
+            return self._modbus_data_since(since=since,
+                                           epoch=req.args.get('epoch', None),
+                                           headers=headers)
+
+        latest_data = self._mb_bridge.client_data
+        content = self._iter_modbus_json(device_data=latest_data)
+
+        return content, 200, headers
+
+    def _modbus_data_since(self,
+                           since: str,
+                           epoch: str,
+                           headers: dict) -> tuple:
+        """
+        Get the registers changed after a data generation
+
+        The complete data is provided if the generation or epoch is unknown,
+        e.g. as it belongs to a previous boot
+
+        :param      since:    The data generation known by the client
+        :type       since:    str
+        :param      epoch:    The epoch known by the client
+        :type       epoch:    str
+        :param      headers:  The response headers
+        :type       headers:  dict
+
+        :returns:   Response content, status code and headers
+        :rtype:     tuple
+        """
+        try:
+            since = int(since)
+        except ValueError:
+            return {'error': 'since shall be an int'}, 400
+
+        generation = self._mb_bridge.data_generation
+
+        if (0 <= since <= generation and
+                (epoch is None or epoch == self._etag_epoch)):
+            data = self._mb_bridge.changes_since(generation=since)
+        else:
+            data = self._mb_bridge.client_data
+
+        content = {
+            'epoch': self._etag_epoch,
+            'generation': generation,
+            'data': data,
+        }
+
+        return content, 200, headers
 
     # @app.route('/modbus_data_table')
     async def modbus_data_table(self, req: Request) -> None:
         """Provide latest modbus data table HTML code"""
-        latest_data = self._mb_bridge.client_data
-        content = await self._render_modbus_data(device_data=latest_data)
+        etag = self.data_etag
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if self._is_not_modified(req=req, etag=etag):
+            return '', 304, headers
+
+        content = self._iter_cached_modbus_data()
+
+        # a generator as response body is sent chunk by chunk by microdot
+        return content, 200, headers
+
+    # @app.route('/modbus_stream')
+    async def modbus_stream(self, req: Request) -> None:
+        """Provide changes of the modbus data as Server-Sent Events"""
+        # forget about streams of clients which have gone
+        self._event_streams = [s for s in self._event_streams if s.active]
+        if len(self._event_streams) >= self._max_event_streams:
+            return {'error': 'too many stream clients'}, 503
+
+        # reconnecting clients send the ID of the last received event, it is
+        # only of use if it has been sent during this boot
+        last_event_id = req.headers.get('Last-Event-ID', '')
+        last_generation = -1
+        if last_event_id.startswith(self._etag_epoch + '-'):
+            try:
+                last_generation = int(last_event_id.split('-')[-1])
+            except ValueError:
+                pass
 
-        return content
+        ModbusEventStream = self._load(module='event_stream').\
+            ModbusEventStream
+        content = ModbusEventStream(bridge=self._mb_bridge,
+                                    epoch=self._etag_epoch,
+                                    last_generation=last_generation)
+        self._event_streams.append(content)
+
+        return content, 200, {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+        }
+
+    # @app.route('/modbus_history')
+    async def modbus_history(self, req: Request) -> None:
+        """
+        Provide the history of a modbus register as JSON
+
+        The register is selected by the "reg" query parameter, samples older
+        than the "from" timestamp are skipped, "points" limits the number of
+        provided samples by combining consecutive samples to their mean value.
+
+        Samples older than the history in RAM are read from the persistent
+        history log, limited to the depth of the history in RAM.
+        """
+        history = self._mb_bridge.history
+        history_log = self._mb_bridge.history_log
+
+        name = req.args.get('reg', None)
+        register = history.register(name=name)
+        if register is None:
+            return {
+                'error': 'reg shall be one of {}'.format(
+                    history.register_names)
+            }, 400
+
+        try:
+            since = int(req.args.get('from', 0))
+            points = int(req.args.get('points', 0))
+        except ValueError:
+            return {'error': 'from and points shall be int'}, 400
+
+        oldest_timestamp = history.oldest_timestamp(name=name)
+        if (history_log is not None and since and
+                (oldest_timestamp is None or since < oldest_timestamp)):
+            if points <= 0 or points > history.depth:
+                points = history.depth
+            source = 'log'
+            downsample = self._load(module='register_history').downsample
+            data = downsample(
+                samples=lambda: history_log.samples(name=name, since=since),
+                points=points)
+        else:
+            source = 'ram'
+            data = history.samples(name=name, since=since, points=points)
+
+        return {
+            'reg': name,
+            'unit': register.unit,
+            'depth': history.depth,
+            'source': source,
+            'data': data,
+        }
+
+    # @app.route('/modbus_write')
+    async def modbus_write(self, req: Request) -> None:
+        """
+        Write coils or holding registers of the MyEVSE
+
+        The JSON body maps register names to their new values. The writes are
+        sent ahead of the next block read, a pending write of the same
+        register is replaced by the latest value. The result of each write
+        contains the written value and the latency from this request to the
+        acknowledgement of the MyEVSE in milliseconds.
+        """
+        start_ticks = time.ticks_ms()
+        data = req.json
+
+        if not isinstance(data, dict) or not data:
+            return {'error': 'body shall be a JSON object of register names '
+                             'and values'}, 400
+
+        # validate all values before any write is queued
+        writes = list()
+        for name, value in data.items():
+            register = self._mb_bridge.register_index.register(name=name)
+            if (register is None or
+                    register.reg_type not in ['COILS', 'HREGS'] or
+                    register.length != 1):
+                return {'error': '{} is no single coil or holding register'.
+                                 format(name)}, 400
+
+            if register.reg_type == 'COILS':
+                if value not in [True, False]:
+                    return {'error': '{} shall be bool'.format(name)}, 400
+                value = bool(value)
+            elif (not isinstance(value, int) or isinstance(value, bool) or
+                    not 0 <= value <= 0xFFFF):
+                return {'error': '{} shall be int in range 0-65535'.
+                                 format(name)}, 400
+
+            writes.append((name, register, value))
+
+        requests = list()
+        for name, register, value in writes:
+            requests.append((name, self._mb_bridge.queue_write(
+                register=register,
+                value=value)))
+
+        result = dict()
+        success = True
+        for name, request in requests:
+            while (not request.done and
+                    time.ticks_diff(time.ticks_ms(), start_ticks) <
+                    self.WRITE_TIMEOUT):
+                await asyncio.sleep(0.005)
+
+            latency = None
+            if request.done:
+                latency = time.ticks_diff(request.done_ticks, start_ticks)
+            success = success and request.success
+            result[name] = {
+                'success': request.success,
+                'val': request.value,
+                'latency': latency,
+            }
+
+        return result, 200 if success else 502
+
+    def load_modbus_profile(self, name: str) -> dict:
+        """
+        Load a register profile file
+
+        :param      name:  The profile name, e.g. 'MyEVSE'
+        :type       name:  str
+
+        :returns:   The profile with the values of coils and holding registers
+        :rtype:     dict
+
+        :raises     ValueError:  Profile name is invalid
+        :raises     OSError:     Profile file does not exist
+        """
+        if not isinstance(name, str) or not name or '/' in name:
+            raise ValueError('{} is no valid profile name'.format(name))
+
+        with open(self.PROFILE_FILE.format(name), 'r') as file:
+            return json.load(file)
+
+    async def apply_modbus_profile(self, profile: dict) -> dict:
+        """
+        Apply a register profile to the MyEVSE
+
+        The coils and holding registers of the profile are planned into the
+        fewest multiple register writes, sent as a single burst followed by
+        reads of the same registers to verify the written values.
+
+        :param      profile:  The profile, like a set-modbusRegisters file
+        :type       profile:  dict
+
+        :returns:   Number of writes, duration in milliseconds and result of
+                    each register
+        :rtype:     dict
+
+        :raises     ValueError:  Profile contains unknown registers or
+                                 invalid values
+        """
+        start_ticks = time.ticks_ms()
+        RegisterProfile = self._load(module='register_profile').\
+            RegisterProfile
+        register_profile = RegisterProfile(
+            profile=profile,
+            register_index=self._mb_bridge.register_index)
+
+        results = dict()
+        if len(register_profile):
+            results = await self._mb_bridge.apply_profile(
+                profile=register_profile)
+
+        return {
+            'writes': len(register_profile),
+            'duration': time.ticks_diff(time.ticks_ms(), start_ticks),
+            'registers': results,
+        }
+
+    # @app.route('/modbus_profile')
+    async def modbus_profile(self, req: Request) -> None:
+        """
+        Apply a register profile to the MyEVSE
+
+        The JSON body is either a profile like a set-modbusRegisters file or
+        selects a profile file by name, e.g. {"profile": "MyEVSE"}. The
+        result of each register contains the profile and read back value.
+        """
+        data = req.json
+
+        if not isinstance(data, dict):
+            return {'error': 'body shall be a JSON object'}, 400
+
+        if 'profile' in data:
+            try:
+                data = self.load_modbus_profile(name=data['profile'])
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            except OSError:
+                return {'error': 'profile {} not found'.
+                                 format(data['profile'])}, 404
+
+        try:
+            result = await self.apply_modbus_profile(profile=data)
+        except (ValueError, KeyError, AttributeError) as e:
+            return {'error': 'invalid profile: {}'.format(e)}, 400
+
+        success = all(entry['success']
+                      for entry in result['registers'].values())
+
+        return result, 200 if success else 502
+
+    # @app.route('/boot_profile')
+    async def boot_profile(self, req: Request) -> None:
+        """
+        Provide the duration and free RAM of the boot phases
+
+        The times since power on until the Modbus TCP interface and the
+        webserver are ready are given in milliseconds. Modules imported on
+        first use by the active connection mode are listed with their import
+        time and used RAM
+        """
+        return {
+            'connection_mode': self.connection_mode,
+            'phases': self._boot_profile.phases,
+            'imports': self._boot_profile.imports,
+            'modbus_ready': self._boot_profile.ready(
+                name='setup_modbus_connection'),
+            'total': self._boot_profile.total,
+        }
+
+    # @app.route('/diagnostics')
+    async def diagnostics(self, req: Request) -> None:
+        """
+        Provide the memory accounting of all pages
+
+        The accounting is enabled or disabled by posting "enabled", "reset"
+        clears all statistics. Allocations are given in bytes, durations in
+        microseconds
+        """
+        if req.method == 'POST':
+            form_data = req.json
+            if not isinstance(form_data, dict):
+                return {'error': 'data shall be a JSON object'}, 400
+
+            if form_data.get('reset', False):
+                self._route_monitor.reset()
+            if 'enabled' in form_data:
+                self._route_monitor.enabled = bool(form_data['enabled'])
+
+        return {
+            'enabled': self._route_monitor.enabled,
+            'free_ram_after_boot': self._free_ram_after_boot,
+            'heap': {
+                'alloc': gc.mem_alloc(),
+                'free': gc.mem_free(),
+                'peak': self._route_monitor.peak,
+            },
+            'routes': self._route_monitor.stats,
+        }
+
+    # @app.route('/metrics')
+    async def metrics(self, req: Request) -> None:
+        """
+        Provide the system and Modbus metrics in the Prometheus text format
+
+        The text is written into a buffer allocated on the first request and
+        sent directly from it
+        """
+        if self._metrics is None:
+            register_index = None
+            if self._mb_bridge is not None:
+                register_index = self._mb_bridge.register_index
+
+            Metrics = self._load(module='metrics').Metrics
+            self._metrics = Metrics(
+                register_index=register_index,
+                route_latency=self._route_latency,
+                info={
+                    'version': webinterface_version.__version__,
+                    'be_helpers': be_helpers_version.__version__,
+                    'wifi_manager': wifi_manager_version.__version__,
+                })
+
+        content = self._metrics.render(bridge=self._mb_bridge)
+
+        return content, 200, {
+            'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+            'Content-Length': str(content.length),
+        }
 
     # @app.route('/info')
     async def system_info(self, req: Request) -> None:
@@ -828,30 +1785,42 @@ class Webinterface(object):
             'version': 'Software version Webinterface',
             'version_be_helpers': 'Software version helpers',
             'version_wifi_manager': 'Software version WiFiManager',
+            'modbus_mode': 'Modbus data collection mode',
             'uptime': 'System uptime'
         }
 
+        # the free RAM and uptime change with every request, caching the
+        # content would only evict the Modbus data table from the cache
         content = await self._render_system_info(system_data=latest_data)
+        content += self._render_route_latency()
 
         return render_template(template='system.tpl', req=0, content=content)
 
     # @app.route('/system_data')
     async def system_data(self, req: Request) -> None:
         """Provide latest system data as JSON"""
+        latest_data = self.system_infos
+        latest_data['render_cache'] = self._render_cache.stats
+        if self._mb_bridge is not None:
+            latest_data['modbus_writes'] = self._mb_bridge.write_queue.stats
+
         # https://microdot.readthedocs.io/en/latest/intro.html#json-responses
-        return self.system_infos
+        return latest_data
 
     # @app.route('/update')
     async def update_system(self, req: Request) -> None:
         """Provide system update page"""
-        res = send_file('/lib/templates/update.tpl')
-        res.headers["Content-Type"] = "text/html"
-
-        return res
+        return self._send_html_file(req=req,
+                                    filename='/lib/templates/update.tpl')
 
     # @app.route('/perform_system_update')
-    def perform_system_update(self, req: Request) -> None:
-        """Process system update"""
+    async def perform_system_update(self, req: Request) -> None:
+        """
+        Start the system update as background job
+
+        The job ID is returned at once, the progress is provided by
+        /update_status
+        """
         form_data = req.json
 
         # Whether form data comes from GET or POST request, once parsed,
@@ -864,23 +1833,9 @@ class Webinterface(object):
         #     'UPDATE_TYPE': '1'    # 0: stable, 1: test versions
         # }
 
-        # stop data collection and provisioning threads
-        self._mb_bridge.collecting_client_data = False
-        self._mb_bridge.provisioning_host_data = False
-
-        # stop WiFi scanning thread
-        self._wm.scanning = False
-
-        self._pixel.color = 'yellow'
-
-        # wait a bit to safely finish the may still running threads
-        time.sleep(5)
-
-        gc.collect()
-
-        self._update_ongoing = True
+        if self._update_job is not None and self._update_job.running:
+            return self._update_job.status, 409
 
-        import upip
         index_urls = [
             "https://micropython.org/pi",
             "https://pypi.org/pypi"
@@ -898,23 +1853,108 @@ class Webinterface(object):
                 'http://192.168.178.105:8089',
                 'https://test.pypi.org/pypi',
             ] + index_urls
-        upip.index_urls = index_urls
-        upip.install('myevse-webinterface')
-        # 125.147ms, approx. 2 min
 
+        packages = ['myevse-webinterface']
         if form_data.get('ADDITIONAL_PACKAGES', ''):
             for package in form_data['ADDITIONAL_PACKAGES'].split(','):
-                self.logger.debug('Installing additional custom package: {}'.
-                                  format(package.strip()))
-                upip.install(package.strip())
+                if package.strip():
+                    packages.append(package.strip())
 
-        # remove already rendered template to ensure updated ones are shown
+        UpdateJob = self._load(module='update_job').UpdateJob
+        self._update_job = UpdateJob(packages=packages, index_urls=index_urls)
+        asyncio.create_task(self._run_system_update(job=self._update_job))
+
+        return {'success': True, 'id': self._update_job.id}, 202
+
+    async def _run_system_update(self, job) -> None:
+        """
+        Stop the Modbus bridge and install the packages of an update job
+
+        :param      job:  The update job
+        :type       job:  UpdateJob
+        """
+        job.phase = 'stopping'
+
+        # stop data collection and provisioning tasks or threads
+        if not await self._mb_bridge.stop():
+            self.logger.warning('Updating with Modbus bridge still running')
+
+        # stop WiFi scanning thread
+        self._wm.scanning = False
+
+        self._pixel.color = 'yellow'
+
+        # keep the latest register history
+        self._mb_bridge.flush_history_log()
+
+        gc.collect()
+
+        self._update_ongoing = True
+
+        # approx. 2 min, installed by a thread to keep the webserver running
+        job.start()
+        while job.phase == 'installing':
+            await asyncio.sleep(1)
+
+        if job.phase == 'failed':
+            self.logger.warning(job.error)
+            self._resume_after_update()
+            return
+
+        job.phase = 'cleanup'
+
+        # remove templates compiled on the device to ensure updated ones are
+        # shown, precompiled ones have been replaced by the update. A module
+        # is imported from a .py file before a .mpy file of the same name
         import os
-        templates_path = '/lib/templates/'
-        for ele in os.listdir(templates_path):
-            if ele.endswith('_tpl.py'):
-                os.remove(templates_path + ele)
+        templates_path = '/' + self.TEMPLATE_DIR + '/'
+        try:
+            for ele in os.listdir(templates_path):
+                if not ele.endswith('_tpl.py'):
+                    continue
+                path = templates_path + ele
+                if (not self._is_precompiled_template(path=path) or
+                        PathHelper.exists(path=path[:-len('.py')] + '.mpy')):
+                    os.remove(path)
+        except OSError as e:
+            self.logger.warning('Failed to remove rendered templates: {}'.
+                                format(e))
 
         self.update_complete = True
+        job.finish(phase='done')
+        self.logger.info('System update finished: {}'.format(job.status))
+
+    def _resume_after_update(self) -> None:
+        """
+        Resume the Modbus bridge and WiFi scanning after a failed update
+
+        The previous version is still installed, the bridge is started again
+        the same way as by @see setup_modbus_connection
+        """
+        if self.modbus_async:
+            self._mb_bridge.start_async()
+        else:
+            self._mb_bridge.collecting_client_data = True
+            self._mb_bridge.provisioning_host_data = True
+
+        # restart WiFi scanning thread
+        self._wm.scanning = True
+
+        self._pixel.color = 'green'
+        self._update_ongoing = False
+
+    # @app.route('/update_status')
+    async def update_status(self, req: Request) -> None:
+        """
+        Provide the status of the latest system update job
+
+        The optional 'id' argument selects the job, a different ID than the
+        one of the latest job is not found
+        """
+        job = self._update_job
+        job_id = req.args.get('id', None)
+
+        if job is None or (job_id is not None and job_id != job.id):
+            return {'error': 'update job not found'}, 404
 
-        return {'success': True}
+        return job.status
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Write Queue
+
+Queue of Modbus register writes, coalescing repeated writes to the same
+register to the latest value
+"""
+
+# system packages
+import _thread
+import time
+
+# custom modules
+from .register_index import Register
+
+
+class WriteRequest(object):
+    """Pending or finished write of a single register"""
+    __slots__ = ('register', 'value', 'queued_ticks', 'done_ticks', 'success',
+                 'coalesced')
+
+    def __init__(self, register: Register, value) -> None:
+        self.register = register
+        self.value = value
+        self.queued_ticks = time.ticks_ms()
+        self.done_ticks = None
+        self.success = False
+        # number of later writes merged into this one
+        self.coalesced = 0
+
+    @property
+    def done(self) -> bool:
+        """
+        Get the status of the write
+
+        :returns:   True if the write has been acknowledged or failed
+        :rtype:     bool
+        """
+        return self.done_ticks is not None
+
+    @property
+    def latency(self) -> int:
+        """
+        Get the time from queueing to the acknowledgement of the write
+
+        :returns:   Latency in milliseconds, None if not yet done
+        :rtype:     int
+        """
+        if self.done_ticks is None:
+            return None
+
+        return time.ticks_diff(self.done_ticks, self.queued_ticks)
+
+
+class WriteQueue(object):
+    """
+    Queue of register writes
+
+    A write to a register with a pending write replaces the value of the
+    pending write, so only the latest value is sent. Writes taken from the
+    queue are sent, a following write of the same register is queued again.
+    """
+    def __init__(self) -> None:
+        self._pending = list()
+        self._lock = _thread.allocate_lock()
+
+        self._written = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._last_latency = 0
+        self._max_latency = 0
+        self._total_latency = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def written(self) -> int:
+        """
+        Get the number of acknowledged writes
+
+        :returns:   Number of writes acknowledged by the client
+        :rtype:     int
+        """
+        return self._written
+
+    @property
+    def failed(self) -> int:
+        """
+        Get the number of failed writes
+
+        :returns:   Number of writes not acknowledged by the client
+        :rtype:     int
+        """
+        return self._failed
+
+    @property
+    def stats(self) -> dict:
+        """
+        Get write statistics
+
+        :returns:   Counts of writes and their latency in milliseconds
+        :rtype:     dict
+        """
+        finished = self._written + self._failed
+
+        return {
+            'pending': len(self._pending),
+            'written': self._written,
+            'failed': self._failed,
+            'coalesced': self._coalesced,
+            'last_latency': self._last_latency,
+            'max_latency': self._max_latency,
+            'mean_latency': self._total_latency // finished if finished else 0,
+        }
+
+    def put(self, register: Register, value) -> WriteRequest:
+        """
+        Queue a write of a register
+
+        :param      register:  The register
+        :type       register:  Register
+        :param      value:     The value
+        :type       value:     Union[bool, int]
+
+        :returns:   The queued write, an already pending one if coalesced
+        :rtype:     WriteRequest
+        """
+        with self._lock:
+            for request in self._pending:
+                if request.register is register:
+                    request.value = value
+                    request.coalesced += 1
+                    self._coalesced += 1
+                    return request
+
+            request = WriteRequest(register=register, value=value)
+            self._pending.append(request)
+
+        return request
+
+    def pop(self) -> WriteRequest:
+        """
+        Take the oldest pending write from the queue
+
+        :returns:   The write, None if nothing is pending
+        :rtype:     WriteRequest
+        """
+        with self._lock:
+            if not self._pending:
+                return None
+
+            return self._pending.pop(0)
+
+    def done(self, request: WriteRequest, success: bool) -> None:
+        """
+        Finish a write taken from the queue
+
+        :param      request:  The write
+        :type       request:  WriteRequest
+        :param      success:  Flag whether the client acknowledged the write
+        :type       success:  bool
+        """
+        request.success = success
+        request.done_ticks = time.ticks_ms()
+
+        latency = request.latency
+        if success:
+            self._written += 1
+        else:
+            self._failed += 1
+        self._last_latency = latency
+        self._max_latency = max(self._max_latency, latency)
+        self._total_latency += latency
@@ -14,6 +14,12 @@
 # Preprocessing steps:
 #  * Creation of Python resource module (R.py) from each top-level package's
 #    resources.
+#  * Creation of gzip compressed variants of static data files with 4K
+#    dictionary size, for each data file ending with ".gz".
+#  * Compilation of utemplate templates into Python modules, for each data
+#    file ending with "_tpl.py". The modules are compiled into MicroPython
+#    bytecode ".mpy" files instead, if the environment variable MPY_CROSS
+#    names the mpy-cross executable.
 # Postprocessing steps:
 #  * Removing metadata files not used by upip (this includes setup.py)
 #  * Recompressing gzip archive with 4K dictionary size so it can be
@@ -25,6 +31,7 @@ import zlib
 import tarfile
 import re
 import io
+import subprocess
 
 from distutils.filelist import FileList
 from setuptools.command.sdist import sdist as _sdist
@@ -36,6 +43,8 @@ FILTERS = [
     (r".+\.py$", r"[^/]+$"),
     (None, r".+\.egg-info/.+"),
 ]
+# first line of templates compiled on build
+TEMPLATE_HEADER = "# precompiled template of %s %s\n"
 outbuf = io.BytesIO()
 
 
@@ -52,6 +61,45 @@ def gzip_4k(inf, fname):
     os.rename(fname + ".out", fname)
 
 
+def gzip_static_files(data_files):
+    for _, fnames in data_files or []:
+        for fname in fnames:
+            if not fname.endswith(".gz"):
+                continue
+            src_fname = fname[:-len(".gz")]
+            print("compressing %s with 4K dictionary" % src_fname)
+            comp = zlib.compressobj(level=9, wbits=16 + 12)
+            with open(src_fname, "rb") as inf, open(fname, "wb") as outf:
+                while 1:
+                    data = inf.read(1024)
+                    if not data:
+                        break
+                    outf.write(comp.compress(data))
+                outf.write(comp.flush())
+
+
+def compile_templates(data_files, name, version):
+    mpy_cross = os.environ.get("MPY_CROSS")
+    for _, fnames in data_files or []:
+        for index, fname in enumerate(fnames):
+            if not fname.endswith("_tpl.py"):
+                continue
+            # utemplate is only required to build the package
+            from utemplate.source import Compiler
+            src_fname = fname[:-len("_tpl.py")] + ".tpl"
+            print("compiling %s" % src_fname)
+            with open(src_fname, "r") as inf, open(fname, "w") as outf:
+                outf.write(TEMPLATE_HEADER % (name, version))
+                Compiler(inf, outf).compile()
+            if mpy_cross:
+                mpy_fname = fname[:-len(".py")] + ".mpy"
+                print("compiling %s to bytecode" % fname)
+                subprocess.check_call([mpy_cross, "-o", mpy_fname, fname])
+                # a module is imported from a .py file before a .mpy file
+                os.remove(fname)
+                fnames[index] = mpy_fname
+
+
 def filter_tar(name):
     fin = tarfile.open(name, "r:gz")
     fout = tarfile.open(fileobj=outbuf, mode="w")
@@ -124,6 +172,11 @@ def make_resource_module(manifest_files):
 class sdist(_sdist):
 
     def run(self):
+        gzip_static_files(self.distribution.data_files)
+        compile_templates(self.distribution.data_files,
+                          self.distribution.get_name(),
+                          self.distribution.get_version())
+
         self.filelist = FileList()
         self.get_file_list()
         make_resource_module(self.filelist.files)
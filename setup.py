@@ -41,26 +41,37 @@ setup(
     #
     # In this case, 'data_file' will be installed into '<sys.prefix>/my_data'
     # data_files=[('my_data', ['data/data_file'])],
+    #
+    # Files ending with '.gz' are created from the uncompressed file by
+    # 'sdist_upip' on build, files ending with '_tpl.py' are compiled from
+    # the '.tpl' file of the same name
     data_files=[
         (
             'registers',
             [
                 'registers/modbusRegisters-MyEVSE.json',
+                'registers/set-modbusRegisters-MyEVSE.json',
             ]
         ),
         (
             'templates',
             [
                 'templates/reboot.tpl',
+                'templates/reboot.tpl.gz',
                 'templates/setup.tpl',
+                'templates/setup_tpl.py',
                 'templates/data.tpl',
+                'templates/data_tpl.py',
                 'templates/system.tpl',
+                'templates/system_tpl.py',
                 'templates/update.tpl',
+                'templates/update.tpl.gz',
             ]
         )
     ],
     install_requires=[
-        'micropython-modbus',
+        # AsyncSerial uses internals of the umodbus serial host
+        'micropython-modbus>=2.3.7,<2.4',
         'micropython-winbond',
         'micropython-brainelectronics-helpers',
         'micropython-esp-wifi-manager',
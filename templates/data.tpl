@@ -38,7 +38,7 @@
       <label id="data_age_minutes">00</label>:<label id="data_age_seconds">00</label> sec
     </div>
     <div name="modbus_data_table" id="modbus_data_table">
-      {{ content }}
+      {% for chunk in content %}{{ chunk }}{% endfor %}
     </div>
     <form>
       <input type="button" class="btn btn-lg btn-warning list-group-item" onclick="window.location.href = '/';" value="Go Back"/>
@@ -53,8 +53,11 @@
 
     window.onload = function(e) {
       setTimeout(showPage, 1000);
-      setTimeout(get_new_data, 100);
-      // var myInterval = setInterval(get_new_data, 10000);
+      if (typeof(EventSource) !== "undefined") {
+        start_stream();
+      } else {
+        setTimeout(get_new_data, 100);
+      }
       setInterval(setDataAgeTime, 1000);
     };
     function showPage() {
@@ -76,6 +79,36 @@
         return valString;
       }
     }
+    function start_stream() {
+      var source = new EventSource("modbus_stream");
+      source.addEventListener("snapshot", update_values);
+      source.addEventListener("update", update_values);
+    }
+    function update_values(e) {
+      var data = JSON.parse(e.data);
+      for (var reg_type in data) {
+        for (var name in data[reg_type]) {
+          var cell = document.getElementById(reg_type + "-" + name);
+          if (cell == null) {
+            // register not yet part of the table, get the complete table
+            get_new_data();
+            return;
+          }
+          var val = data[reg_type][name]["val"];
+          if (Array.isArray(val) && val.length == 2) {
+            // actual a uint32_t value, reconstruct it
+            val = val[0] * 65536 + val[1];
+          } else if (Array.isArray(val)) {
+            val = "[" + val.join(", ") + "]";
+          } else if (typeof(val) === "boolean") {
+            val = val ? "True" : "False";
+          }
+          cell.innerHTML = val;
+        }
+      }
+      // reset time of data age to zero
+      totalSeconds = 0;
+    }
     function get_new_data() {
       // console.log('Getting new data');
       var xmlhttp = new XMLHttpRequest();
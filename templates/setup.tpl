@@ -106,12 +106,20 @@
       window.onbeforeunload = null;
       var xmlhttp = new XMLHttpRequest();
       var url = '/save_system_config';
+      xmlhttp.onreadystatechange = function() {
+        if (this.readyState == 4) {
+          if (this.status == 400) {
+            createToast('alert-danger', 'Error!', JSON.parse(this.responseText).error, 5000);
+          } else {
+            createToast('alert-success', 'Success!', 'Configuration updated', 5000);
+          }
+        }
+      };
       xmlhttp.open('POST', url, true);
       var formData = new FormData(document.getElementById("save_system_config_form"));
       xmlhttp.setRequestHeader("Content-Type", "application/json");
       var data = JSON.stringify(Object.fromEntries(formData));
       xmlhttp.send(data);
-      createToast('alert-success', 'Success!', 'Configuration updated', 5000);
       return true;
     };
   </script>
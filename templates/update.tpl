@@ -93,6 +93,7 @@
           <label for="file">Update progress:</label>
           <progress id="update_progressbar" value="0" max="200"> 0 </progress>
         </div>
+        <p id="update_status"></p>
       </div>
       <div class="cmodal-footer">
         <button type="button" id="close_button" class="btn btn-secondary" data-dismiss="modal" disabled>Close</button>
@@ -103,6 +104,7 @@
   <script>
     var update_progress_value = 0;
     var refreshProgressbarId = 0;
+    var update_job_id = null;
     var updateModal = document.getElementById("updateModal");
     var modal_close_btn = document.getElementById("modal_close_btn");
     window.onload = function(e) {
@@ -133,14 +135,11 @@
       var xmlhttp = new XMLHttpRequest();
       var url = '/perform_system_update';
       xmlhttp.onreadystatechange = function() {
-        if (this.readyState == 4 && this.status == 200) {
-          var data = JSON.parse(this.responseText);
-          if (data.success && refreshProgressbarId != 0) {
-            clearInterval(refreshProgressbarId);
-            document.getElementById("update_progressbar").value = 200;
-            document.getElementById("reboot_button").disabled = false;
-            document.getElementById("close_button").disabled = false;
-            modal_close_btn.style.display = "block";
+        if (this.readyState == 4) {
+          if (this.status == 202) {
+            update_job_id = JSON.parse(this.responseText).id;
+          } else {
+            finish_update();
           }
           document.getElementById("demo").innerHTML = this.responseText;
         }
@@ -155,8 +154,46 @@
       xmlhttp.send(data);
     };
     function update_progressbar_value() {
-      update_progress_value++;
-      document.getElementById("update_progressbar").value = update_progress_value;
+      if (update_progress_value < 199) {
+        update_progress_value++;
+        document.getElementById("update_progressbar").value = update_progress_value;
+      }
+      if (update_job_id !== null) {
+        refresh_update_status();
+      }
+    };
+    function refresh_update_status() {
+      var xmlhttp = new XMLHttpRequest();
+      var url = '/update_status?id=' + update_job_id;
+      xmlhttp.onreadystatechange = function() {
+        if (this.readyState == 4 && this.status == 200) {
+          var data = JSON.parse(this.responseText);
+          var text = data.phase;
+          if (data.package) {
+            text += " " + data.package;
+          }
+          text += ", " + data.bytes + " byte downloaded";
+          if (data.error) {
+            text += "<br>" + data.error;
+          }
+          document.getElementById("update_status").innerHTML = text;
+          if (data.phase == "done") {
+            document.getElementById("update_progressbar").value = 200;
+            document.getElementById("reboot_button").disabled = false;
+            finish_update();
+          } else if (data.phase == "failed") {
+            finish_update();
+          }
+        }
+      }
+      xmlhttp.open('GET', url, true);
+      xmlhttp.send();
+    };
+    function finish_update() {
+      clearInterval(refreshProgressbarId);
+      update_job_id = null;
+      document.getElementById("close_button").disabled = false;
+      modal_close_btn.style.display = "block";
     };
     function trigger_reboot() {
       var xmlhttp = new XMLHttpRequest();
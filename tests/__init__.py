@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Unit tests of the Webinterface, run under CPython with the host harness
+
+The MicroPython libraries are loaded from the folder given by the
+'MYEVSE_LIB' environment variable, 'lib' by default. Tests of modules
+requiring a missing library are skipped.
+"""
+
+# system packages
+import os
+import sys
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'tools')
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+import host_harness  # noqa: E402
+
+host_harness.setup(lib_dir=os.environ.get('MYEVSE_LIB', 'lib'))
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of the Server-Sent Events stream of the Modbus data"""
+
+# system packages
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import host_harness
+
+try:
+    from myevse_webinterface.event_stream import ModbusEventStream
+except ImportError as e:
+    raise unittest.SkipTest('MicroPython libraries missing: {}'.format(e))
+
+EPOCH = 'b691ba'
+
+
+def parse_event(message: str) -> dict:
+    """
+    Parse a Server-Sent Event
+
+    :param      message:  The event as sent by the stream
+    :type       message:  str
+
+    :returns:   Fields of the event, the data JSON decoded
+    :rtype:     dict
+    """
+    event = dict()
+    for line in message.rstrip('\n').split('\n'):
+        field, _, value = line.partition(': ')
+        event[field] = json.loads(value) if field == 'data' else value
+
+    return event
+
+
+class TestModbusEventStream(unittest.TestCase):
+    def setUp(self) -> None:
+        self._bridge = host_harness.FakeBridge(
+            register_definitions=host_harness.register_definitions(count=8))
+
+    def _stream(self, **kwargs) -> ModbusEventStream:
+        return ModbusEventStream(bridge=self._bridge,
+                                 epoch=EPOCH,
+                                 check_interval=0.01,
+                                 **kwargs)
+
+    def test_snapshot_and_updates(self) -> None:
+        async def _receive() -> list:
+            stream = self._stream()
+            events = [parse_event(await stream.__anext__())]
+            for _ in range(2):
+                self._bridge.update()
+                events.append(parse_event(await stream.__anext__()))
+            return events
+
+        snapshot, first, second = asyncio.run(_receive())
+
+        self.assertEqual(snapshot['event'], 'snapshot')
+        self.assertEqual(snapshot['id'], '{}-1'.format(EPOCH))
+        self.assertEqual(first['event'], 'update')
+        self.assertEqual(first['id'], '{}-2'.format(EPOCH))
+        self.assertEqual(second['event'], 'update')
+        self.assertEqual(second['id'], '{}-3'.format(EPOCH))
+        self.assertEqual(second['data'], self._bridge.changed_data)
+
+    def test_missed_generations(self) -> None:
+        for _ in range(3):
+            self._bridge.update()
+
+        # reconnecting client with the ID of its last event
+        event = parse_event(asyncio.run(
+            self._stream(last_generation=1).__anext__()))
+        self.assertEqual(event['event'], 'update')
+        self.assertEqual(event['id'], '{}-4'.format(EPOCH))
+        self.assertEqual(event['data'],
+                         self._bridge.changes_since(generation=1))
+
+        # generation of a previous boot
+        event = parse_event(asyncio.run(
+            self._stream(last_generation=42).__anext__()))
+        self.assertEqual(event['event'], 'snapshot')
+        self.assertEqual(event['data'], self._bridge.client_data)
+
+    def test_keepalive(self) -> None:
+        async def _receive() -> list:
+            stream = self._stream(keepalive_interval=0)
+            messages = [await stream.__anext__()]
+            await asyncio.sleep(0.01)
+            messages.append(await stream.__anext__())
+            return messages
+
+        snapshot, keepalive = asyncio.run(_receive())
+
+        self.assertEqual(parse_event(snapshot)['event'], 'snapshot')
+        self.assertEqual(keepalive, ': keepalive\n\n')
+
+    def test_concurrent_clients(self) -> None:
+        cycles = 5
+
+        async def _client(stream: ModbusEventStream) -> list:
+            events = list()
+            async for message in stream:
+                events.append(parse_event(message))
+                if len(events) == cycles + 1:
+                    break
+            return events
+
+        async def _collect() -> None:
+            for _ in range(cycles):
+                await asyncio.sleep(0.05)
+                self._bridge.update()
+
+        async def _run() -> list:
+            clients = [_client(self._stream()) for _ in range(4)]
+            results = await asyncio.gather(_collect(), *clients)
+            return results[1:]
+
+        for events in asyncio.run(_run()):
+            self.assertEqual([event['event'] for event in events],
+                             ['snapshot'] + ['update'] * cycles)
+            self.assertEqual([event['id'] for event in events],
+                             ['{}-{}'.format(EPOCH, generation)
+                              for generation in range(1, cycles + 2)])
+            self.assertEqual(events[-1]['data'], self._bridge.client_data)
+
+
+class TestModbusStreamRoute(unittest.TestCase):
+    class Request(object):
+        def __init__(self, headers: dict = None) -> None:
+            self.headers = headers or dict()
+
+    def setUp(self) -> None:
+        self._cwd = os.getcwd()
+        self._dir = tempfile.mkdtemp(prefix='myevse-stream-')
+        try:
+            self._wi = host_harness.make_webinterface(register_count=8,
+                                                      work_dir=self._dir)
+        except ImportError as e:
+            self.tearDown()
+            self.skipTest('MicroPython libraries missing: {}'.format(e))
+
+    def tearDown(self) -> None:
+        os.chdir(self._cwd)
+        shutil.rmtree(self._dir)
+
+    def _request(self, headers: dict = None) -> tuple:
+        return asyncio.run(self._wi.modbus_stream(
+            req=self.Request(headers=headers)))
+
+    def test_stream_limit(self) -> None:
+        streams = list()
+        for _ in range(4):
+            stream, status, headers = self._request()
+            self.assertEqual(status, 200)
+            self.assertEqual(headers['Content-Type'], 'text/event-stream')
+            streams.append(stream)
+
+        body, status = self._request()
+        self.assertEqual(status, 503)
+        self.assertIn('error', body)
+
+        # stream of a client which has gone is no longer pulled
+        streams[0]._last_pull_ticks = time.ticks_add(
+            time.ticks_ms(), -2 * streams[0]._keepalive_interval * 1000)
+        _, status, _ = self._request()
+        self.assertEqual(status, 200)
+
+    def test_last_event_id(self) -> None:
+        epoch = self._wi._etag_epoch
+        bridge = self._wi._mb_bridge
+        bridge.update()
+        bridge.update()
+
+        stream, _, _ = self._request(
+            headers={'Last-Event-ID': '{}-1'.format(epoch)})
+        event = parse_event(asyncio.run(stream.__anext__()))
+        self.assertEqual(event['event'], 'update')
+        self.assertEqual(event['id'], '{}-3'.format(epoch))
+        self.assertEqual(event['data'], bridge.changes_since(generation=1))
+
+        # ID of a previous boot
+        stream, _, _ = self._request(
+            headers={'Last-Event-ID': 'previous-1'})
+        event = parse_event(asyncio.run(stream.__anext__()))
+        self.assertEqual(event['event'], 'snapshot')
+        self.assertEqual(event['id'], '{}-3'.format(epoch))
+
+
+if __name__ == '__main__':
+    unittest.main()
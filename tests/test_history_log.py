@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of the History Log"""
+
+# system packages
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from myevse_webinterface.history_log import HistoryLog
+    from myevse_webinterface.register_history import RegisterHistory
+    from myevse_webinterface.register_index import Register
+except ImportError as e:
+    raise unittest.SkipTest('MicroPython libraries missing: {}'.format(e))
+
+NAMES = ['CHARGING_CURRENT_HREG', 'LOOP_TIME_US_IREG']
+# magic bytes, header size and comma separated register names
+HEADER_SIZE = 6 + len(','.join(NAMES))
+
+
+class TestHistoryLog(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.mkdtemp(prefix='myevse-history-')
+        self._path = os.path.join(self._dir, 'history')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._dir)
+
+    def _log(self, **kwargs) -> HistoryLog:
+        return HistoryLog(path=self._path, names=NAMES, **kwargs)
+
+    def _append(self, log: HistoryLog, timestamps: range) -> None:
+        for timestamp in timestamps:
+            log.append(timestamp=timestamp,
+                       values={NAMES[0]: timestamp % 32,
+                               NAMES[1]: timestamp * 10})
+
+    def _segment_files(self) -> list:
+        return sorted(os.listdir(self._path))
+
+    def test_batched_flush(self) -> None:
+        log = self._log(batch_size=8, flush_interval=300)
+
+        # 3 samples of 2 registers fit into the batch
+        self._append(log=log, timestamps=range(100, 103))
+        self.assertEqual(log.size, 0)
+        self.assertEqual(self._segment_files(), [])
+
+        # 5th sample exceeds the batch, the first 8 records are written
+        self._append(log=log, timestamps=range(103, 105))
+        self.assertEqual(log.segments, 1)
+        self.assertEqual(log.size, HEADER_SIZE + 8 * HistoryLog.RECORD_SIZE)
+        self.assertEqual(log.first_timestamp, 100)
+
+        # flush interval elapsed
+        self._append(log=log, timestamps=range(405, 406))
+        reopened = self._log()
+        self.assertEqual(
+            [timestamp for timestamp, _ in reopened.samples(name=NAMES[0])],
+            [100, 101, 102, 103, 104, 405])
+
+        # explicit flush
+        self._append(log=log, timestamps=range(406, 407))
+        log.flush()
+        reopened = self._log()
+        self.assertEqual(
+            list(reopened.samples(name=NAMES[1], since=405)),
+            [(405, 4050), (406, 4060)])
+
+    def test_samples_include_buffered_records(self) -> None:
+        log = self._log(batch_size=8, flush_interval=300)
+        self._append(log=log, timestamps=range(100, 106))
+
+        # 8 records written, 4 buffered
+        self.assertEqual(
+            [timestamp for timestamp, _ in log.samples(name=NAMES[0])],
+            list(range(100, 106)))
+        self.assertEqual(list(log.samples(name=NAMES[1], since=105)),
+                         [(105, 1050)])
+        self.assertEqual(list(log.samples(name='UNKNOWN_REG')), [])
+
+    def test_segment_rotation(self) -> None:
+        segment_size = HEADER_SIZE + 20 * HistoryLog.RECORD_SIZE
+        log = self._log(batch_size=4,
+                        segment_size=segment_size,
+                        max_size=1024 * 1024)
+
+        self._append(log=log, timestamps=range(0, 50))
+        log.flush()
+
+        # a segment is extended until it reached the segment size
+        self.assertEqual(log.segments, 5)
+        self.assertEqual(len(self._segment_files()), 5)
+        self.assertEqual(
+            [timestamp for timestamp, _ in log.samples(name=NAMES[0])],
+            list(range(0, 50)))
+
+    def test_new_segment_on_time_going_backwards(self) -> None:
+        log = self._log(batch_size=4)
+        self._append(log=log, timestamps=range(1000, 1004))
+        self._append(log=log, timestamps=range(10, 14))
+        log.flush()
+
+        self.assertEqual(log.segments, 2)
+        self.assertEqual(
+            [timestamp for timestamp, _ in log.samples(name=NAMES[0])],
+            [1000, 1001, 1002, 1003, 10, 11, 12, 13])
+
+    def test_size_cap(self) -> None:
+        segment_size = HEADER_SIZE + 20 * HistoryLog.RECORD_SIZE
+        log = self._log(batch_size=4,
+                        segment_size=segment_size,
+                        max_size=3 * segment_size)
+
+        self._append(log=log, timestamps=range(0, 100))
+        log.flush()
+
+        self.assertLessEqual(log.size, 3 * segment_size)
+        self.assertEqual(len(self._segment_files()), log.segments)
+        timestamps = [timestamp for timestamp, _ in
+                      log.samples(name=NAMES[0])]
+        # oldest samples removed, newest ones kept without gaps
+        self.assertGreater(log.first_timestamp, 0)
+        self.assertEqual(timestamps[0], log.first_timestamp)
+        self.assertEqual(timestamps, list(range(timestamps[0], 100)))
+
+    def test_seek_by_timestamp(self) -> None:
+        log = self._log(batch_size=16,
+                        segment_size=HEADER_SIZE +
+                        64 * HistoryLog.RECORD_SIZE,
+                        max_size=1024 * 1024)
+
+        # every 10 seconds
+        self._append(log=log, timestamps=range(0, 2000, 10))
+        log.flush()
+        self.assertGreater(log.segments, 1)
+
+        self.assertEqual(list(log.samples(name=NAMES[1], since=1955)),
+                         [(1960, 19600), (1970, 19700), (1980, 19800),
+                          (1990, 19900)])
+        self.assertEqual(
+            [timestamp for timestamp, _ in
+             log.samples(name=NAMES[0], since=600)][:3],
+            [600, 610, 620])
+        self.assertEqual(list(log.samples(name=NAMES[0], since=5000)), [])
+
+    def test_restore(self) -> None:
+        log = self._log(batch_size=8)
+        self._append(log=log, timestamps=range(0, 40))
+        log.flush()
+
+        history = RegisterHistory(
+            registers=(Register(reg_type='HREGS',
+                                name=NAMES[0],
+                                address=10),
+                       Register(reg_type='IREGS',
+                                name=NAMES[1],
+                                address=20,
+                                length=2)),
+            depth=5)
+        self._log().restore(history=history)
+
+        self.assertEqual(history.samples(name=NAMES[0]),
+                         [[timestamp, timestamp % 32]
+                          for timestamp in range(35, 40)])
+        self.assertEqual(history.samples(name=NAMES[1]),
+                         [[timestamp, timestamp * 10]
+                          for timestamp in range(35, 40)])
+
+    def test_recovery_from_torn_record(self) -> None:
+        log = self._log(batch_size=4)
+        self._append(log=log, timestamps=range(0, 4))
+        log.flush()
+
+        # power loss during writing the last record
+        filename = os.path.join(self._path, self._segment_files()[-1])
+        with open(filename, 'ab') as file:
+            file.write(b'\x2a\x00\x00')
+
+        log = self._log(batch_size=4)
+        self.assertEqual(log.segments, 1)
+        self.assertEqual(
+            [timestamp for timestamp, _ in log.samples(name=NAMES[0])],
+            [0, 1, 2, 3])
+
+        # new records are not appended after the incomplete record
+        self._append(log=log, timestamps=range(4, 6))
+        log.flush()
+        self.assertEqual(log.segments, 2)
+        self.assertEqual(
+            [timestamp for timestamp, _ in
+             self._log().samples(name=NAMES[0])],
+            list(range(0, 6)))
+
+
+if __name__ == '__main__':
+    unittest.main()
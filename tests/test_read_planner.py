@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of the block reads planned by the Read Planner"""
+
+# system packages
+import asyncio
+import struct
+import unittest
+
+try:
+    from myevse_webinterface.async_serial import AsyncSerial
+    from myevse_webinterface.myevse_bridge import MyEVSEBridge
+    from myevse_webinterface.read_planner import ReadPlanner
+    from myevse_webinterface.register_index import RegisterIndex
+except ImportError as e:
+    raise unittest.SkipTest('MicroPython libraries missing: {}'.format(e))
+
+# bit registers of the client and their states
+BITS = {
+    'COILS': {
+        'SYSTEM_RESET_COIL': (1, 1),
+        'CONFIG_RESET_COIL': (0, 0),
+        'SAVE_CONFIG_COIL': (2, 0),
+        'LED_COIL': (9, 1),
+    },
+    'ISTS': {
+        'SSR_STATE_ISTS': (10, 1),
+        'RELAY_STATE_ISTS': (11, 0),
+        'PILOT_STATE_ISTS': (12, 0),
+    },
+}
+
+
+class Host(object):
+    """Blocking Modbus host of a client with the BITS, packed LSB first"""
+    def __init__(self) -> None:
+        self.requests = list()
+        self._states = {
+            {'COILS': 1, 'ISTS': 2}[reg_type]: {
+                address: state for address, state in registers.values()
+            } for reg_type, registers in BITS.items()
+        }
+
+    def _send_receive(self,
+                      modbus_pdu: bytes,
+                      slave_addr: int,
+                      count: bool) -> bytes:
+        function_code, address, quantity = struct.unpack('>BHH', modbus_pdu)
+        self.requests.append((function_code, address, quantity))
+
+        content = bytearray((quantity + 7) // 8)
+        for index in range(quantity):
+            state = self._states[function_code].get(address + index, 0)
+            content[index // 8] |= state << (index % 8)
+
+        return bytes(content)
+
+
+class HostBridge(MyEVSEBridge):
+    """Bridge reading with the host, without a register file"""
+    def __init__(self, host: Host) -> None:
+        self._host = host
+        self._client_unit = 10
+
+
+class TestReadPlanner(unittest.TestCase):
+    def setUp(self) -> None:
+        definitions = {
+            reg_type: {
+                name: {'register': address, 'poll_interval': 'fast'}
+                for name, (address, _) in registers.items()
+            } for reg_type, registers in BITS.items()
+        }
+        self._planner = ReadPlanner(
+            register_index=RegisterIndex(register_definitions=definitions),
+            max_gap=8)
+        self._host = Host()
+
+    def _assert_states(self, read) -> None:
+        for block in self._planner:
+            values = read(block)
+            for register in block.registers:
+                self.assertEqual(
+                    block.slice(values=values, register=register),
+                    [BITS[block.reg_type][register.name][1]],
+                    register.name)
+
+    def test_blocks(self) -> None:
+        self.assertEqual(
+            [(block.reg_type, block.address, block.length)
+             for block in self._planner],
+            [('COILS', 0, 10), ('ISTS', 10, 3)])
+
+    def test_blocking_read(self) -> None:
+        bridge = HostBridge(host=self._host)
+
+        self._assert_states(read=lambda block: bridge._read(
+            reg_type=block.reg_type,
+            address=block.address,
+            length=block.length))
+        self.assertEqual(self._host.requests, [(1, 0, 10), (2, 10, 3)])
+
+    def test_async_read(self) -> None:
+        bridge = HostBridge(host=self._host)
+        async_host = AsyncSerial(host=self._host)
+
+        self._assert_states(read=lambda block: asyncio.run(bridge._read(
+            reg_type=block.reg_type,
+            address=block.address,
+            length=block.length,
+            host=async_host)))
+        self.assertEqual(self._host.requests, [(1, 0, 10), (2, 10, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
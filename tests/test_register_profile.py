@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of the writes and read back of a register profile"""
+
+# system packages
+import json
+import os
+import struct
+import unittest
+
+try:
+    from myevse_webinterface.register_index import RegisterIndex
+    from myevse_webinterface.register_profile import RegisterProfile
+except ImportError as e:
+    raise unittest.SkipTest('MicroPython libraries missing: {}'.format(e))
+
+REGISTER_FILE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'registers', 'modbusRegisters-MyEVSE.json')
+
+
+class Client(object):
+    """Coils and holding registers of a client, bits packed LSB first"""
+    def __init__(self) -> None:
+        self.coils = dict()
+        self.hregs = dict()
+
+    def request(self, modbus_pdu: bytes) -> bytes:
+        """Get the response content of a request like a validating host"""
+        function_code, address, quantity = struct.unpack('>BHH',
+                                                         modbus_pdu[:5])
+        addresses = range(address, address + quantity)
+
+        if function_code == 15:
+            for index, coil in enumerate(addresses):
+                self.coils[coil] = \
+                    modbus_pdu[6 + index // 8] >> (index % 8) & 1
+            return modbus_pdu[1:5]
+        if function_code == 16:
+            values = struct.unpack('>{}H'.format(quantity), modbus_pdu[6:])
+            self.hregs.update(zip(addresses, values))
+            return modbus_pdu[1:5]
+        if function_code == 1:
+            content = bytearray((quantity + 7) // 8)
+            for index, coil in enumerate(addresses):
+                content[index // 8] |= self.coils.get(coil, 0) << (index % 8)
+            return bytes(content)
+
+        return struct.pack('>{}H'.format(quantity),
+                           *(self.hregs.get(hreg, 0) for hreg in addresses))
+
+
+class TestRegisterProfile(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(REGISTER_FILE, 'r') as file:
+            self._index = RegisterIndex(register_definitions=json.load(file))
+
+    def _profile(self, coils: dict, hregs: dict = None) -> RegisterProfile:
+        profile = {'COILS': {name: {'val': value}
+                             for name, value in coils.items()}}
+        if hregs:
+            profile['HREGS'] = {name: {'val': value}
+                                for name, value in hregs.items()}
+
+        return RegisterProfile(profile=profile, register_index=self._index)
+
+    def test_coil_write_request(self) -> None:
+        profile = self._profile(coils={'SYSTEM_RESET_COIL': 1,
+                                       'CONFIG_RESET_COIL': 0})
+
+        write, = profile
+        self.assertEqual((write.address, write.length), (10, 2))
+        # first coil in the least significant bit
+        self.assertEqual(write.write_request(),
+                         bytes.fromhex('0f000a00020101'))
+        self.assertEqual(write.read_request(), bytes.fromhex('01000a0002'))
+
+        profile = self._profile(coils={'SYSTEM_RESET_COIL': 0,
+                                       'CONFIG_RESET_COIL': 1})
+        self.assertEqual(next(iter(profile)).write_request(),
+                         bytes.fromhex('0f000a00020102'))
+
+    def test_read_values(self) -> None:
+        write, = self._profile(coils={'SYSTEM_RESET_COIL': 1,
+                                      'CONFIG_RESET_COIL': 0})
+
+        self.assertEqual(write.read_values(response=b'\x01'), [1, 0])
+        self.assertEqual(write.read_values(response=b'\x02'), [0, 1])
+
+    def test_verification(self) -> None:
+        client = Client()
+        profile = self._profile(coils={'SYSTEM_RESET_COIL': 1,
+                                       'CONFIG_RESET_COIL': 0,
+                                       'USE_MB_CURRENT_COIL': 1},
+                                hregs={'CHARGING_CURRENT_HREG': 17})
+
+        responses = [client.request(modbus_pdu=modbus_pdu)
+                     for modbus_pdu, _ in profile.requests()]
+        self.assertEqual(client.coils, {10: 1, 11: 0, 20: 1})
+
+        results = profile.results(responses=responses)
+        self.assertEqual(results['SYSTEM_RESET_COIL'],
+                         {'success': True, 'val': 1, 'read': 1})
+        self.assertEqual(results['CONFIG_RESET_COIL'],
+                         {'success': True, 'val': 0, 'read': 0})
+        self.assertTrue(results['USE_MB_CURRENT_COIL']['success'])
+        self.assertEqual(results['CHARGING_CURRENT_HREG'],
+                         {'success': True, 'val': 17, 'read': 17})
+
+    def test_failed_verification(self) -> None:
+        profile = self._profile(coils={'SYSTEM_RESET_COIL': 1,
+                                       'CONFIG_RESET_COIL': 0})
+        write_request, _ = profile.requests()[0]
+
+        # client swapped the coils
+        results = profile.results(responses=[write_request[1:5], b'\x02'])
+        self.assertEqual(results['SYSTEM_RESET_COIL'],
+                         {'success': False, 'val': 1, 'read': 0})
+        self.assertEqual(results['CONFIG_RESET_COIL'],
+                         {'success': False, 'val': 0, 'read': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
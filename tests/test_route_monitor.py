@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of the request latency histograms"""
+
+# system packages
+import asyncio
+import time
+import unittest
+
+from myevse_webinterface.route_monitor import LatencyHistogram, RouteLatency
+
+
+class Pattern(object):
+    def __init__(self, url_pattern: str) -> None:
+        self.url_pattern = url_pattern
+
+
+class Response(object):
+    def __init__(self, body) -> None:
+        self.body = body
+
+
+class App(object):
+    def __init__(self, handlers: dict) -> None:
+        self.url_map = [(['GET'], Pattern(url_pattern=url), handler)
+                        for url, handler in handlers.items()]
+
+    def handler(self, url: str):
+        for _, pattern, handler in self.url_map:
+            if pattern.url_pattern == url:
+                return handler
+
+
+class Chunks(object):
+    """Async iterator of chunks, like the Modbus data event stream"""
+    def __init__(self, count: int) -> None:
+        self._count = count
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        if not self._count:
+            raise StopAsyncIteration
+        self._count -= 1
+        await asyncio.sleep(0.01)
+        return 'chunk'
+
+
+def _chunks(count: int):
+    for _ in range(count):
+        time.sleep(0.01)
+        yield 'chunk'
+
+
+async def _send(body) -> list:
+    """Iterate a body like Microdot"""
+    if hasattr(body, '__anext__'):
+        return [chunk async for chunk in body]
+    return list(body)
+
+
+class TestRouteLatency(unittest.TestCase):
+    def setUp(self) -> None:
+        async def page(req):
+            return 'page'
+
+        async def failing(req):
+            raise ValueError('failed')
+
+        async def generator(req):
+            return _chunks(count=3)
+
+        async def async_iterator(req):
+            return Chunks(count=3), 200, {}
+
+        async def response(req):
+            return Response(body=_chunks(count=3))
+
+        async def file(req):
+            return Response(body=open(__file__, 'rb'))
+
+        self._app = App(handlers={
+            '/page': page,
+            '/failing': failing,
+            '/generator': generator,
+            '/async': async_iterator,
+            '/response': response,
+            '/file': file,
+        })
+        self._latency = RouteLatency(app=self._app)
+
+    def _request(self, url: str):
+        return asyncio.run(self._app.handler(url=url)(req=None))
+
+    def _histogram(self, url: str) -> LatencyHistogram:
+        return self._latency.histograms[url]
+
+    def test_handler(self) -> None:
+        self.assertEqual(self._request(url='/page'), 'page')
+        self.assertEqual(self._histogram(url='/page').count, 1)
+        self.assertEqual(sum(self._histogram(url='/page').counts), 1)
+
+        with self.assertRaises(ValueError):
+            self._request(url='/failing')
+        self.assertEqual(self._histogram(url='/failing').count, 1)
+
+    def test_generator_body(self) -> None:
+        body = self._request(url='/generator')
+        self.assertEqual(self._histogram(url='/generator').count, 0)
+
+        self.assertEqual(asyncio.run(_send(body)), ['chunk'] * 3)
+        histogram = self._histogram(url='/generator')
+        self.assertEqual(histogram.count, 1)
+        self.assertGreaterEqual(histogram.sum, 30000)
+
+        # closing after the body has been sent adds nothing
+        body.close()
+        self.assertEqual(histogram.count, 1)
+
+    def test_async_body(self) -> None:
+        body, status, headers = self._request(url='/async')
+        self.assertEqual(status, 200)
+        self.assertTrue(hasattr(body, '__anext__'))
+        self.assertEqual(self._histogram(url='/async').count, 0)
+
+        self.assertEqual(asyncio.run(_send(body)), ['chunk'] * 3)
+        self.assertEqual(self._histogram(url='/async').count, 1)
+        self.assertGreaterEqual(self._histogram(url='/async').sum, 30000)
+
+    def test_response_body(self) -> None:
+        response = self._request(url='/response')
+        self.assertEqual(self._histogram(url='/response').count, 0)
+
+        # closed by Microdot before being sent completely
+        self.assertEqual(next(response.body), 'chunk')
+        response.body.close()
+        self.assertEqual(self._histogram(url='/response').count, 1)
+
+    def test_file_body(self) -> None:
+        response = self._request(url='/file')
+        response.body.close()
+
+        # a file is not wrapped, the handler call is measured
+        self.assertFalse(hasattr(response.body, '_histogram'))
+        self.assertEqual(self._histogram(url='/file').count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
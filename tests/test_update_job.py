@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of the system update job against a local package index"""
+
+# system packages
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    # upip is frozen into the firmware, a copy of it is taken from the folder
+    # of the MicroPython libraries
+    import upip
+    from myevse_webinterface.update_job import UpdateJob
+except ImportError as e:
+    raise unittest.SkipTest('MicroPython libraries missing: {}'.format(e))
+
+# package names and their dependencies served by the package index
+PACKAGES = {
+    'micropython-app': ['micropython-lib-a'],
+    'micropython-lib-a': [],
+    'micropython-broken': ['micropython-missing'],
+}
+
+
+def make_package(name: str, dependencies: list) -> bytes:
+    """
+    Create the gzip compressed source distribution of a package
+
+    :param      name:          The package name
+    :type       name:          str
+    :param      dependencies:  The names of the required packages
+    :type       dependencies:  list
+
+    :returns:   Content of the archive
+    :rtype:     bytes
+    """
+    module = name.split('-', 1)[1].replace('-', '_')
+    files = {
+        'setup.py': b'',
+        '{}/__init__.py'.format(module): '# {}\n'.format(name).encode() * 64,
+    }
+    if dependencies:
+        files['{}.egg-info/requires.txt'.format(module)] = \
+            '\n'.join(dependencies).encode() + b'\n'
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for path, content in files.items():
+            info = tarfile.TarInfo('{}-1.0.0/{}'.format(name, path))
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+    return buffer.getvalue()
+
+
+class PackageIndex(ThreadingHTTPServer):
+    """Local stand-in of the package index serving the PACKAGES"""
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), PackageIndexHandler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server_address[1])
+        self.archives = {
+            name: make_package(name=name, dependencies=dependencies)
+            for name, dependencies in PACKAGES.items()
+        }
+
+
+class PackageIndexHandler(BaseHTTPRequestHandler):
+    """Provide the JSON metadata and the archive of a package"""
+    def do_GET(self) -> None:
+        parts = self.path.strip('/').split('/')
+        archives = self.server.archives
+
+        if len(parts) == 2 and parts[0] in archives and parts[1] == 'json':
+            url = '{}/packages/{}-1.0.0.tar.gz'.format(self.server.url,
+                                                       parts[0])
+            body = json.dumps({
+                'info': {'version': '1.0.0'},
+                'releases': {'1.0.0': [{'url': url}]},
+            }).encode()
+        elif (len(parts) == 2 and parts[0] == 'packages' and
+                parts[1][:-len('-1.0.0.tar.gz')] in archives):
+            body = archives[parts[1][:-len('-1.0.0.tar.gz')]]
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class _File(object):
+    """File of the host writing a part of a buffer like MicroPython"""
+    def __init__(self, file) -> None:
+        self._file = file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._file.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self._file, name)
+
+    def write(self, data, size: int = None) -> int:
+        if size is not None:
+            data = memoryview(data)[:size]
+        return self._file.write(data)
+
+
+class HostUpdateJob(UpdateJob):
+    # minimum stack size of threads of the host
+    STACK_SIZE = 256 * 1024
+
+
+class TestUpdateJob(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._index = PackageIndex()
+        threading.Thread(target=cls._index.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._index.shutdown()
+        cls._index.server_close()
+
+    def setUp(self) -> None:
+        self._dir = tempfile.mkdtemp(prefix='myevse-update-')
+        self._upip = {name: getattr(upip, name, None)
+                      for name in ('install_path', 'index_urls', 'open')}
+        upip.install_path = self._dir + '/'
+        upip.open = lambda file, mode='r': _File(open(file, mode))
+
+    def tearDown(self) -> None:
+        for name, value in self._upip.items():
+            if value is None:
+                delattr(upip, name)
+            else:
+                setattr(upip, name, value)
+        shutil.rmtree(self._dir)
+
+    def _run(self, packages: list, timeout: int = 10) -> UpdateJob:
+        job = HostUpdateJob(packages=packages, index_urls=[self._index.url])
+        job.start()
+
+        start = time.monotonic()
+        while job.phase == 'installing':
+            self.assertLess(time.monotonic() - start, timeout)
+            time.sleep(0.01)
+
+        return job
+
+    def test_install(self) -> None:
+        install_pkg = upip.install_pkg
+        job = self._run(packages=['micropython-app'])
+
+        status = job.status
+        self.assertEqual(status['phase'], 'installed')
+        self.assertTrue(job.running)
+        self.assertEqual(status['installed'],
+                         ['micropython-app', 'micropython-lib-a'])
+        self.assertEqual(status['error'], '')
+        self.assertEqual(status['package'], '')
+        # metadata and archive of both packages
+        self.assertGreater(status['bytes'],
+                           len(self._index.archives['micropython-app']) +
+                           len(self._index.archives['micropython-lib-a']))
+        self.assertTrue(os.path.exists(
+            os.path.join(self._dir, 'app', '__init__.py')))
+        self.assertTrue(os.path.exists(
+            os.path.join(self._dir, 'lib_a', '__init__.py')))
+        self.assertFalse(os.path.exists(os.path.join(self._dir, 'setup.py')))
+
+        # functions of upip are restored
+        self.assertIs(upip.install_pkg, install_pkg)
+
+        job.finish(phase='done')
+        self.assertFalse(job.running)
+
+    def test_missing_package(self) -> None:
+        job = self._run(packages=['micropython-app', 'micropython-unknown'])
+
+        status = job.status
+        self.assertEqual(status['phase'], 'failed')
+        self.assertFalse(job.running)
+        self.assertEqual(status['installed'],
+                         ['micropython-app', 'micropython-lib-a'])
+        self.assertIn('micropython-unknown', status['error'])
+        self.assertIn('NotFoundError', status['error'])
+
+    def test_missing_dependency(self) -> None:
+        job = self._run(packages=['micropython-broken'])
+
+        status = job.status
+        self.assertEqual(status['phase'], 'failed')
+        self.assertEqual(status['installed'], ['micropython-broken'])
+        self.assertIn('micropython-missing', status['error'])
+
+    def test_unresolvable_index(self) -> None:
+        job = HostUpdateJob(packages=['micropython-app'],
+                            index_urls=['http://unresolvable.invalid'])
+        job.start()
+
+        start = time.monotonic()
+        while job.phase == 'installing':
+            self.assertLess(time.monotonic() - start, 10)
+            time.sleep(0.01)
+
+        self.assertEqual(job.phase, 'failed')
+        self.assertEqual(job.status['installed'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
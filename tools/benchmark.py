@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Benchmark
+
+Micro-benchmarks of the rendering, JSON serialization and config handling of
+the Webinterface under CPython, run against synthetic register maps of
+different sizes with the host harness.
+
+Example:
+    python tools/benchmark.py --lib lib --registers 10 100 1000
+"""
+
+# system packages
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# custom modules
+import host_harness
+
+DEFAULT_REGISTER_COUNTS = (10, 50, 100, 500, 1000)
+
+
+def _run(coro):
+    """
+    Run a coroutine without awaits to its end, like the event loop does
+
+    :param      coro:  The coroutine
+    :type       coro:  coroutine
+
+    :returns:   The result of the coroutine
+    """
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+
+    coro.close()
+    raise RuntimeError('Coroutine awaited, run it by an event loop')
+
+
+def measure(func, iterations: int, warmup: int = 5) -> dict:
+    """
+    Measure the duration of a function
+
+    :param      func:        The function without arguments
+    :type       func:        function
+    :param      iterations:  The number of measured calls
+    :type       iterations:  int
+    :param      warmup:      The number of calls before measuring
+    :type       warmup:      int
+
+    :returns:   Iterations, mean, median, 95th percentile and maximum
+                duration in microseconds and calls per second
+    :rtype:     dict
+    """
+    for _ in range(warmup):
+        func()
+
+    durations = list()
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        durations.append(time.perf_counter_ns() - start)
+
+    durations.sort()
+    mean = sum(durations) / len(durations)
+
+    return {
+        'iterations': iterations,
+        'mean': mean / 1000,
+        'p50': durations[len(durations) // 2] / 1000,
+        'p95': durations[min(len(durations) - 1,
+                             len(durations) * 95 // 100)] / 1000,
+        'max': durations[-1] / 1000,
+        'ops': 1e9 / mean if mean else 0,
+    }
+
+
+def register_cases(wi) -> dict:
+    """
+    Get the benchmark cases depending on the register map
+
+    :param      wi:   The Webinterface using the Modbus bridge double
+    :type       wi:   Webinterface
+
+    :returns:   Functions without arguments by case name
+    :rtype:     dict
+    """
+    bridge = wi._mb_bridge
+    names = [register.name for register in bridge.register_index]
+    ports = [180, 181]
+
+    def render_modbus_data():
+        _run(wi._render_modbus_data(device_data=bridge.client_data))
+
+    def modbus_json():
+        ''.join(wi._iter_modbus_json(device_data=bridge.client_data))
+
+    def client_data_dumps():
+        json.dumps(bridge.client_data)
+
+    def config_save():
+        # a changed port enforces writing the file
+        ports.reverse()
+        _run(wi._save_system_config(data={
+            'TCP_PORT': ports[0],
+            'HISTORY_REGISTERS': names,
+        }))
+
+    def config_load():
+        wi.load_config()
+
+    return {
+        'render_modbus_data': render_modbus_data,
+        'modbus_json': modbus_json,
+        'client_data_dumps': client_data_dumps,
+        'config_save': config_save,
+        'config_load': config_load,
+    }
+
+
+def system_cases(wi) -> dict:
+    """
+    Get the benchmark cases independent of the register map
+
+    :param      wi:   The Webinterface
+    :type       wi:   Webinterface
+
+    :returns:   Functions without arguments by case name
+    :rtype:     dict
+    """
+    system_data = wi.system_infos
+    system_data['description'] = {key: key for key in wi.system_infos}
+
+    def render_system_info():
+        _run(wi._render_system_info(system_data=system_data))
+
+    def system_infos():
+        wi.system_infos
+
+    return {
+        'render_system_info': render_system_info,
+        'system_infos': system_infos,
+    }
+
+
+def run(register_counts: tuple, iterations: int) -> list:
+    """
+    Run all benchmark cases
+
+    :param      register_counts:  The sizes of the synthetic register maps
+    :type       register_counts:  tuple
+    :param      iterations:       The number of measured calls of a case
+    :type       iterations:       int
+
+    :returns:   Results of all cases
+    :rtype:     list
+    """
+    results = list()
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='myevse-benchmark-')
+
+    try:
+        for count in register_counts:
+            wi = host_harness.make_webinterface(register_count=count,
+                                                work_dir=work_dir)
+
+            cases = register_cases(wi=wi)
+            if count == register_counts[0]:
+                cases.update(system_cases(wi=wi))
+
+            for name, func in cases.items():
+                result = measure(func=func, iterations=iterations)
+                result['case'] = name
+                result['registers'] = count
+                results.append(result)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+
+def print_results(results: list) -> None:
+    """
+    Print the results as table
+
+    :param      results:  The results
+    :type       results:  list
+    """
+    row = '{:<20} {:>9} {:>11} {:>11} {:>11} {:>11} {:>10}'
+    print(row.format('case', 'registers', 'mean [us]', 'p50 [us]',
+                     'p95 [us]', 'max [us]', 'ops/s'))
+
+    for result in sorted(results, key=lambda ele: (ele['case'],
+                                                   ele['registers'])):
+        print(row.format(result['case'],
+                         result['registers'],
+                         '{:.1f}'.format(result['mean']),
+                         '{:.1f}'.format(result['p50']),
+                         '{:.1f}'.format(result['p95']),
+                         '{:.1f}'.format(result['max']),
+                         '{:.0f}'.format(result['ops'])))
+
+
+def parse_arguments(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks of the Webinterface on the host')
+    parser.add_argument('--lib',
+                        default='lib',
+                        help='Folder of the MicroPython libraries, like '
+                             'be_helpers and wifi_manager')
+    parser.add_argument('--registers',
+                        type=int,
+                        nargs='+',
+                        default=DEFAULT_REGISTER_COUNTS,
+                        help='Sizes of the synthetic register maps')
+    parser.add_argument('--iterations',
+                        type=int,
+                        default=200,
+                        help='Measured calls of each case')
+    parser.add_argument('--output',
+                        help='Path of a JSON file to save the results to')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_arguments(argv)
+    output = os.path.abspath(args.output) if args.output else None
+
+    host_harness.setup(lib_dir=args.lib)
+    results = run(register_counts=tuple(args.registers),
+                  iterations=args.iterations)
+    print_results(results=results)
+
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump({
+                'python': sys.version.split()[0],
+                'results': results,
+            }, file, indent=4)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
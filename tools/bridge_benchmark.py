@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Bridge Benchmark
+
+End-to-end benchmark of the Modbus bridge under CPython. The RTU host of the
+bridge collects the client data via a pty pair from a simulated MyEVSE,
+serving the register map of the register file with the timing of its
+baudrate. While the bridge collects, a local Modbus TCP host requests its
+registers from the TCP client of the bridge.
+
+The collection cycle time of all registers, the latency of each RTU
+transaction and the throughput and latency of the TCP requests are reported.
+Compared to the results of a previous run, e.g. saved with '--output', a
+result worse than the tolerance fails the benchmark.
+
+Example:
+    python tools/bridge_benchmark.py --lib lib --output bridge.json
+    python tools/bridge_benchmark.py --lib lib --baseline bridge.json
+"""
+
+# system packages
+import argparse
+import asyncio
+import json
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import tty
+
+# custom modules
+import host_harness
+from load_test import percentiles
+
+DEFAULT_REGISTER_FILE = os.path.join(host_harness.REPO_DIR,
+                                     'registers',
+                                     'modbusRegisters-MyEVSE.json')
+# processing time of the MyEVSE between a request and its response in
+# milliseconds, an estimate
+DEFAULT_TURNAROUND = 2
+# UART of the RTU host of the bridge, the default one of umodbus
+UART_ID = 1
+
+# function codes by register type, reading and writing multiple registers
+READ_FUNCTIONS = {'COILS': 1, 'ISTS': 2, 'HREGS': 3, 'IREGS': 4}
+WRITE_FUNCTIONS = {5: 'COILS', 6: 'HREGS', 15: 'COILS', 16: 'HREGS'}
+REGISTER_TYPES = {code: reg_type for reg_type, code in READ_FUNCTIONS.items()}
+REGISTER_TYPES.update(WRITE_FUNCTIONS)
+
+ILLEGAL_FUNCTION = 1
+ILLEGAL_ADDRESS = 2
+
+# compared results, True if a higher value is worse
+CHECKS = (
+    (('cycle', 'p50'), True),
+    (('transaction', 'p50'), True),
+    (('tcp', 'throughput'), False),
+)
+
+
+def crc16(data: bytes) -> bytes:
+    """
+    Get the Modbus CRC of a frame
+
+    :param      data:  The frame without CRC
+    :type       data:  bytes
+
+    :returns:   The CRC, low byte first
+    :rtype:     bytes
+    """
+    crc = 0xFFFF
+
+    for char in data:
+        crc ^= char
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+
+    return struct.pack('<H', crc)
+
+
+class ModbusError(Exception):
+    """Exception response of the simulated client"""
+    pass
+
+
+class RtuClient(threading.Thread):
+    """
+    Simulated MyEVSE serving a register map as Modbus RTU client on a pty
+
+    A pty transfers a frame at once. The response is therefore delayed by the
+    time the request needs on the wire at the baudrate, the silence of 3.5
+    characters ending it, the turnaround of the device and the time of the
+    response on the wire, like it arrives at an UART. Input registers change
+    with every transaction like measurements, coils and holding registers
+    keep the written values.
+    """
+    def __init__(self,
+                 fd: int,
+                 register_definitions: dict,
+                 unit: int,
+                 baudrate: int,
+                 turnaround: float) -> None:
+        super().__init__(daemon=True)
+        self._fd = fd
+        self._unit = unit
+        # same character time as umodbus, 11 bits per character
+        self._t1char = (1000000 * 11 // baudrate) / 1000000
+        self._turnaround = turnaround / 1000
+        self._stopped = threading.Event()
+
+        # value by address of each register type
+        self._memory = {reg_type: dict() for reg_type in READ_FUNCTIONS}
+        for reg_type, memory in self._memory.items():
+            for register in register_definitions.get(reg_type, {}).values():
+                for offset in range(register.get('len', 1)):
+                    memory[register['register'] + offset] = 0
+
+        self.transactions = 0
+        self.exceptions = 0
+        self.crc_errors = 0
+        # simulated time on the bus in seconds
+        self.bus_time = 0
+
+    def stop(self) -> None:
+        """Stop serving after the current request"""
+        self._stopped.set()
+
+    def run(self) -> None:
+        buffer = bytearray()
+
+        while not self._stopped.is_set():
+            ready, _, _ = select.select([self._fd], [], [], 0.1)
+            if not ready:
+                continue
+
+            try:
+                buffer.extend(os.read(self._fd, 256))
+            except OSError:
+                # the other side of the pty has been closed
+                break
+            received = time.perf_counter()
+
+            while True:
+                length = self._frame_length(frame=buffer)
+                if length is None or len(buffer) < length:
+                    break
+
+                request = bytes(buffer[:length])
+                del buffer[:length]
+                response = self._handle(request=request)
+
+                delay = (length + 3.5) * self._t1char + self._turnaround
+                if response:
+                    delay += len(response) * self._t1char
+                self.bus_time += delay
+
+                remaining = delay - (time.perf_counter() - received)
+                if remaining > 0:
+                    time.sleep(remaining)
+                if response:
+                    os.write(self._fd, response)
+                received = time.perf_counter()
+
+    def _frame_length(self, frame: bytearray) -> int:
+        """
+        Get the length of a received request
+
+        :param      frame:  The received bytes
+        :type       frame:  bytearray
+
+        :returns:   Length of the request, None if not yet known
+        :rtype:     int
+        """
+        if len(frame) < 2:
+            return None
+
+        if frame[1] in (15, 16):
+            # address, quantity and byte count precede the values
+            if len(frame) < 7:
+                return None
+            return 9 + frame[6]
+
+        return 8
+
+    def _handle(self, request: bytes) -> bytes:
+        """
+        Get the response of a request
+
+        :param      request:  The request including unit and CRC
+        :type       request:  bytes
+
+        :returns:   The response, None if not responded
+        :rtype:     bytes
+        """
+        if crc16(request[:-2]) != request[-2:]:
+            self.crc_errors += 1
+            return None
+
+        if request[0] != self._unit:
+            return None
+
+        self.transactions += 1
+        function_code = request[1]
+
+        try:
+            pdu = self._process(function_code=function_code,
+                                data=request[2:-2])
+        except ModbusError as e:
+            self.exceptions += 1
+            pdu = struct.pack('BB', function_code | 0x80, e.args[0])
+
+        adu = bytes([self._unit]) + pdu
+
+        return adu + crc16(adu)
+
+    def _process(self, function_code: int, data: bytes) -> bytes:
+        """
+        Process a request
+
+        :param      function_code:  The function code
+        :type       function_code:  int
+        :param      data:           The data of the request
+        :type       data:           bytes
+
+        :returns:   The PDU of the response
+        :rtype:     bytes
+
+        :raises     ModbusError:    Function or address not supported
+        """
+        reg_type = REGISTER_TYPES.get(function_code, None)
+        if reg_type is None:
+            raise ModbusError(ILLEGAL_FUNCTION)
+
+        address, quantity = struct.unpack('>HH', data[:4])
+
+        if function_code in (5, 6):
+            # the quantity is the value of a single write
+            self._check(reg_type=reg_type, address=address, quantity=1)
+            if function_code == 5:
+                quantity = int(quantity == 0xFF00)
+            self._memory[reg_type][address] = quantity
+            return bytes([function_code]) + data[:4]
+
+        self._check(reg_type=reg_type, address=address, quantity=quantity)
+        addresses = range(address, address + quantity)
+
+        if function_code == 15:
+            for index, register in enumerate(addresses):
+                self._memory[reg_type][register] = \
+                    data[5 + index // 8] >> (index % 8) & 1
+            return struct.pack('>BHH', function_code, address, quantity)
+
+        if function_code == 16:
+            values = struct.unpack('>{}H'.format(quantity), data[5:])
+            for register, value in zip(addresses, values):
+                self._memory[reg_type][register] = value
+            return struct.pack('>BHH', function_code, address, quantity)
+
+        values = [self._value(reg_type=reg_type, address=register)
+                  for register in addresses]
+
+        if reg_type in ('COILS', 'ISTS'):
+            content = bytearray((quantity + 7) // 8)
+            for index, value in enumerate(values):
+                content[index // 8] |= (value & 1) << (index % 8)
+        else:
+            content = struct.pack('>{}H'.format(quantity), *values)
+
+        return struct.pack('BB', function_code, len(content)) + content
+
+    def _check(self, reg_type: str, address: int, quantity: int) -> None:
+        memory = self._memory[reg_type]
+        if not all(register in memory
+                   for register in range(address, address + quantity)):
+            raise ModbusError(ILLEGAL_ADDRESS)
+
+    def _value(self, reg_type: str, address: int) -> int:
+        if reg_type in ('COILS', 'HREGS'):
+            return self._memory[reg_type][address]
+
+        value = (address * 31 + self.transactions) & 0xFFFF
+        if reg_type == 'ISTS':
+            return value & 1
+        return value
+
+
+def tcp_requests(register_definitions: dict) -> list:
+    """
+    Get the requests of all registers of a register map
+
+    :param      register_definitions:  The register definitions
+    :type       register_definitions:  dict
+
+    :returns:   Function code, address and quantity of each register
+    :rtype:     list
+    """
+    requests = list()
+
+    for reg_type, function_code in READ_FUNCTIONS.items():
+        for register in register_definitions.get(reg_type, {}).values():
+            requests.append((function_code,
+                             register['register'],
+                             register.get('len', 1)))
+
+    return requests
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed by the bridge')
+        data.extend(chunk)
+
+    return bytes(data)
+
+
+def tcp_host(address: tuple,
+             requests: list,
+             duration: float,
+             timeout: float) -> dict:
+    """
+    Request registers from the TCP client of the bridge one after another
+
+    :param      address:   The address and port of the TCP client
+    :type       address:   tuple
+    :param      requests:  The requests, see tcp_requests
+    :type       requests:  list
+    :param      duration:  The duration in seconds
+    :type       duration:  float
+    :param      timeout:   The timeout of a request in seconds
+    :type       timeout:   float
+
+    :returns:   Latencies in seconds and number of failed requests
+    :rtype:     dict
+    """
+    latencies = list()
+    errors = 0
+    transaction_id = 0
+
+    with socket.create_connection(address, timeout=timeout) as sock:
+        end = time.perf_counter() + duration
+
+        while time.perf_counter() < end:
+            function_code, register, quantity = \
+                requests[transaction_id % len(requests)]
+            transaction_id = (transaction_id + 1) & 0xFFFF
+            pdu = struct.pack('>BHH', function_code, register, quantity)
+
+            start = time.perf_counter()
+            # the unit is ignored by the TCP client of the bridge
+            sock.sendall(struct.pack('>HHHB',
+                                     transaction_id,
+                                     0,
+                                     len(pdu) + 1,
+                                     255) + pdu)
+            try:
+                header = _recv_exactly(sock=sock, size=7)
+                length = struct.unpack('>H', header[4:6])[0]
+                response = _recv_exactly(sock=sock, size=length - 1)
+            except socket.timeout:
+                # the connection is out of sync after a lost response
+                errors += 1
+                break
+            latencies.append(time.perf_counter() - start)
+
+            if (struct.unpack('>H', header[:2])[0] != transaction_id or
+                    response[0] != function_code):
+                errors += 1
+
+    return {'latencies': latencies, 'errors': errors}
+
+
+async def run(args: argparse.Namespace, register_definitions: dict) -> dict:
+    """
+    Run the benchmark
+
+    :param      args:                  The command line arguments
+    :type       args:                  argparse.Namespace
+    :param      register_definitions:  The register definitions
+    :type       register_definitions:  dict
+
+    :returns:   The results
+    :rtype:     dict
+    """
+    from myevse_webinterface.async_serial import AsyncSerial
+    from myevse_webinterface.myevse_bridge import MyEVSEBridge
+    from myevse_webinterface.poll_scheduler import PollScheduler
+
+    # the bridge only accepts a path relative to the current folder
+    bridge = MyEVSEBridge(register_file=os.path.basename(args.registers),
+                          quiet=True)
+    # serve on the given address instead of the one of the WLAN
+    bridge._get_network_ip = lambda: args.host
+    bridge.connection_settings_host = {
+        'type': 'tcp',
+        'unit': args.port,
+        'address': -1,
+        'baudrate': -1,
+        'mode': 'master',
+    }
+    bridge.setup_connection(pins=(25, 26))
+
+    # measure each RTU transaction of the async host
+    transactions = list()
+    async_host = AsyncSerial(host=bridge.host)
+    request = async_host._request
+
+    async def timed_request(**kwargs):
+        start = time.perf_counter()
+        try:
+            return await request(**kwargs)
+        finally:
+            transactions.append(time.perf_counter() - start)
+
+    async_host._request = timed_request
+    bridge._async_host = async_host
+
+    # full collection cycles, all blocks are due with a new scheduler
+    cycles = list()
+    for _ in range(args.cycles):
+        bridge._poll_scheduler = PollScheduler(
+            planner=bridge.read_planner,
+            default_interval=bridge.collection_interval)
+        start = time.perf_counter()
+        await bridge.read_due_registers_async()
+        cycles.append(time.perf_counter() - start)
+
+    cycle_transactions = list(transactions)
+    failed_block_reads = bridge.failed_block_reads
+    transactions.clear()
+
+    # TCP requests while the bridge collects and provisions as tasks
+    collection_cycles = bridge.collection_cycles
+    bridge.start_async()
+    try:
+        tcp = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: tcp_host(address=(args.host, args.port),
+                             requests=tcp_requests(register_definitions),
+                             duration=args.duration,
+                             timeout=args.timeout))
+    finally:
+        await bridge.stop()
+        bridge.client._itf._sock.close()
+        bridge.host._uart.deinit()
+
+    latencies = tcp['latencies']
+
+    return {
+        'blocks': len(bridge.read_planner),
+        'cycle': percentiles(cycles),
+        'transaction': percentiles(cycle_transactions),
+        'failed_block_reads': failed_block_reads,
+        'tcp': {
+            'requests': len(latencies),
+            'errors': tcp['errors'],
+            'throughput': len(latencies) / args.duration,
+            'latency': percentiles(latencies),
+            'transaction': percentiles(transactions),
+            'collection_cycles': bridge.collection_cycles - collection_cycles,
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare the results with the ones of a baseline
+
+    :param      results:    The results
+    :type       results:    dict
+    :param      baseline:   The results of the baseline
+    :type       baseline:   dict
+    :param      tolerance:  The accepted relative change, e.g. 0.2 for 20%
+    :type       tolerance:  float
+
+    :returns:   Description of each regression
+    :rtype:     list
+    """
+    regressions = list()
+
+    for (group, key), higher_is_worse in CHECKS:
+        value = results[group][key]
+        reference = baseline[group][key]
+
+        if higher_is_worse:
+            regressed = value > reference * (1 + tolerance)
+        else:
+            regressed = value < reference * (1 - tolerance)
+
+        if regressed:
+            regressions.append('{} {} {:.2f} against {:.2f} of baseline'.
+                               format(group, key, value, reference))
+
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    """
+    Print the results as table
+
+    :param      results:  The results
+    :type       results:  dict
+    """
+    tcp = results['tcp']
+    row = '{:<20} {:>9} {:>9} {:>9} {:>9}'
+    print(row.format('', 'mean [ms]', 'p50 [ms]', 'p95 [ms]', 'max [ms]'))
+
+    for name, latency in (('collection cycle', results['cycle']),
+                          ('RTU transaction', results['transaction']),
+                          ('TCP request', tcp['latency']),
+                          ('RTU with TCP load', tcp['transaction'])):
+        print(row.format(name,
+                         '{:.1f}'.format(latency['mean']),
+                         '{:.1f}'.format(latency['p50']),
+                         '{:.1f}'.format(latency['p95']),
+                         '{:.1f}'.format(latency['max'])))
+
+    print('{} blocks at {} baud, {:.1f}ms simulated bus time per '
+          'transaction, {} failed block reads'.
+          format(results['blocks'],
+                 results['baudrate'],
+                 results['bus_time'],
+                 results['failed_block_reads']))
+    print('{} TCP requests, {} errors, {:.1f} req/s, {} collection cycles '
+          'meanwhile'.format(tcp['requests'],
+                             tcp['errors'],
+                             tcp['throughput'],
+                             tcp['collection_cycles']))
+
+
+def parse_arguments(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='End-to-end benchmark of the Modbus bridge on the host')
+    parser.add_argument('--lib',
+                        default='lib',
+                        help='Folder of the MicroPython libraries, like '
+                             'be_helpers and umodbus')
+    parser.add_argument('--registers',
+                        default=DEFAULT_REGISTER_FILE,
+                        help='Register file of the simulated client')
+    parser.add_argument('--host',
+                        default='127.0.0.1',
+                        help='Address of the TCP client of the bridge')
+    parser.add_argument('--port',
+                        type=int,
+                        default=0,
+                        help='Port of the TCP client of the bridge, a free '
+                             'one if 0')
+    parser.add_argument('--cycles',
+                        type=int,
+                        default=20,
+                        help='Measured collection cycles of all registers')
+    parser.add_argument('--duration',
+                        type=float,
+                        default=10,
+                        help='Duration in seconds of the TCP requests')
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=2,
+                        help='Timeout in seconds of a TCP request')
+    parser.add_argument('--turnaround',
+                        type=float,
+                        default=DEFAULT_TURNAROUND,
+                        help='Time in milliseconds the simulated client '
+                             'takes to respond')
+    parser.add_argument('--output',
+                        help='Path of a JSON file to save the results to')
+    parser.add_argument('--baseline',
+                        help='Path of a JSON file with results to compare to')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.2,
+                        help='Accepted relative change against the baseline')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_arguments(argv)
+    args.registers = os.path.abspath(args.registers)
+
+    with open(args.registers, 'r') as file:
+        register_definitions = json.load(file)
+    connection = register_definitions.get('CONNECTION', {})
+    baudrate = connection.get('baudrate', 9600)
+
+    if not args.port:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind((args.host, 0))
+            args.port = sock.getsockname()[1]
+
+    host_harness.setup(lib_dir=args.lib)
+    import machine
+
+    # the RTU host of the bridge uses one side of the pty, the simulated
+    # client the other one
+    client_fd, host_fd = os.openpty()
+    tty.setraw(host_fd)
+    machine.UART.devices[UART_ID] = os.ttyname(host_fd)
+
+    client = RtuClient(fd=client_fd,
+                       register_definitions=register_definitions,
+                       unit=connection.get('unit', 10),
+                       baudrate=baudrate,
+                       turnaround=args.turnaround)
+    client.start()
+
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(args.registers))
+    try:
+        results = asyncio.run(run(args=args,
+                                  register_definitions=register_definitions))
+    finally:
+        os.chdir(cwd)
+        client.stop()
+        client.join()
+        os.close(host_fd)
+        os.close(client_fd)
+
+    results['baudrate'] = baudrate
+    results['turnaround'] = args.turnaround
+    results['bus_time'] = (client.bus_time / client.transactions * 1000
+                           if client.transactions else 0)
+    results['exceptions'] = client.exceptions
+    print_results(results=results)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    failures = list()
+    if results['failed_block_reads']:
+        failures.append('{} failed block reads'.
+                        format(results['failed_block_reads']))
+    if results['tcp']['errors'] or not results['tcp']['requests']:
+        failures.append('{} failed TCP requests'.
+                        format(results['tcp']['errors']))
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            failures += compare(results=results,
+                                baseline=json.load(file),
+                                tolerance=args.tolerance)
+
+    for failure in failures:
+        print('FAIL: {}'.format(failure))
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython machine module
+
+Resets are only recorded, pins, timers and the RTC keep their state in memory.
+An UART is connected to a device file, e.g. one side of a pty pair, if one is
+given for its ID.
+"""
+
+# system packages
+import fcntl
+import os
+import struct
+import termios
+import time
+import tty
+
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+# system frequency of an ESP32 in Hz
+FREQUENCY = 240000000
+
+_reset_cause = PWRON_RESET
+# number of requested resets, e.g. by the reboot page
+resets = 0
+
+
+def reset_cause() -> int:
+    """
+    Get the cause of the latest reset
+
+    :returns:   The reset cause, PWRON_RESET after start
+    :rtype:     int
+    """
+    return _reset_cause
+
+
+def soft_reset() -> None:
+    """Record a soft reset, the host process keeps running"""
+    global _reset_cause, resets
+    _reset_cause = SOFT_RESET
+    resets += 1
+
+
+def reset() -> None:
+    """Record a hard reset, the host process keeps running"""
+    global _reset_cause, resets
+    _reset_cause = HARD_RESET
+    resets += 1
+
+
+def freq(value: int = None) -> int:
+    """
+    Get the system frequency
+
+    :param      value:  The new frequency, ignored
+    :type       value:  int
+
+    :returns:   The system frequency in Hz
+    :rtype:     int
+    """
+    return FREQUENCY
+
+
+def idle() -> None:
+    """Give up the CPU for a moment"""
+    time.sleep(0)
+
+
+def unique_id() -> bytes:
+    """
+    Get the unique ID of the board
+
+    :returns:   Fixed ID of the host
+    :rtype:     bytes
+    """
+    return b'\x24\x0a\xc4\x00\x00\x01'
+
+
+class Pin(object):
+    """Pin keeping its value in memory"""
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_FALLING = 2
+    IRQ_RISING = 1
+
+    def __init__(self, pin_id, mode: int = -1, pull: int = -1, value=None):
+        self._id = pin_id
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+
+    def on(self) -> None:
+        self._value = 1
+
+    def off(self) -> None:
+        self._value = 0
+
+    def irq(self, handler=None, trigger: int = 0):
+        pass
+
+
+class Timer(object):
+    """Timer never firing"""
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, timer_id: int = -1, **kwargs) -> None:
+        pass
+
+    def init(self, **kwargs) -> None:
+        pass
+
+    def deinit(self) -> None:
+        pass
+
+
+class UART(object):
+    """
+    UART reading and writing a device file
+
+    Without a device file of its ID nothing is ever received. The bytes are
+    transferred as fast as the device file allows, not at the baudrate.
+    """
+    # device file of each UART ID, e.g. {1: '/dev/pts/3'}
+    devices = dict()
+
+    def __init__(self, uart_id: int, baudrate: int = 9600, **kwargs) -> None:
+        self._baudrate = baudrate
+        self._fd = None
+
+        path = self.devices.get(uart_id, None)
+        if path is not None:
+            self._fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+            tty.setraw(self._fd)
+
+    def write(self, data: bytes) -> int:
+        if self._fd is None:
+            return len(data)
+        return os.write(self._fd, bytes(data))
+
+    def read(self, size: int = -1) -> bytes:
+        if self._fd is None:
+            return None
+
+        try:
+            data = os.read(self._fd, size if size > 0 else 4096)
+        except BlockingIOError:
+            return None
+
+        # like MicroPython, None instead of empty bytes if nothing is read
+        return data or None
+
+    def any(self) -> int:
+        if self._fd is None:
+            return 0
+
+        count = fcntl.ioctl(self._fd, termios.FIONREAD, b'\0\0\0\0')
+        return struct.unpack('I', count)[0]
+
+    def deinit(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class RTC(object):
+    """RTC following the host time"""
+    def __init__(self) -> None:
+        self._offset = 0
+
+    def datetime(self, value: tuple = None) -> tuple:
+        now = time.localtime(time.time() + self._offset)
+        # year, month, day, weekday, hours, minutes, seconds, subseconds
+        return (now[0], now[1], now[2], now[6], now[3], now[4], now[5], 0)
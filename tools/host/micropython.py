@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython micropython module
+"""
+
+
+def const(value):
+    return value
+
+
+def alloc_emergency_exception_buf(size: int) -> None:
+    pass
+
+
+def schedule(func, arg) -> None:
+    func(arg)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython neopixel module
+"""
+
+
+class NeoPixel(object):
+    """Neopixel strip keeping the colors in memory"""
+    def __init__(self, pin, n: int, bpp: int = 3, timing: int = 1) -> None:
+        self.n = n
+        self._pixels = [(0,) * bpp for _ in range(n)]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __setitem__(self, index: int, value: tuple) -> None:
+        self._pixels[index] = value
+
+    def __getitem__(self, index: int) -> tuple:
+        return self._pixels[index]
+
+    def fill(self, value: tuple) -> None:
+        for index in range(self.n):
+            self._pixels[index] = value
+
+    def write(self) -> None:
+        pass
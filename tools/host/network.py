@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython network module
+
+The WLAN interfaces connect at once, the state of both interfaces can be
+changed by the class attributes, e.g. to simulate a failed connection
+"""
+
+STA_IF = 0
+AP_IF = 1
+
+AUTH_OPEN = 0
+AUTH_WEP = 1
+AUTH_WPA_PSK = 2
+AUTH_WPA2_PSK = 3
+AUTH_WPA_WPA2_PSK = 4
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_NO_AP_FOUND = 201
+STAT_WRONG_PASSWORD = 202
+
+
+class WLAN(object):
+    """WLAN interface of the host"""
+    # result of a connection attempt of the station
+    connect_result = True
+    # address of both interfaces, the host is reached on localhost
+    address = ('127.0.0.1', '255.255.255.0', '127.0.0.1', '127.0.0.1')
+    # networks found by a scan, as (ssid, bssid, channel, RSSI, auth, hidden)
+    networks = [
+        (b'HostNetwork', b'\x24\x0a\xc4\x00\x00\x02', 1, -42, AUTH_WPA2_PSK,
+         False),
+    ]
+
+    def __init__(self, interface_id: int = STA_IF) -> None:
+        self._id = interface_id
+        self._active = False
+        self._connected = False
+        self._config = {
+            'mac': b'\x24\x0a\xc4\x00\x00\x01',
+            'essid': '',
+        }
+
+    def active(self, value: bool = None) -> bool:
+        if value is None:
+            return self._active
+        self._active = bool(value)
+        if not self._active:
+            self._connected = False
+
+    def connect(self, ssid: str = None, password: str = None, **kwargs):
+        self._connected = self._active and self.connect_result
+        self._config['essid'] = ssid
+
+    def disconnect(self) -> None:
+        self._connected = False
+
+    def isconnected(self) -> bool:
+        if self._id == AP_IF:
+            return self._active
+        return self._connected
+
+    def status(self, param: str = None):
+        if param == 'rssi':
+            return -42
+        if param == 'stations':
+            return []
+        if self._connected:
+            return STAT_GOT_IP
+        return STAT_IDLE
+
+    def ifconfig(self, value: tuple = None) -> tuple:
+        if value is not None:
+            self.address = tuple(value)
+        return self.address
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config.get(args[0], None)
+        self._config.update(kwargs)
+
+    def scan(self) -> list:
+        return list(self.networks)
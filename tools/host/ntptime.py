@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython ntptime module, the host time is used
+"""
+
+# system packages
+import time as _time
+
+host = 'pool.ntp.org'
+
+
+def time() -> int:
+    return int(_time.time())
+
+
+def settime() -> None:
+    pass
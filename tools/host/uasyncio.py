@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython uasyncio module
+
+The asyncio module of the host with the MicroPython specific additions
+"""
+
+# system packages
+from asyncio import *  # noqa: F401,F403
+import asyncio
+
+
+async def sleep_ms(ms: int) -> None:
+    await asyncio.sleep(ms / 1000)
+
+
+class ThreadSafeFlag(object):
+    """Flag to be set by threads or interrupts and awaited by a task"""
+    def __init__(self) -> None:
+        self._loop = None
+        self._event = asyncio.Event()
+
+    def set(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._event.set)
+        else:
+            self._event.set()
+
+    def clear(self) -> None:
+        self._event.clear()
+
+    async def wait(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        await self._event.wait()
+        self._event.clear()
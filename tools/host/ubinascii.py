@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython ubinascii module
+"""
+
+from binascii import *  # noqa: F401,F403
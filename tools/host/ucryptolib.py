@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython ucryptolib module
+
+The data is not encrypted, e.g. WiFi credentials saved on the host are stored
+as given
+"""
+
+
+class aes(object):
+    """Cipher returning the data as it is"""
+    def __init__(self, key: bytes, mode: int, iv: bytes = None) -> None:
+        pass
+
+    def encrypt(self, data: bytes) -> bytes:
+        return bytes(data)
+
+    def decrypt(self, data: bytes) -> bytes:
+        return bytes(data)
@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython uerrno module
+"""
+
+from errno import *  # noqa: F401,F403
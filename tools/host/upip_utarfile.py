@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the upip_utarfile module of upip
+
+The archive is read as a stream by the tarfile module of the host, the
+original module requires uctypes
+"""
+
+# system packages
+import tarfile
+
+DIRTYPE = 'dir'
+REGTYPE = 'file'
+
+
+class TarInfo(object):
+    """Member of an archive"""
+    def __init__(self, info: tarfile.TarInfo) -> None:
+        self.name = info.name + ('/' if info.isdir() else '')
+        self.size = info.size
+        self.type = DIRTYPE if info.isdir() else REGTYPE
+        self.info = info
+
+    def __str__(self) -> str:
+        return 'TarInfo({!r}, {}, {})'.format(self.name, self.type, self.size)
+
+
+class TarFile(object):
+    """Archive read in the order of its members"""
+    def __init__(self, name: str = None, fileobj=None) -> None:
+        self._tar = tarfile.open(name=name, fileobj=fileobj, mode='r|')
+
+    def __iter__(self):
+        for info in self._tar:
+            yield TarInfo(info=info)
+
+    def extractfile(self, tarinfo: TarInfo):
+        return self._tar.extractfile(tarinfo.info)
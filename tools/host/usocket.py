@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython usocket module
+
+Sockets provide the stream methods of MicroPython sockets, like write and
+readline, in addition to the ones of the host
+"""
+
+# system packages
+import socket as _socket
+from socket import (AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR,  # noqa
+                    getaddrinfo)
+
+
+class socket(object):
+    """Socket with the stream methods of a MicroPython socket"""
+    def __init__(self,
+                 af: int = AF_INET,
+                 type: int = SOCK_STREAM,
+                 proto: int = 0,
+                 sock: _socket.socket = None) -> None:
+        self._sock = sock or _socket.socket(af, type, proto)
+        self._file = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._sock, name)
+
+    def _stream(self):
+        if self._file is None:
+            self._file = self._sock.makefile('rb')
+        return self._file
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+        self._sock.sendall(data)
+
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream().read(size)
+
+    def readinto(self, buf, size: int = -1) -> int:
+        if 0 <= size < len(buf):
+            buf = memoryview(buf)[:size]
+        return self._stream().readinto(buf)
+
+    def readline(self) -> bytes:
+        return self._stream().readline()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._sock.close()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython ussl module
+
+Certificates are not validated, like by MicroPython
+"""
+
+# system packages
+import ssl
+
+# custom modules
+import usocket
+
+
+def wrap_socket(sock: usocket.socket,
+                server_hostname: str = None) -> usocket.socket:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    return usocket.socket(sock=context.wrap_socket(
+        sock._sock, server_hostname=server_hostname))
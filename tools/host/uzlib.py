@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host stand-in of the MicroPython uzlib module
+"""
+
+# system packages
+import zlib
+
+
+class DecompIO(object):
+    """Stream decompressing the data read from another stream"""
+    # number of compressed bytes read at once
+    CHUNK_SIZE = 512
+
+    def __init__(self, stream, wbits: int = 0) -> None:
+        self._stream = stream
+        self._decompressor = zlib.decompressobj(wbits)
+        self._data = b''
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._data) < size:
+            chunk = self._stream.read(self.CHUNK_SIZE)
+            if not chunk:
+                self._data += self._decompressor.flush()
+                break
+            self._data += self._decompressor.decompress(chunk)
+
+        if size < 0:
+            size = len(self._data)
+        data = self._data[:size]
+        self._data = self._data[size:]
+
+        return data
+
+    def readinto(self, buf, size: int = -1) -> int:
+        if size < 0:
+            size = len(buf)
+        data = self.read(size)
+        buf[:len(data)] = data
+
+        return len(data)
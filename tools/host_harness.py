@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Host Harness
+
+Run the Webinterface under CPython on a Linux host. The MicroPython and ESP32
+specific modules are replaced by the stand-in modules of the 'host' folder,
+the MicroPython libraries, like be_helpers, wifi_manager, microdot and
+utemplate, are loaded from a folder like the 'lib' folder of the device.
+The Modbus bridge is replaced by a double serving synthetic client data.
+
+Call 'setup' before importing any module of the Webinterface.
+"""
+
+# system packages
+import __future__
+import gc
+import importlib.machinery
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOST_DIR = os.path.join(TOOLS_DIR, 'host')
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+
+# heap of an ESP32 without SPIRAM, reported by the gc module of the host
+HEAP_SIZE = 150016
+HEAP_ALLOC = 50000
+
+# register types of a synthetic register map
+REGISTER_TYPES = ('COILS', 'HREGS', 'ISTS', 'IREGS')
+
+
+def _ticks_ms() -> int:
+    return time.monotonic_ns() // 1000000
+
+
+def _ticks_us() -> int:
+    return time.monotonic_ns() // 1000
+
+
+def _ticks_diff(end: int, start: int) -> int:
+    return end - start
+
+
+def _ticks_add(ticks: int, delta: int) -> int:
+    return ticks + delta
+
+
+_os_listdir = os.listdir
+
+
+def _listdir(path: str = '.') -> list:
+    # an empty path is the current folder, like on MicroPython
+    return _os_listdir(path or '.')
+
+
+class _LibLoader(importlib.machinery.SourceFileLoader):
+    """
+    Loader of the MicroPython libraries
+
+    The annotations are not evaluated, like on MicroPython, as some of them
+    name types only known to the device, e.g. 'lock' in be_helpers.led_helper
+    """
+    def get_code(self, fullname: str):
+        path = self.get_filename(fullname)
+
+        return compile(self.get_data(path),
+                       path,
+                       'exec',
+                       flags=__future__.annotations.compiler_flag,
+                       dont_inherit=True)
+
+
+def _lib_path_hook(lib_dir: str):
+    """
+    Get a path hook loading the modules of the libraries by the _LibLoader
+
+    :param      lib_dir:  The absolute folder of the MicroPython libraries
+    :type       lib_dir:  str
+
+    :returns:   The path hook
+    :rtype:     callable
+    """
+    finder = importlib.machinery.FileFinder.path_hook(
+        (_LibLoader, importlib.machinery.SOURCE_SUFFIXES))
+
+    def _path_hook(path: str):
+        path = os.path.abspath(path)
+        if path != lib_dir and not path.startswith(lib_dir + os.sep):
+            raise ImportError('Not a folder of the libraries')
+        return finder(path)
+
+    _path_hook.lib_dir = lib_dir
+
+    return _path_hook
+
+
+def setup(lib_dir: str = 'lib') -> None:
+    """
+    Provide the stand-in modules and the MicroPython libraries
+
+    The ticks and sleep functions of the MicroPython time module are added
+    to the time module of the host, the RAM functions to its gc module.
+    Differences of the host breaking the libraries are bridged, the
+    annotations of the libraries are not evaluated and an empty path of
+    os.listdir is the current folder, as used by be_helpers.path_helper
+
+    :param      lib_dir:  The folder of the MicroPython libraries
+    :type       lib_dir:  str
+    """
+    lib_dir = os.path.abspath(lib_dir)
+
+    if not any(getattr(hook, 'lib_dir', None) == lib_dir
+               for hook in sys.path_hooks):
+        sys.path_hooks.insert(0, _lib_path_hook(lib_dir=lib_dir))
+        sys.path_importer_cache.clear()
+
+    # the package of this repo precedes a copy of it in the libraries
+    for path in (lib_dir, REPO_DIR, HOST_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    os.listdir = _listdir
+
+    if not hasattr(time, 'ticks_ms'):
+        time.ticks_ms = _ticks_ms
+        time.ticks_us = _ticks_us
+        time.ticks_diff = _ticks_diff
+        time.ticks_add = _ticks_add
+        time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+        time.sleep_us = lambda us: time.sleep(us / 1000000)
+
+    if not hasattr(gc, 'mem_free'):
+        gc.mem_alloc = lambda: HEAP_ALLOC
+        gc.mem_free = lambda: HEAP_SIZE - HEAP_ALLOC
+
+
+def register_definitions(count: int) -> dict:
+    """
+    Get a synthetic register map
+
+    The registers are spread evenly over all register types, every fifth
+    input register spans two addresses like an uint32 value
+
+    :param      count:  The number of registers
+    :type       count:  int
+
+    :returns:   Register definitions like a register JSON file
+    :rtype:     dict
+    """
+    definitions = {reg_type: dict() for reg_type in REGISTER_TYPES}
+    addresses = {reg_type: 10 for reg_type in REGISTER_TYPES}
+
+    for number in range(count):
+        reg_type = REGISTER_TYPES[number % len(REGISTER_TYPES)]
+        length = 2 if reg_type == 'IREGS' and number % 5 == 3 else 1
+        name = 'REGISTER_{}_{}'.format(number, reg_type[:-1])
+
+        definitions[reg_type][name] = {
+            'register': addresses[reg_type],
+            'len': length,
+            'description': 'Synthetic register {}'.format(number),
+            'range': '',
+            'unit': 'A' if reg_type.endswith('REGS') else '',
+        }
+        addresses[reg_type] += length
+
+    definitions['META'] = {'created': '18.10.2026', 'modified': '18.10.2026'}
+    definitions['CONNECTION'] = {'type': 'rtu', 'unit': 10, 'baudrate': 9600}
+
+    return definitions
+
+
+class FakeBridge(object):
+    """
+    Modbus bridge double serving synthetic client data
+
+    Each call of 'update' changes the value of every register and increases
+    the data generation, like a collection cycle of the real bridge
+    """
+    def __init__(self, register_definitions: dict, **kwargs) -> None:
+        from be_helpers.generic_helper import GenericHelper
+        from myevse_webinterface.register_history import RegisterHistory
+        from myevse_webinterface.register_index import RegisterIndex
+        from myevse_webinterface.write_queue import WriteQueue
+
+        self.register_definitions = register_definitions
+        self.register_file = 'synthetic'
+        self._register_index = RegisterIndex(
+            register_definitions=register_definitions)
+        self._history = RegisterHistory(registers=tuple(), depth=1)
+        self._write_queue = WriteQueue()
+
+        self.logger = GenericHelper.create_logger(
+            logger_name=self.__class__.__name__)
+        self.host = None
+        self.client = None
+        self.host_unit = 10
+        self.client_unit = 180
+        self.connection_settings_host = dict()
+        self.connection_settings_client = dict()
+        self.collection_interval = 1
+        self.synchronisation_interval = 1
+        self.collecting_client_data = False
+        self.provisioning_host_data = False
+
+        self._data_generation = 0
+        self._client_data = dict()
+        self.update()
+
+    @property
+    def register_index(self):
+        return self._register_index
+
+    @property
+    def history(self):
+        return self._history
+
+    @property
+    def history_log(self):
+        return None
+
+    @property
+    def write_queue(self):
+        return self._write_queue
+
+    @property
+    def running_async(self) -> bool:
+        return True
+
+    @property
+    def data_generation(self) -> int:
+        return self._data_generation
+
+    @property
+    def client_data(self) -> dict:
+        return self._client_data
+
+    @property
+    def changed_data(self) -> dict:
+        # all registers change on every update
+        return self._client_data
+
+    @property
+    def collection_cycles(self) -> int:
+        return self._data_generation
+
+    @property
+    def block_reads(self) -> int:
+        return self._data_generation
+
+    @property
+    def failed_block_reads(self) -> int:
+        return 0
+
+    def update(self) -> None:
+        """Change the value of every register like a collection cycle"""
+        self._data_generation += 1
+        seed = self._data_generation
+        data = dict()
+
+        for reg_type in self._register_index.register_types:
+            data[reg_type] = dict()
+            for register in self._register_index.registers(reg_type):
+                if register.length > 1:
+                    value = [seed >> 16 & 0xFFFF, seed & 0xFFFF]
+                elif reg_type in ('COILS', 'ISTS'):
+                    value = seed % 2
+                else:
+                    value = (register.address + seed) & 0xFFFF
+                data[reg_type][register.name] = {
+                    'register': register.address,
+                    'val': value,
+                }
+
+        self._client_data = data
+
+    def changes_since(self, generation: int) -> dict:
+        # all registers change on every update
+        if generation < self._data_generation:
+            return self._client_data
+        return dict()
+
+    def start_async(self) -> None:
+        pass
+
+    def setup_connection(self, pins: tuple) -> None:
+        pass
+
+    def flush_history_log(self) -> None:
+        pass
+
+    def _get_network_ip(self) -> str:
+        return '127.0.0.1'
+
+    async def stop(self, timeout: int = 10000) -> bool:
+        return True
+
+
+def prepare_work_dir(config: dict, work_dir: str = None) -> str:
+    """
+    Create a working folder like the file system of the device
+
+    The templates and register files of this repo are copied to its 'lib'
+    folder, templates are compiled there on first use
+
+    :param      config:    The content of the config file
+    :type       config:    dict
+    :param      work_dir:  The working folder, a temporary one if None
+    :type       work_dir:  str
+
+    :returns:   Path of the working folder
+    :rtype:     str
+    """
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='myevse-host-')
+
+    for folder in ('templates', 'registers'):
+        target = os.path.join(work_dir, 'lib', folder)
+        if not os.path.exists(target):
+            shutil.copytree(os.path.join(REPO_DIR, folder),
+                            target,
+                            ignore=shutil.ignore_patterns('*_tpl.py',
+                                                          '*_tpl.mpy'))
+
+    with open(os.path.join(work_dir, 'config.json'), 'w') as file:
+        json.dump(config, file)
+
+    return work_dir
+
+
+def make_webinterface(register_count: int = None,
+                      connection_mode: int = 1,
+                      work_dir: str = None):
+    """
+    Create a Webinterface using the Modbus bridge double
+
+    The working folder becomes the current folder, all paths of the
+    Webinterface are relative to it
+
+    :param      register_count:   The number of synthetic registers, None to
+                                  use the MyEVSE register file
+    :type       register_count:   int
+    :param      connection_mode:  The connection mode, 1 for client mode
+    :type       connection_mode:  int
+    :param      work_dir:         The working folder, a temporary one if None
+    :type       work_dir:         str
+
+    :returns:   The Webinterface
+    :rtype:     Webinterface
+    """
+    register_file = 'lib/registers/modbusRegisters-MyEVSE.json'
+    work_dir = prepare_work_dir(config={
+        'CONNECTION_MODE': connection_mode,
+        'REGISTERS': register_file,
+        'HISTORY_LOG_SIZE': 0,
+    }, work_dir=work_dir)
+    os.chdir(work_dir)
+    # compiled templates are imported from the working folder, like from the
+    # root of the device
+    if work_dir not in sys.path:
+        sys.path.append(work_dir)
+
+    if register_count is None:
+        with open(register_file, 'r') as file:
+            definitions = json.load(file)
+    else:
+        definitions = register_definitions(count=register_count)
+
+    from myevse_webinterface.webinterface import Webinterface
+
+    class HostWebinterface(Webinterface):
+        """Webinterface creating the Modbus bridge double"""
+        def _load(self, module: str):
+            if module == 'myevse_bridge':
+                return _BridgeModule(definitions)
+            return super()._load(module=module)
+
+    return HostWebinterface(quiet=True)
+
+
+class _BridgeModule(object):
+    """Replacement of the bridge module creating the bridge double"""
+    def __init__(self, definitions: dict) -> None:
+        self._definitions = definitions
+
+    def MyEVSEBridge(self, **kwargs) -> FakeBridge:
+        return FakeBridge(register_definitions=self._definitions, **kwargs)
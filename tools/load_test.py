@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Load Test
+
+Concurrent clients requesting a mix of pages from the Webinterface run on the
+host harness. The webserver runs in a separate process, slowed down to
+approximate the CPU speed of an ESP32. Throughput and latency percentiles are
+reported for each number of concurrent clients.
+
+Example:
+    python tools/load_test.py --lib lib --clients 1 4 16 --duration 10
+"""
+
+# system packages
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# custom modules
+import host_harness
+
+# ratio of the CPU time of MicroPython on an ESP32 at 240 MHz to the one of
+# CPython on a desktop CPU, a rough estimate. Calibrate it by comparing the
+# mean latency of a single client with the one of the device, see TESTING
+DEFAULT_SLOWDOWN = 40
+DEFAULT_MIX = ('/data=1', '/modbus_data=2', '/info=1', '/system_data=1')
+
+
+class Throttle(object):
+    """
+    Slow down the event loop to approximate a slower CPU
+
+    Each callback of the event loop, e.g. a step of a task, blocks the event
+    loop for the given multiple of its CPU time. Short delays are collected
+    until they are worth sleeping for, the overshoot of a sleep is deducted
+    from the next delay.
+    """
+    # minimum collected delay to sleep for, in nanoseconds
+    MIN_SLEEP = 1000000
+
+    def __init__(self, slowdown: float) -> None:
+        self._factor = max(slowdown - 1, 0)
+        self._debt = 0
+        self._run = None
+
+    def install(self) -> None:
+        """Throttle all callbacks of all event loops of this process"""
+        if self._run is not None or not self._factor:
+            return
+
+        self._run = asyncio.events.Handle._run
+        throttle = self
+
+        def _run(handle):
+            start = time.thread_time_ns()
+            throttle._run(handle)
+            throttle.delay(time.thread_time_ns() - start)
+
+        asyncio.events.Handle._run = _run
+
+    def delay(self, cpu_time: int) -> None:
+        """
+        Block for the additional time of the given CPU time
+
+        :param      cpu_time:  The CPU time in nanoseconds
+        :type       cpu_time:  int
+        """
+        self._debt += cpu_time * self._factor
+        if self._debt < self.MIN_SLEEP:
+            return
+
+        start = time.perf_counter_ns()
+        time.sleep(self._debt / 1e9)
+        self._debt -= time.perf_counter_ns() - start
+
+
+def serve(args: argparse.Namespace) -> int:
+    """
+    Run the webserver of the Webinterface using the Modbus bridge double
+
+    :param      args:  The command line arguments
+    :type       args:  argparse.Namespace
+
+    :returns:   Exit code
+    :rtype:     int
+    """
+    host_harness.setup(lib_dir=args.lib)
+    work_dir = tempfile.mkdtemp(prefix='myevse-load-test-')
+    wi = host_harness.make_webinterface(register_count=args.registers,
+                                        work_dir=work_dir)
+    bridge = wi._mb_bridge
+    app = wi._wm.app
+
+    async def collect() -> None:
+        # new client data like a collection cycle of the bridge
+        while True:
+            await asyncio.sleep(args.cycle)
+            bridge.update()
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        # the test stops the webserver by terminating this process
+        loop.add_signal_handler(signal.SIGTERM, app.shutdown)
+        if args.cycle > 0:
+            loop.create_task(collect())
+        await app.start_server(host=args.host, port=args.port)
+
+    Throttle(slowdown=args.slowdown).install()
+
+    try:
+        asyncio.run(main())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return 0
+
+
+async def request(host: str, port: int, path: str, timeout: float) -> int:
+    """
+    Request a page and read the complete response
+
+    :param      host:     The host
+    :type       host:     str
+    :param      port:     The port
+    :type       port:     int
+    :param      path:     The path
+    :type       path:     str
+    :param      timeout:  The timeout in seconds
+    :type       timeout:  float
+
+    :returns:   The status code, 0 if no response has been received
+    :rtype:     int
+    """
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port), timeout)
+
+    try:
+        writer.write('GET {} HTTP/1.0\r\nHost: {}\r\n\r\n'.format(
+            path, host).encode())
+        await writer.drain()
+        # the webserver closes the connection after each response
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+
+    try:
+        return int(response.split(b' ', 2)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+async def client(host: str,
+                 port: int,
+                 paths: list,
+                 weights: list,
+                 end: float,
+                 interval: float,
+                 timeout: float,
+                 seed: int,
+                 samples: list) -> None:
+    """
+    Request randomly chosen pages until the end of the test
+
+    :param      host:      The host
+    :type       host:      str
+    :param      port:      The port
+    :type       port:      int
+    :param      paths:     The paths of the pages
+    :type       paths:     list
+    :param      weights:   The relative frequency of each path
+    :type       weights:   list
+    :param      end:       The end of the test as monotonic time
+    :type       end:       float
+    :param      interval:  The time between two requests in seconds
+    :type       interval:  float
+    :param      timeout:   The timeout of a request in seconds
+    :type       timeout:   float
+    :param      seed:      The seed of the random page choice
+    :type       seed:      int
+    :param      samples:   The list to append path, status code and latency
+                           in seconds of each request to
+    :type       samples:   list
+    """
+    choice = random.Random(seed)
+
+    while time.monotonic() < end:
+        path = choice.choices(paths, weights)[0]
+        start = time.monotonic()
+
+        try:
+            status = await request(host=host,
+                                   port=port,
+                                   path=path,
+                                   timeout=timeout)
+        except (OSError, asyncio.TimeoutError):
+            status = 0
+
+        samples.append((path, status, time.monotonic() - start))
+
+        if interval > 0:
+            await asyncio.sleep(interval)
+
+
+def percentiles(latencies: list) -> dict:
+    """
+    Get the percentiles of latencies
+
+    :param      latencies:  The latencies in seconds
+    :type       latencies:  list
+
+    :returns:   Mean, 50th, 95th and 99th percentile and maximum in ms
+    :rtype:     dict
+    """
+    if not latencies:
+        return {'mean': 0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0}
+
+    latencies = sorted(latencies)
+    last = len(latencies) - 1
+
+    return {
+        'mean': sum(latencies) / len(latencies) * 1000,
+        'p50': latencies[last * 50 // 100] * 1000,
+        'p95': latencies[last * 95 // 100] * 1000,
+        'p99': latencies[last * 99 // 100] * 1000,
+        'max': latencies[-1] * 1000,
+    }
+
+
+async def run_level(args: argparse.Namespace,
+                    clients: int,
+                    paths: list,
+                    weights: list) -> dict:
+    """
+    Run a number of concurrent clients for the test duration
+
+    :param      args:     The command line arguments
+    :type       args:     argparse.Namespace
+    :param      clients:  The number of concurrent clients
+    :type       clients:  int
+    :param      paths:    The paths of the pages
+    :type       paths:    list
+    :param      weights:  The relative frequency of each path
+    :type       weights:  list
+
+    :returns:   Throughput and latency of all and of each page
+    :rtype:     dict
+    """
+    samples = list()
+    start = time.monotonic()
+    end = start + args.duration
+
+    await asyncio.gather(*[client(host=args.host,
+                                  port=args.port,
+                                  paths=paths,
+                                  weights=weights,
+                                  end=end,
+                                  interval=args.interval,
+                                  timeout=args.timeout,
+                                  seed=args.seed + number,
+                                  samples=samples)
+                           for number in range(clients)])
+    elapsed = time.monotonic() - start
+
+    succeeded = [sample for sample in samples if sample[1] == 200]
+    result = {
+        'clients': clients,
+        'requests': len(samples),
+        'errors': len(samples) - len(succeeded),
+        'throughput': len(succeeded) / elapsed,
+        'latency': percentiles([sample[2] for sample in succeeded]),
+        'paths': dict(),
+    }
+    for path in paths:
+        result['paths'][path] = percentiles(
+            [sample[2] for sample in succeeded if sample[0] == path])
+        result['paths'][path]['requests'] = len(
+            [sample for sample in samples if sample[0] == path])
+
+    return result
+
+
+async def wait_for_server(host: str, port: int, timeout: float) -> bool:
+    """
+    Wait until the webserver accepts connections
+
+    :param      host:     The host
+    :type       host:     str
+    :param      port:     The port
+    :type       port:     int
+    :param      timeout:  The timeout in seconds
+    :type       timeout:  float
+
+    :returns:   Flag whether the webserver accepts connections
+    :rtype:     bool
+    """
+    end = time.monotonic() + timeout
+
+    while time.monotonic() < end:
+        try:
+            await request(host=host, port=port, path='/system_data',
+                          timeout=timeout)
+            return True
+        except OSError:
+            await asyncio.sleep(0.1)
+
+    return False
+
+
+def print_results(results: list) -> None:
+    """
+    Print the results as table
+
+    :param      results:  The results of each number of clients
+    :type       results:  list
+    """
+    row = '{:>7} {:<14} {:>8} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9}'
+    print(row.format('clients', 'path', 'requests', 'errors', 'req/s',
+                     'p50 [ms]', 'p95 [ms]', 'p99 [ms]', 'max [ms]'))
+
+    for result in results:
+        latency = result['latency']
+        print(row.format(result['clients'],
+                         'all',
+                         result['requests'],
+                         result['errors'],
+                         '{:.1f}'.format(result['throughput']),
+                         '{:.1f}'.format(latency['p50']),
+                         '{:.1f}'.format(latency['p95']),
+                         '{:.1f}'.format(latency['p99']),
+                         '{:.1f}'.format(latency['max'])))
+
+        for path, latency in result['paths'].items():
+            print(row.format('',
+                             path,
+                             latency['requests'],
+                             '',
+                             '',
+                             '{:.1f}'.format(latency['p50']),
+                             '{:.1f}'.format(latency['p95']),
+                             '{:.1f}'.format(latency['p99']),
+                             '{:.1f}'.format(latency['max'])))
+
+
+def parse_mix(mix: list) -> tuple:
+    """
+    Parse the mix of pages
+
+    :param      mix:  The paths with their weight, e.g. '/data=2'
+    :type       mix:  list
+
+    :returns:   The paths and their weights
+    :rtype:     tuple
+    """
+    paths = list()
+    weights = list()
+
+    for entry in mix:
+        path, _, weight = entry.partition('=')
+        paths.append(path)
+        weights.append(float(weight or 1))
+
+    return paths, weights
+
+
+def free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def parse_arguments(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Load test of the Webinterface on the host')
+    parser.add_argument('--lib',
+                        default='lib',
+                        help='Folder of the MicroPython libraries, like '
+                             'be_helpers and wifi_manager')
+    parser.add_argument('--host',
+                        default='127.0.0.1',
+                        help='Address of the webserver')
+    parser.add_argument('--port',
+                        type=int,
+                        default=0,
+                        help='Port of the webserver, a free one if 0')
+    parser.add_argument('--clients',
+                        type=int,
+                        nargs='+',
+                        default=(1, 2, 4, 8, 16),
+                        help='Numbers of concurrent clients to test')
+    parser.add_argument('--duration',
+                        type=float,
+                        default=10,
+                        help='Duration in seconds of each number of clients')
+    parser.add_argument('--mix',
+                        nargs='+',
+                        default=DEFAULT_MIX,
+                        help='Requested paths with their relative frequency')
+    parser.add_argument('--interval',
+                        type=float,
+                        default=0,
+                        help='Time in seconds between two requests of a '
+                             'client, e.g. 1 for a dashboard')
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=10,
+                        help='Timeout in seconds of a request')
+    parser.add_argument('--slowdown',
+                        type=float,
+                        default=DEFAULT_SLOWDOWN,
+                        help='Multiple of the CPU time the webserver takes, '
+                             '1 to run at host speed')
+    parser.add_argument('--cycle',
+                        type=float,
+                        default=1,
+                        help='Time in seconds between two changes of the '
+                             'Modbus data, 0 to keep it')
+    parser.add_argument('--registers',
+                        type=int,
+                        help='Number of synthetic registers, the MyEVSE '
+                             'registers if not given')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help='Seed of the random page choice')
+    parser.add_argument('--output',
+                        help='Path of a JSON file to save the results to')
+    parser.add_argument('--external',
+                        action='store_true',
+                        help='Test the webserver at host and port, e.g. of '
+                             'a device, instead of starting one')
+    parser.add_argument('--serve',
+                        action='store_true',
+                        help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_arguments(argv)
+    args.lib = os.path.abspath(args.lib)
+
+    if args.serve:
+        return serve(args=args)
+
+    paths, weights = parse_mix(mix=args.mix)
+    server = None
+
+    if args.external:
+        args.port = args.port or 80
+    else:
+        args.port = args.port or free_port(host=args.host)
+        command = [sys.executable, os.path.abspath(__file__), '--serve',
+                   '--lib', args.lib,
+                   '--host', args.host,
+                   '--port', str(args.port),
+                   '--slowdown', str(args.slowdown),
+                   '--cycle', str(args.cycle)]
+        if args.registers is not None:
+            command += ['--registers', str(args.registers)]
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+    results = list()
+    try:
+        if not asyncio.run(wait_for_server(host=args.host,
+                                           port=args.port,
+                                           timeout=30)):
+            print('Webserver not reachable')
+            return 1
+
+        for clients in args.clients:
+            results.append(asyncio.run(run_level(args=args,
+                                                 clients=clients,
+                                                 paths=paths,
+                                                 weights=weights)))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results(results=results)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'slowdown': None if args.external else args.slowdown,
+                'mix': args.mix,
+                'interval': args.interval,
+                'results': results,
+            }, file, indent=4)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())